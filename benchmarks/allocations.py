@@ -0,0 +1,101 @@
+"""
+Compare per-request memory and time of the legacy and fast /v1/analyze paths.
+
+The legacy path is what the handler used to do: validate into a
+``VitalsEvent`` model, dump it, analyze a tagged copy of the event and
+encode the decision with ``jsonable_encoder`` + ``json.dumps``. The fast
+path validates the JSON body straight into a dict, analyzes it in place
+(``owned=True``) and encodes with orjson. Allocation is the mean traced
+peak per request above the memory held before it (``tracemalloc``).
+
+	python -m benchmarks.allocations --rules 500 --events 5000 --output results/allocations.json
+"""
+import argparse
+import json
+import sys
+import tracemalloc
+from typing import Any, Callable, Dict, List
+
+import orjson
+from fastapi.encoders import jsonable_encoder
+
+from agent_project.application.evaluation_service.synthetic import generate_events, generate_rules
+from agent_project.application.rule_engine import RuleEngine
+from agent_project.core.agent import HealthAgent
+from agent_project.core.tools.windows import WindowStore
+from agent_project.infrastructure.api.schemas import VitalsEvent, parse_vitals
+
+from .common import NullDispatcher, time_per_item, write_results
+
+
+def legacy(agent: HealthAgent, body: bytes) -> bytes:
+	payload = VitalsEvent.model_validate_json(body).model_dump()
+	return json.dumps(jsonable_encoder(agent.analyze(payload))).encode()
+
+
+def fast(agent: HealthAgent, body: bytes) -> bytes:
+	return orjson.dumps(agent.analyze(parse_vitals(body), owned=True))
+
+
+def traced_bytes_per_request(
+	handle: Callable[[HealthAgent, bytes], bytes], agent: HealthAgent, bodies: List[bytes]
+) -> Dict[str, float]:
+	peaks = []
+	tracemalloc.start()
+	try:
+		for body in bodies:
+			tracemalloc.reset_peak()
+			before = tracemalloc.get_traced_memory()[0]
+			handle(agent, body)
+			peaks.append(tracemalloc.get_traced_memory()[1] - before)
+	finally:
+		tracemalloc.stop()
+	peaks.sort()
+	return {
+		"mean_peak_bytes_per_request": sum(peaks) / len(peaks),
+		"median_peak_bytes_per_request": peaks[len(peaks) // 2],
+	}
+
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+	parser.add_argument("--rules", type=int, default=500)
+	parser.add_argument("--events", type=int, default=5000)
+	parser.add_argument("--repeat", type=int, default=5)
+	parser.add_argument("--seed", type=int, default=0)
+	parser.add_argument("--output", help="JSON result file (default: stdout)")
+	args = parser.parse_args()
+
+	bodies = [orjson.dumps(event) for event in generate_events(args.events, seed=args.seed)]
+	engine = RuleEngine()
+	for rule in generate_rules(args.rules, seed=args.seed):
+		engine.add_rule(rule)
+
+	def agent() -> HealthAgent:
+		return HealthAgent(NullDispatcher(), engine, WindowStore())
+
+	results: Dict[str, Any] = {}
+	for name, handle in (("legacy", legacy), ("fast", fast)):
+		warm = agent()
+		for body in bodies[:100]:  # build the rule index and tag memo outside the measurements
+			handle(warm, body)
+		result = traced_bytes_per_request(handle, agent(), bodies)
+		run_agent = agent()
+		result.update(time_per_item(
+			lambda handle=handle, run_agent=run_agent: [handle(run_agent, body) for body in bodies],
+			len(bodies),
+			args.repeat,
+		))
+		results[name] = result
+		print(
+			f"{name}: {result['mean_peak_bytes_per_request']:.0f} B/request peak, "
+			f"{result['best_ns_per_item'] / 1000:.1f} us/request",
+			file=sys.stderr,
+		)
+	legacy_peak = results["legacy"]["mean_peak_bytes_per_request"]
+	results["peak_bytes_reduction"] = 1 - results["fast"]["mean_peak_bytes_per_request"] / legacy_peak
+	write_results("allocations", vars(args), results, args.output)
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,116 @@
+"""
+Compare /v1/analyze latency under concurrent load with and without the analysis process pool.
+
+Starts the API with uvicorn once per ANALYSIS_WORKERS setting, loads a
+synthetic rule set through a published snapshot file, fires requests from
+many concurrent clients and reports throughput and p50/p99 latency.
+
+	python -m benchmarks.analyze_latency --workers 0 4 --rules 500 --concurrency 64
+"""
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+import httpx
+
+from agent_project.application.evaluation_service.synthetic import generate_events, generate_rules
+from agent_project.application.rule_engine import PublishedRuleStorage
+
+from .common import write_results
+
+
+def free_port() -> int:
+	with socket.socket() as s:
+		s.bind(("127.0.0.1", 0))
+		return s.getsockname()[1]
+
+
+async def wait_ready(client: httpx.AsyncClient, timeout: float = 30.0) -> None:
+	deadline = time.monotonic() + timeout
+	while time.monotonic() < deadline:
+		try:
+			if (await client.get("/health")).status_code == 200:
+				return
+		except httpx.TransportError:
+			pass
+		await asyncio.sleep(0.2)
+	raise RuntimeError("API did not start")
+
+
+async def load(base_url: str, requests: int, concurrency: int, seed: int) -> Dict[str, float]:
+	events = list(generate_events(requests, seed=seed))
+	latencies: List[float] = []
+	queue = iter(events)
+	limits = httpx.Limits(max_connections=concurrency)
+	async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60.0) as client:
+		await wait_ready(client)
+		for event in events[:concurrency]:  # warm up every connection and worker
+			await client.post("/v1/analyze", json=event)
+
+		async def user() -> None:
+			for event in queue:
+				start = time.perf_counter()
+				response = await client.post("/v1/analyze", json=event)
+				latencies.append(time.perf_counter() - start)
+				response.raise_for_status()
+
+		start = time.perf_counter()
+		await asyncio.gather(*(user() for _ in range(concurrency)))
+		elapsed = time.perf_counter() - start
+
+	latencies.sort()
+	return {
+		"throughput_rps": len(latencies) / elapsed,
+		"p50_ms": 1000 * latencies[len(latencies) // 2],
+		"p99_ms": 1000 * latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))],
+	}
+
+
+def run(workers: int, args: argparse.Namespace, snapshot: str) -> Dict[str, float]:
+	port = free_port()
+	env = dict(os.environ, ANALYSIS_WORKERS=str(workers), RULES_SNAPSHOT_PATH=snapshot)
+	server = subprocess.Popen(
+		[sys.executable, "-m", "uvicorn", "agent_project.infrastructure.api.app:app",
+		 "--port", str(port), "--log-level", "warning", "--no-access-log"],
+		env=env,
+		stdout=subprocess.DEVNULL,
+	)
+	try:
+		return asyncio.run(load(f"http://127.0.0.1:{port}", args.requests, args.concurrency, args.seed))
+	finally:
+		server.terminate()
+		server.wait()
+
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+	parser.add_argument("--workers", type=int, nargs="+", default=[0, os.cpu_count() or 1])
+	parser.add_argument("--rules", type=int, default=500)
+	parser.add_argument("--requests", type=int, default=2000)
+	parser.add_argument("--concurrency", type=int, default=64)
+	parser.add_argument("--seed", type=int, default=0)
+	parser.add_argument("--output", help="JSON result file (default: stdout)")
+	args = parser.parse_args()
+
+	results = {}
+	with tempfile.TemporaryDirectory() as tmp:
+		snapshot = os.path.join(tmp, "rules.json")
+		PublishedRuleStorage(snapshot).replace_all(generate_rules(args.rules, seed=args.seed))
+		for workers in args.workers:
+			result = results[f"analysis_workers_{workers}"] = run(workers, args, snapshot)
+			print(
+				f"ANALYSIS_WORKERS={workers}: {result['throughput_rps']:.0f} req/s, "
+				f"p50 {result['p50_ms']:.1f} ms, p99 {result['p99_ms']:.1f} ms",
+				file=sys.stderr,
+			)
+	write_results("analyze_latency", vars(args), results, args.output)
+
+
+if __name__ == "__main__":
+	main()
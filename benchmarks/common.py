@@ -0,0 +1,77 @@
+"""
+Shared helpers for benchmarks: timing, environment capture and JSON output.
+"""
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from typing import Any, Callable, Dict, Optional
+
+import numpy as np
+
+from agent_project.core.tools.alerts import AlertDispatcher
+
+
+class NullDispatcher(AlertDispatcher):
+	"""Swallows alerts so benchmarks measure analysis rather than stdout."""
+
+	def dispatch(self, alert: Dict[str, Any]) -> None:
+		pass
+
+
+def environment() -> Dict[str, Any]:
+	"""Where and on what the benchmark ran, so result files can be compared fairly."""
+	try:
+		commit = subprocess.run(
+			["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+		).stdout.strip()
+	except (OSError, subprocess.CalledProcessError):
+		commit = None
+	return {
+		"commit": commit,
+		"timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+		"python": sys.version.split()[0],
+		"numpy": np.__version__,
+		"platform": platform.platform(),
+		"cpu_count": os.cpu_count(),
+	}
+
+
+def time_per_item(run: Callable[[], Any], items: int, repeat: int = 5) -> Dict[str, float]:
+	"""Time ``run`` (which processes ``items`` items) ``repeat`` times; report per-item cost.
+
+	The best run is the headline number (least disturbed by noise); the
+	median shows how stable it was.
+	"""
+	timings = []
+	for _ in range(repeat):
+		start = time.perf_counter()
+		run()
+		timings.append(time.perf_counter() - start)
+	timings.sort()
+	best = timings[0]
+	return {
+		"items": items,
+		"best_ns_per_item": 1e9 * best / items,
+		"median_ns_per_item": 1e9 * timings[len(timings) // 2] / items,
+		"items_per_second": items / best,
+	}
+
+
+def write_results(name: str, parameters: Dict[str, Any], results: Dict[str, Any], output: Optional[str]) -> None:
+	"""Write ``{"benchmark", "environment", "parameters", "results"}`` as JSON to ``output`` (or stdout)."""
+	document = {
+		"benchmark": name,
+		"environment": environment(),
+		"parameters": parameters,
+		"results": results,
+	}
+	text = json.dumps(document, indent=2, sort_keys=True)
+	if output:
+		os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+		with open(output, "w", encoding="utf-8") as f:
+			f.write(text + "\n")
+	else:
+		print(text)
@@ -0,0 +1,104 @@
+"""
+End-to-end, in-process load test of the FastAPI app.
+
+Requests go through the full ASGI stack (routing, validation, JSON
+encoding) via httpx's ASGI transport, without sockets, from many
+concurrent clients. Covers single, batch and NDJSON streaming analysis.
+
+	python -m benchmarks.load --rules 1000 --requests 5000 --output results/load.json
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+from typing import Any, Awaitable, Callable, Dict, List
+
+import httpx
+
+from agent_project.application.evaluation_service.synthetic import generate_events, generate_rules
+from agent_project.infrastructure.api import app as app_module
+
+from .common import NullDispatcher, write_results
+
+
+def _latency_summary(latencies: List[float], elapsed: float, events: int) -> Dict[str, Any]:
+	latencies.sort()
+	return {
+		"requests": len(latencies),
+		"events_per_second": events / elapsed,
+		"requests_per_second": len(latencies) / elapsed,
+		"p50_ms": 1000 * latencies[len(latencies) // 2],
+		"p99_ms": 1000 * latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))],
+	}
+
+
+async def _drive(
+	requests: List[Any], concurrency: int, send: Callable[[Any], Awaitable[None]], events_per_request: int
+) -> Dict[str, Any]:
+	latencies: List[float] = []
+	queue = iter(requests)
+
+	async def user() -> None:
+		for request in queue:
+			start = time.perf_counter()
+			await send(request)
+			latencies.append(time.perf_counter() - start)
+
+	start = time.perf_counter()
+	await asyncio.gather(*(user() for _ in range(concurrency)))
+	return _latency_summary(latencies, time.perf_counter() - start, len(latencies) * events_per_request)
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+	events = list(generate_events(args.requests, patients=args.patients, seed=args.seed))
+	batches = [events[i:i + args.batch_size] for i in range(0, len(events), args.batch_size)]
+	transport = httpx.ASGITransport(app=app_module.app)
+	async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120.0) as client:
+		async def analyze(event: Dict[str, Any]) -> None:
+			(await client.post("/v1/analyze", json=event)).raise_for_status()
+
+		async def analyze_batch(batch: List[Dict[str, Any]]) -> None:
+			(await client.post("/v1/analyze/batch", json=batch)).raise_for_status()
+
+		async def analyze_stream(batch: List[Dict[str, Any]]) -> None:
+			body = "".join(json.dumps(e) + "\n" for e in batch).encode()
+			response = await client.post("/v1/analyze/stream", content=body)
+			response.raise_for_status()
+			assert response.text.count("\n") == len(batch)
+
+		await analyze(events[0])  # warm-up: builds the rule index
+		return {
+			"analyze": await _drive(events, args.concurrency, analyze, 1),
+			"analyze_batch": await _drive(batches, args.concurrency, analyze_batch, args.batch_size),
+			"analyze_stream": await _drive(batches, args.concurrency, analyze_stream, args.batch_size),
+		}
+
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+	parser.add_argument("--rules", type=int, default=1000)
+	parser.add_argument("--requests", type=int, default=5000, help="Events to send through each endpoint")
+	parser.add_argument("--batch-size", type=int, default=100)
+	parser.add_argument("--concurrency", type=int, default=32)
+	parser.add_argument("--patients", type=int, default=1000)
+	parser.add_argument("--seed", type=int, default=0)
+	parser.add_argument("--output", help="JSON result file (default: stdout)")
+	args = parser.parse_args()
+
+	app_module.agent.alert_dispatcher = NullDispatcher()
+	for rule in generate_rules(args.rules, seed=args.seed):
+		app_module.rule_engine.add_rule(rule)
+
+	results = asyncio.run(run(args))
+	for name, summary in results.items():
+		print(
+			f"{name:15s} {summary['events_per_second']:9.0f} events/s  "
+			f"p50 {summary['p50_ms']:8.1f} ms  p99 {summary['p99_ms']:8.1f} ms",
+			file=sys.stderr,
+		)
+	write_results("load", vars(args), results, args.output)
+
+
+if __name__ == "__main__":
+	main()
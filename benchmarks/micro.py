@@ -0,0 +1,71 @@
+"""
+Micro-benchmarks for the analyze pipeline's building blocks.
+
+	python -m benchmarks.micro --rules 1000 --events 20000 --output results/micro.json
+"""
+import argparse
+import itertools
+import sys
+
+from agent_project.application.evaluation_service.synthetic import generate_events, generate_rules
+from agent_project.application.rule_engine import RuleEngine, RuleEvaluator
+from agent_project.core.agent import HealthAgent
+from agent_project.core.tools.vitals import evaluate_vitals_against_thresholds, evaluate_vitals_batch
+from agent_project.core.tools.windows import WindowStore
+
+from .common import NullDispatcher, time_per_item, write_results
+
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+	parser.add_argument("--rules", type=int, default=1000)
+	parser.add_argument("--events", type=int, default=20000)
+	parser.add_argument("--patients", type=int, default=1000)
+	parser.add_argument("--repeat", type=int, default=5)
+	parser.add_argument("--seed", type=int, default=0)
+	parser.add_argument("--output", help="JSON result file (default: stdout)")
+	args = parser.parse_args()
+
+	events = list(generate_events(args.events, patients=args.patients, seed=args.seed))
+	rules = generate_rules(args.rules, seed=args.seed)
+	engine = RuleEngine()
+	for rule in rules:
+		engine.add_rule(rule)
+	engine.process(events[0])  # build the rule index outside the timings
+
+	# RuleEvaluator has no index: sample (rule, event) pairs
+	pairs = list(itertools.islice(zip(itertools.cycle(rules), events), min(len(events), 100000)))
+
+	def evaluate_pairs():
+		for rule, event in pairs:
+			RuleEvaluator.evaluate(rule.condition, event)
+
+	def analyze_each():
+		agent = HealthAgent(NullDispatcher(), engine, WindowStore())
+		for event in events:
+			agent.analyze(event)
+
+	def analyze_many():
+		HealthAgent(NullDispatcher(), engine, WindowStore()).analyze_many(events)
+
+	benchmarks = {
+		"rule_evaluator.evaluate": (evaluate_pairs, len(pairs)),
+		"rule_engine.process": (lambda: [engine.process(e) for e in events], len(events)),
+		"rule_engine.process_batch": (lambda: engine.process_batch(events), len(events)),
+		"vitals.evaluate_vitals_against_thresholds": (
+			lambda: [evaluate_vitals_against_thresholds(e) for e in events], len(events)
+		),
+		"vitals.evaluate_vitals_batch": (lambda: evaluate_vitals_batch(events), len(events)),
+		"health_agent.analyze": (analyze_each, len(events)),
+		"health_agent.analyze_many": (analyze_many, len(events)),
+	}
+	results = {}
+	for name, (run, items) in benchmarks.items():
+		results[name] = time_per_item(run, items, args.repeat)
+		print(f"{name:45s} {results[name]['best_ns_per_item'] / 1000:10.2f} us/item", file=sys.stderr)
+
+	write_results("micro", vars(args), results, args.output)
+
+
+if __name__ == "__main__":
+	main()
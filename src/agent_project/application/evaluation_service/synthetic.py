@@ -0,0 +1,119 @@
+"""
+Synthetic vitals events and rule sets for benchmarks and evaluation datasets.
+
+Events come from a fixed population of patients whose ``meta`` follows
+skewed, realistic distributions (a few busy wards, many routine patients,
+some with conditions); each patient's vitals wander around a personal
+baseline. Everything is seeded, so the same arguments always produce the
+same data, and events are generated lazily so millions can be streamed.
+"""
+import itertools
+import random
+from typing import Any, Dict, Iterator, List
+
+from ..rule_engine import (
+	Condition,
+	ConditionOperator,
+	LogicalOperator,
+	Rule,
+	RuleCondition,
+	TagAction,
+)
+
+PATIENT_TYPES = ["routine", "cardiac", "copd", "alzheimer", "diabetic", "post_op"]
+PATIENT_TYPE_WEIGHTS = [50, 15, 10, 10, 10, 5]
+WARDS = [f"ward_{c}" for c in "ABCDEFGH"]
+DEVICES = ["wristband", "chest_patch", "pulse_oximeter", "bed_sensor"]
+VITALS = {
+	# name: (typical baseline range, per-reading noise)
+	"heart_rate": ((55, 95), 6.0),
+	"spo2": ((93, 99), 1.2),
+	"temperature_c": ((36.2, 37.2), 0.25),
+}
+
+
+def generate_patients(count: int, seed: int = 0) -> List[Dict[str, Any]]:
+	"""Per-patient ``meta`` plus vitals baselines."""
+	rng = random.Random(seed)
+	patients = []
+	for i in range(count):
+		patient_type = rng.choices(PATIENT_TYPES, PATIENT_TYPE_WEIGHTS)[0]
+		meta = {
+			"patient_id": f"p{i:06d}",
+			"device_id": f"d{i:06d}",
+			"device_type": rng.choice(DEVICES),
+			"patient_type": patient_type,
+			# Wards fill unevenly
+			"ward": WARDS[min(int(rng.expovariate(0.6)), len(WARDS) - 1)],
+			"age": int(rng.triangular(60, 100, 80)),
+			"mobility_assistance": rng.random() < 0.35,
+		}
+		baseline = {name: rng.uniform(*bounds) for name, (bounds, _) in VITALS.items()}
+		if patient_type == "cardiac":
+			baseline["heart_rate"] += 15
+		elif patient_type == "copd":
+			baseline["spo2"] -= 4
+		patients.append({"meta": meta, "baseline": baseline})
+	return patients
+
+
+def generate_events(count: int, patients: int = 1000, seed: int = 0, start: float = 1.7e9) -> Iterator[Dict[str, Any]]:
+	"""Yield ``count`` vitals events (API payload shape) from ``patients`` patients.
+
+	A minority of patients produce most readings (Zipf-like), readings are
+	about a second apart, and roughly 0.1% are falls.
+	"""
+	rng = random.Random(seed + 1)
+	population = generate_patients(patients, seed)
+	weights = list(itertools.accumulate(1.0 / (rank + 1) ** 0.8 for rank in range(patients)))
+	for i in range(count):
+		patient = rng.choices(population, cum_weights=weights)[0]
+		event: Dict[str, Any] = {}
+		for name, (_, noise) in VITALS.items():
+			value = rng.gauss(patient["baseline"][name], noise)
+			event[name] = round(value, 1) if name == "temperature_c" else round(value)
+		event["spo2"] = min(event["spo2"], 100)
+		event["fall_detected"] = rng.random() < 0.001
+		event["meta"] = dict(patient["meta"], timestamp=start + i)
+		yield event
+
+
+def generate_rules(count: int, seed: int = 0) -> List[Rule]:
+	"""``count`` rules mixing meta lookups, vitals thresholds and OR/NOT groups."""
+	rng = random.Random(seed + 2)
+	rules = []
+	for i in range(count):
+		conditions = [_random_condition(rng) for _ in range(rng.choices([1, 2, 3, 4], [3, 4, 2, 1])[0])]
+		operator = rng.choices([LogicalOperator.AND, LogicalOperator.OR, LogicalOperator.NOT], [8, 2, 1])[0]
+		if operator == LogicalOperator.NOT:
+			conditions = conditions[:1]
+		rules.append(Rule(
+			id=f"rule_{i:05d}",
+			name=f"Synthetic rule {i}",
+			priority=rng.randint(0, 20),
+			condition=RuleCondition(conditions=conditions, operator=operator),
+			action=TagAction(
+				features=[f"feature_{rng.randrange(50)}"],
+				labels=[f"label_{rng.randrange(20)}"],
+				metadata={"source": f"rule_{i:05d}"} if rng.random() < 0.2 else {},
+			),
+		))
+	return rules
+
+
+def _random_condition(rng: random.Random) -> Condition:
+	kind = rng.random()
+	if kind < 0.35:
+		field, (bounds, noise) = rng.choice(list(VITALS.items()))
+		op = rng.choice([ConditionOperator.GT, ConditionOperator.GTE, ConditionOperator.LT, ConditionOperator.LTE])
+		value = round(rng.uniform(bounds[0] - 4 * noise, bounds[1] + 4 * noise), 1)
+		return Condition(field=field, operator=op, value=value)
+	if kind < 0.6:
+		return Condition(field="meta.patient_type", operator=ConditionOperator.EQ, value=rng.choice(PATIENT_TYPES))
+	if kind < 0.75:
+		return Condition(field="meta.ward", operator=ConditionOperator.IN, value=rng.sample(WARDS, rng.randint(1, 3)))
+	if kind < 0.85:
+		return Condition(field="meta.age", operator=ConditionOperator.GTE, value=rng.randint(65, 95))
+	if kind < 0.95:
+		return Condition(field="meta.mobility_assistance", operator=ConditionOperator.EQ, value=True)
+	return Condition(field="meta.device_type", operator=ConditionOperator.NE, value=rng.choice(DEVICES))
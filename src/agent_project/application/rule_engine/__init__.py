@@ -1,7 +1,11 @@
 from .service import RuleEngine
 from .models import Rule, Condition, ConditionOperator, RuleCondition, LogicalOperator, TagAction
-from .storage import RuleStorage
+from .storage import RuleStorage, RuleSnapshot
+from .sqlite_storage import SQLiteRuleStorage
+from .published import PublishedRuleStorage
 from .evaluator import RuleEvaluator
+from .event_store import TaggedEventStore
+from .retag import Retagger
 
 __all__ = [
 	"RuleEngine",
@@ -12,6 +16,11 @@ __all__ = [
 	"LogicalOperator",
 	"TagAction",
 	"RuleStorage",
+	"RuleSnapshot",
+	"SQLiteRuleStorage",
+	"PublishedRuleStorage",
 	"RuleEvaluator",
+	"TaggedEventStore",
+	"Retagger",
 ]
 
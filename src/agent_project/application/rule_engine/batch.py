@@ -0,0 +1,195 @@
+import operator as _operator
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .compiler import compile_field_getter, compile_value_test, condition_key
+from .models import Condition, ConditionOperator, LogicalOperator, Rule, RuleCondition
+
+_NUMERIC_TYPES = frozenset({int, float, bool})
+# Integers beyond this magnitude are not exactly representable as float64
+_MAX_EXACT_INT = 2 ** 53
+
+_VECTOR_COMPARISONS: Dict[ConditionOperator, Callable[[Any, Any], Any]] = {
+	ConditionOperator.EQ: _operator.eq,
+	ConditionOperator.NE: _operator.ne,
+	ConditionOperator.GT: _operator.gt,
+	ConditionOperator.GTE: _operator.ge,
+	ConditionOperator.LT: _operator.lt,
+	ConditionOperator.LTE: _operator.le,
+}
+
+
+def _exact_number(value: Any) -> bool:
+	kind = type(value)
+	if kind is int:
+		return -_MAX_EXACT_INT <= value <= _MAX_EXACT_INT
+	return kind in _NUMERIC_TYPES
+
+
+class _Column:
+	"""Values of one field path across a batch, with lazily built arrays."""
+
+	__slots__ = ("values", "_present", "_numeric", "_numeric_checked", "_codes", "_codes_checked")
+
+	def __init__(self, values: List[Any]) -> None:
+		self.values = values
+		self._present: Optional[np.ndarray] = None
+		self._numeric: Optional[np.ndarray] = None
+		self._numeric_checked = False
+		self._codes: Optional[Tuple[List[Any], np.ndarray]] = None
+		self._codes_checked = False
+
+	@property
+	def present(self) -> np.ndarray:
+		if self._present is None:
+			self._present = np.fromiter(
+				(v is not None for v in self.values), dtype=bool, count=len(self.values)
+			)
+		return self._present
+
+	@property
+	def numeric(self) -> Optional[np.ndarray]:
+		"""float64 view (NaN where missing), or None if any value isn't a plain number."""
+		if not self._numeric_checked:
+			self._numeric_checked = True
+			if all(v is None or _exact_number(v) for v in self.values):
+				self._numeric = np.array(self.values, dtype=np.float64)
+		return self._numeric
+
+	@property
+	def codes(self) -> Optional[Tuple[List[Any], np.ndarray]]:
+		"""Dictionary encoding ``(distinct values, code per row)``, or None if unhashable.
+
+		Each distinct value is kept as first seen; equal values share a code,
+		and every operator gives the same answer for equal values.
+		"""
+		if not self._codes_checked:
+			self._codes_checked = True
+			lookup: Dict[Any, int] = {}
+			distinct: List[Any] = []
+			codes = np.empty(len(self.values), dtype=np.intp)
+			try:
+				for i, value in enumerate(self.values):
+					code = lookup.get(value)
+					if code is None:
+						code = lookup[value] = len(distinct)
+						distinct.append(value)
+					codes[i] = code
+			except TypeError:
+				return None
+			self._codes = (distinct, codes)
+		return self._codes
+
+
+class BatchEvaluator:
+	"""Evaluates rules over a batch of events as boolean masks.
+
+	Every referenced field path is extracted once into a column. Numeric
+	comparisons run as NumPy array operations; other conditions are tested
+	element-wise on the already-extracted column values.
+	"""
+
+	def __init__(self, events: Sequence[Dict[str, Any]]) -> None:
+		self.events = events
+		self.size = len(events)
+		self._columns: Dict[str, _Column] = {}
+		# Masks of conditions shared between rules, computed once per batch
+		self._masks: Dict[Any, np.ndarray] = {}
+
+	def column(self, field_path: str) -> _Column:
+		column = self._columns.get(field_path)
+		if column is None:
+			get = compile_field_getter(field_path)
+			column = self._columns[field_path] = _Column([get(e) for e in self.events])
+		return column
+
+	def condition_mask(self, condition: Condition) -> np.ndarray:
+		"""Boolean mask of the events matching ``condition``. Callers must not modify it."""
+		key = condition_key(condition)
+		mask = self._masks.get(key) if key is not None else None
+		if mask is None:
+			mask = self._condition_mask(condition)
+			if key is not None:
+				self._masks[key] = mask
+		return mask
+
+	def _condition_mask(self, condition: Condition) -> np.ndarray:
+		column = self.column(condition.field)
+		op = condition.operator
+
+		if op in (ConditionOperator.EXISTS, ConditionOperator.NOT_EXISTS):
+			exists = (op == ConditionOperator.EXISTS) != condition.negate
+			return column.present if exists else ~column.present
+
+		compare = _VECTOR_COMPARISONS.get(op)
+		if compare is not None and _exact_number(condition.value):
+			numeric = column.numeric
+			if numeric is not None:
+				mask = compare(numeric, condition.value)
+				if condition.negate:
+					mask = ~mask
+				# Missing fields never match, with or without negation
+				return mask & column.present
+
+		test = compile_value_test(condition)
+		encoded = column.codes
+		if encoded is not None:
+			# Test each distinct value once, then broadcast through the codes
+			distinct, codes = encoded
+			table = np.fromiter((bool(test(v)) for v in distinct), dtype=bool, count=len(distinct))
+			return table[codes]
+		return np.fromiter((bool(test(v)) for v in column.values), dtype=bool, count=self.size)
+
+	def group_mask(self, group: RuleCondition) -> np.ndarray:
+		"""Mask of a condition group; nested groups are combined bottom-up without recursion."""
+		masks: Dict[int, np.ndarray] = {}  # id(RuleCondition) -> mask
+		stack: List[Tuple[RuleCondition, bool]] = [(group, False)]
+		while stack:
+			current, expanded = stack.pop()
+			if id(current) in masks:
+				continue
+			if not expanded:
+				stack.append((current, True))
+				stack.extend((c, False) for c in current.conditions if isinstance(c, RuleCondition))
+				continue
+			masks[id(current)] = self._combine(current, [
+				masks[id(c)] if isinstance(c, RuleCondition) else self.condition_mask(c)
+				for c in current.conditions
+			])
+		return masks[id(group)]
+
+	def _combine(self, group: RuleCondition, masks: List[np.ndarray]) -> np.ndarray:
+		if not group.conditions:
+			return np.ones(self.size, dtype=bool)
+		if group.operator == LogicalOperator.NOT:
+			if len(group.conditions) != 1:
+				raise ValueError("NOT operator requires exactly one condition")
+			return ~masks[0]
+		if group.operator == LogicalOperator.AND:
+			return np.logical_and.reduce(masks)
+		if group.operator == LogicalOperator.OR:
+			return np.logical_or.reduce(masks)
+		raise ValueError(f"Unknown logical operator: {group.operator}")
+
+	def match(self, rules: Sequence[Rule], timings: Optional[List[int]] = None) -> List[List[int]]:
+		"""Return, per event, the positions of matching rules in ``rules`` order.
+
+		With ``timings``, the nanoseconds spent on each rule's mask are
+		appended to it (column extraction counts towards the first rule
+		that references a field).
+		"""
+		if not rules or not self.size:
+			return [[] for _ in range(self.size)]
+		if timings is None:
+			masks = [self.group_mask(rule.condition) for rule in rules]
+		else:
+			masks = []
+			for rule in rules:
+				start = time.perf_counter_ns()
+				masks.append(self.group_mask(rule.condition))
+				timings.append(time.perf_counter_ns() - start)
+		# Rows are events, columns are rules
+		matrix = np.stack(masks, axis=1)
+		return [np.flatnonzero(row).tolist() for row in matrix]
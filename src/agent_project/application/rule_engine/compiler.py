@@ -0,0 +1,589 @@
+import operator as _operator
+import time
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, Sequence, Set, Tuple
+
+from .evaluator import EVALUATION_ERRORS
+from .models import Condition, ConditionOperator, LogicalOperator, Rule, RuleCondition
+
+Predicate = Callable[[Dict[str, Any]], bool]
+FieldGetter = Callable[[Dict[str, Any]], Any]
+
+# Adaptive groups time every condition on one evaluation in ADAPTIVE_SAMPLE_EVERY
+# and reorder after ADAPTIVE_REORDER_AFTER such samples
+ADAPTIVE_SAMPLE_EVERY = 64
+ADAPTIVE_REORDER_AFTER = 32
+
+# Per-event condition result values in a results bytearray; 0 means not evaluated yet
+RESULT_FALSE, RESULT_TRUE = 1, 2
+
+# Node kinds of a ConditionGraph
+_LEAF, _ALL, _ANY, _NOT, _ALWAYS, _INVALID_NOT = range(6)
+
+_COMPARISONS: Dict[ConditionOperator, Callable[[Any, Any], Any]] = {
+	ConditionOperator.EQ: _operator.eq,
+	ConditionOperator.NE: _operator.ne,
+	ConditionOperator.GT: _operator.gt,
+	ConditionOperator.GTE: _operator.ge,
+	ConditionOperator.LT: _operator.lt,
+	ConditionOperator.LTE: _operator.le,
+}
+
+
+def compile_field_getter(field_path: str) -> FieldGetter:
+	"""Return a getter for a dot-notation path with the path split once.
+
+	Mirrors ``RuleEvaluator._get_field_value``: traversal stops with ``None``
+	as soon as a non-dict value is reached.
+	"""
+	keys = tuple(field_path.split("."))
+
+	if len(keys) == 1:
+		(key,) = keys
+
+		def get_one(data: Dict[str, Any]) -> Any:
+			if isinstance(data, dict):
+				return data.get(key)
+			return None
+
+		return get_one
+
+	if len(keys) == 2:
+		first, second = keys
+
+		def get_two(data: Dict[str, Any]) -> Any:
+			if isinstance(data, dict):
+				value = data.get(first)
+				if isinstance(value, dict):
+					return value.get(second)
+			return None
+
+		return get_two
+
+	def get_path(data: Dict[str, Any]) -> Any:
+		value: Any = data
+		for key in keys:
+			if isinstance(value, dict):
+				value = value.get(key)
+			else:
+				return None
+		return value
+
+	return get_path
+
+
+def compile_condition(condition: Condition) -> Predicate:
+	"""Compile a single condition into a predicate with its operator pre-resolved."""
+	get = compile_field_getter(condition.field)
+	op = condition.operator
+	expected = condition.value
+	negate = condition.negate
+
+	if op == ConditionOperator.EXISTS:
+		if negate:
+			return lambda data: get(data) is None
+		return lambda data: get(data) is not None
+
+	if op == ConditionOperator.NOT_EXISTS:
+		if negate:
+			return lambda data: get(data) is not None
+		return lambda data: get(data) is None
+
+	compare = _COMPARISONS.get(op)
+	if compare is not None:
+		if negate:
+			def negated_compare(data: Dict[str, Any]) -> bool:
+				value = get(data)
+				if value is None:
+					return False
+				return not compare(value, expected)
+
+			return negated_compare
+
+		def plain_compare(data: Dict[str, Any]) -> Any:
+			value = get(data)
+			if value is None:
+				return False
+			return compare(value, expected)
+
+		return plain_compare
+
+	if op in (ConditionOperator.IN, ConditionOperator.NOT_IN):
+		# Non-list operands never match, regardless of negation
+		if not isinstance(expected, list):
+			return lambda data: False
+		want_member = (op == ConditionOperator.IN) != negate
+
+		def membership(data: Dict[str, Any]) -> bool:
+			value = get(data)
+			if value is None:
+				return False
+			return (value in expected) == want_member
+
+		return membership
+
+	if op == ConditionOperator.CONTAINS:
+		def contains(data: Dict[str, Any]) -> Any:
+			value = get(data)
+			if not isinstance(value, (str, list)):
+				return False
+			result = expected in value
+			return not result if negate else result
+
+		return contains
+
+	return lambda data: False
+
+
+def compile_value_test(condition: Condition) -> Callable[[Any], Any]:
+	"""Compile a condition into a test of an already-extracted field value.
+
+	Used where field values are gathered up front (e.g. batch columns); the
+	result is truthy exactly when ``compile_condition`` would match.
+	"""
+	op = condition.operator
+	expected = condition.value
+	negate = condition.negate
+
+	if op == ConditionOperator.EXISTS:
+		return (lambda v: v is None) if negate else (lambda v: v is not None)
+	if op == ConditionOperator.NOT_EXISTS:
+		return (lambda v: v is not None) if negate else (lambda v: v is None)
+
+	compare = _COMPARISONS.get(op)
+	if compare is not None:
+		if negate:
+			return lambda v: v is not None and not compare(v, expected)
+		return lambda v: v is not None and compare(v, expected)
+
+	if op in (ConditionOperator.IN, ConditionOperator.NOT_IN):
+		if not isinstance(expected, list):
+			return lambda v: False
+		want_member = (op == ConditionOperator.IN) != negate
+		return lambda v: v is not None and (v in expected) == want_member
+
+	if op == ConditionOperator.CONTAINS:
+		if negate:
+			return lambda v: isinstance(v, (str, list)) and expected not in v
+		return lambda v: isinstance(v, (str, list)) and expected in v
+
+	return lambda v: False
+
+
+def _raise_not_arity(data: Dict[str, Any]) -> bool:
+	raise ValueError("NOT operator requires exactly one condition")
+
+
+class ConditionStats:
+	"""Sampled pass counts and costs of a group's conditions, and the order they imply.
+
+	``short_circuit`` is the condition result that settles the group: False
+	for AND, True for OR. Conditions are ranked by expected cost per chance
+	of settling the group (``cost / P(settles)``), the optimal order for
+	independent conditions. ``order`` (declaration indices) is replaced,
+	never mutated, so evaluators can detect a change by identity.
+	"""
+
+	__slots__ = ("predicates", "short_circuit", "reorder_after", "passes", "costs", "samples", "order")
+
+	def __init__(self, predicates: Sequence[Predicate], short_circuit: bool, reorder_after: int) -> None:
+		self.predicates = tuple(predicates)
+		self.short_circuit = short_circuit
+		self.reorder_after = reorder_after
+		self.passes = [0] * len(self.predicates)
+		self.costs = [0] * len(self.predicates)  # nanoseconds
+		self.samples = 0
+		self.order: Tuple[int, ...] = tuple(range(len(self.predicates)))
+
+	def sample(self, data: Dict[str, Any]) -> bool:
+		"""Time every condition on ``data`` and reorder if due.
+
+		Returns (or raises) exactly what evaluation in declaration order would.
+		"""
+		clock = time.perf_counter_ns
+		short_circuit = self.short_circuit
+		settled = not short_circuit
+		outcome: Optional[bool] = None
+		error: Optional[Exception] = None
+		for index, predicate in enumerate(self.predicates):
+			start = clock()
+			try:
+				passed = bool(predicate(data))
+			except EVALUATION_ERRORS as exc:
+				# A condition that raises never settles the group
+				passed = settled
+				if outcome is None and error is None:
+					error = exc
+			else:
+				if outcome is None and error is None and passed is short_circuit:
+					outcome = short_circuit
+			self.passes[index] += passed
+			self.costs[index] += clock() - start
+		self.samples += 1
+		if self.samples >= self.reorder_after:
+			self.reorder()
+		if error is not None:
+			raise error
+		return settled if outcome is None else outcome
+
+	def reorder(self) -> Tuple[int, ...]:
+		"""Rank conditions from the samples so far, then decay them to follow drifting data."""
+		n = self.samples
+
+		def rank(i: int) -> Tuple[float, int]:
+			settles = self.passes[i] / n
+			if not self.short_circuit:
+				settles = 1.0 - settles
+			return (self.costs[i] / n / max(settles, 1e-3), i)
+
+		order = tuple(sorted(range(len(self.passes)), key=rank))
+		if order != self.order:
+			self.order = order
+		self.passes = [p // 2 for p in self.passes]
+		self.costs = [c // 2 for c in self.costs]
+		self.samples = n // 2
+		return self.order
+
+
+def _adaptive_group(
+	predicates: Sequence[Predicate], short_circuit: bool, sample_every: int, reorder_after: int
+) -> Tuple[Predicate, ConditionStats]:
+	"""AND (``short_circuit`` False) / OR group predicate that reorders its conditions.
+
+	Results match evaluation in declaration order: if the current order
+	raises, the event is re-evaluated in declaration order, which either
+	returns the declared result or raises the declared error. (The converse,
+	a reordered evaluation settling before a condition that would have
+	raised, yields a result where declaration order raised.)
+	"""
+	stats = ConditionStats(predicates, short_circuit, reorder_after)
+	declared = stats.predicates
+	settled = not short_circuit
+	order = stats.order
+	ordered = declared
+	countdown = sample_every
+
+	def evaluate(data: Dict[str, Any]) -> bool:
+		nonlocal order, ordered, countdown
+		countdown -= 1
+		if not countdown:
+			countdown = sample_every
+			result = stats.sample(data)
+			if stats.order is not order:
+				order = stats.order
+				ordered = tuple(declared[i] for i in order)
+			return result
+		try:
+			if short_circuit:
+				for predicate in ordered:
+					if predicate(data):
+						return True
+				return False
+			for predicate in ordered:
+				if not predicate(data):
+					return False
+			return True
+		except Exception:
+			if ordered is declared:
+				raise
+			for predicate in declared:
+				if bool(predicate(data)) is short_circuit:
+					return short_circuit
+			return settled
+
+	return evaluate, stats
+
+
+def _freeze(value: Any) -> Hashable:
+	"""Hashable form of a condition value that tells apart values of different types."""
+	if isinstance(value, list):
+		return ("list", tuple(_freeze(v) for v in value))
+	if isinstance(value, dict):
+		return ("dict", tuple(sorted((k, _freeze(v)) for k, v in value.items())))
+	hash(value)
+	# 1, 1.0 and True are equal as keys but not interchangeable as operands
+	return (type(value).__name__, value)
+
+
+def compile_fingerprint(fields: Iterable[str]) -> Callable[[Dict[str, Any]], Hashable]:
+	"""Return a function keying an event by the values at ``fields``.
+
+	Events with equal keys look the same to any condition on those fields;
+	raises TypeError for values that can't be keyed.
+	"""
+	getters = tuple(compile_field_getter(field) for field in sorted(fields))
+
+	def fingerprint(data: Dict[str, Any]) -> Hashable:
+		return tuple(_freeze(get(data)) for get in getters)
+
+	return fingerprint
+
+
+def condition_key(condition: Condition) -> Optional[Hashable]:
+	"""Identity of a condition for sharing results, or None if it can't be keyed."""
+	try:
+		value = _freeze(condition.value)
+	except TypeError:
+		return None
+	return (condition.field, condition.operator, value, condition.negate)
+
+
+def is_nested(condition: RuleCondition) -> bool:
+	return any(isinstance(c, RuleCondition) for c in condition.conditions)
+
+
+def condition_fields(condition: RuleCondition) -> Set[str]:
+	"""Field paths referenced anywhere in a condition tree."""
+	fields: Set[str] = set()
+	stack = [condition]
+	while stack:
+		for child in stack.pop().conditions:
+			if isinstance(child, RuleCondition):
+				stack.append(child)
+			else:
+				fields.add(child.field)
+	return fields
+
+
+class ConditionGraph:
+	"""Condition trees compiled into one flattened boolean DAG.
+
+	``add`` returns the node evaluating a group. Nodes are numbered
+	children first. Nested groups with their parent's operator are spliced
+	into it, single-child AND/OR groups and double negations collapse, and
+	identical conditions and subtrees become one node, so ``evaluate`` runs
+	each at most once per ``results`` bytearray (one byte per node). Both
+	building and evaluation walk the tree with explicit stacks, so depth is
+	not bounded by the recursion limit. Children are evaluated in
+	declaration order with short-circuiting, matching ``RuleEvaluator``.
+	"""
+
+	def __init__(self) -> None:
+		self.kinds: List[int] = []
+		self.children: List[Tuple[int, ...]] = []
+		self.predicates: List[Optional[Predicate]] = []
+		self._nodes: Dict[Hashable, int] = {}
+
+	@property
+	def size(self) -> int:
+		return len(self.kinds)
+
+	def new_results(self) -> bytearray:
+		return bytearray(len(self.kinds))
+
+	def leaf(self, condition: Condition) -> int:
+		"""Node of a single condition."""
+		key = condition_key(condition)
+		node = self._nodes.get(key) if key is not None else None
+		if node is None:
+			node = self._node(_LEAF, (), compile_condition(condition))
+			if key is not None:
+				self._nodes[key] = node
+		return node
+
+	def add(self, group: RuleCondition) -> int:
+		"""Node of a condition group, adding its subtree to the graph."""
+		built: Dict[int, int] = {}  # id(RuleCondition) -> node
+		stack: List[Tuple[RuleCondition, bool]] = [(group, False)]
+		while stack:
+			current, expanded = stack.pop()
+			if id(current) in built:
+				continue
+			if current.operator == LogicalOperator.NOT and len(current.conditions) > 1:
+				# Raises when reached, without evaluating its conditions
+				built[id(current)] = self._node(_INVALID_NOT, ())
+				continue
+			if not expanded:
+				stack.append((current, True))
+				stack.extend((c, False) for c in current.conditions if isinstance(c, RuleCondition))
+				continue
+			children = [built[id(c)] if isinstance(c, RuleCondition) else self.leaf(c) for c in current.conditions]
+			built[id(current)] = self._group(current, children)
+		return built[id(group)]
+
+	def evaluate(self, root: int, data: Dict[str, Any], results: bytearray) -> bool:
+		"""Result of node ``root`` for ``data``, filling ``results`` along the way."""
+		state = results[root]
+		if state:
+			return state == RESULT_TRUE
+		kinds, children, predicates = self.kinds, self.children, self.predicates
+		stack = [root]
+		positions = [0]  # next child to look at, per stack entry
+		while stack:
+			node = stack[-1]
+			kind = kinds[node]
+			if kind == _LEAF:
+				results[node] = RESULT_TRUE if predicates[node](data) else RESULT_FALSE
+			elif kind == _ALWAYS:
+				results[node] = RESULT_TRUE
+			elif kind == _INVALID_NOT:
+				raise ValueError("NOT operator requires exactly one condition")
+			elif kind == _NOT:
+				(child,) = children[node]
+				state = results[child]
+				if not state:
+					stack.append(child)
+					positions.append(0)
+					continue
+				results[node] = RESULT_FALSE if state == RESULT_TRUE else RESULT_TRUE
+			else:
+				settles = RESULT_FALSE if kind == _ALL else RESULT_TRUE
+				kids = children[node]
+				i = positions[-1]
+				pending = -1
+				while i < len(kids):
+					child = kids[i]
+					state = results[child]
+					if not state:
+						if kinds[child] != _LEAF:
+							pending = child
+							break
+						# Conditions are evaluated in place rather than on the stack
+						state = results[child] = RESULT_TRUE if predicates[child](data) else RESULT_FALSE
+					if state == settles:
+						break
+					i += 1
+				if pending >= 0:
+					positions[-1] = i
+					stack.append(pending)
+					positions.append(0)
+					continue
+				if i < len(kids):
+					results[node] = settles
+				else:
+					results[node] = RESULT_TRUE if kind == _ALL else RESULT_FALSE
+			stack.pop()
+			positions.pop()
+		return results[root] == RESULT_TRUE
+
+	def _group(self, group: RuleCondition, children: List[int]) -> int:
+		if not group.conditions:
+			return self._node(_ALWAYS, ())
+		if group.operator == LogicalOperator.NOT:
+			(child,) = children
+			if self.kinds[child] == _NOT:
+				# not not x == x; results are stored as booleans anyway
+				return self.children[child][0]
+			return self._node(_NOT, (child,))
+		if group.operator == LogicalOperator.AND:
+			kind = _ALL
+		elif group.operator == LogicalOperator.OR:
+			kind = _ANY
+		else:
+			raise ValueError(f"Unknown logical operator: {group.operator}")
+		flat: List[int] = []
+		for child in children:
+			if self.kinds[child] == kind:
+				flat.extend(self.children[child])
+			else:
+				flat.append(child)
+		# A repeated child can't change the outcome after its first evaluation
+		flat = list(dict.fromkeys(flat))
+		if len(flat) == 1:
+			return flat[0]
+		return self._node(kind, tuple(flat))
+
+	def _node(self, kind: int, children: Tuple[int, ...], predicate: Optional[Predicate] = None) -> int:
+		if kind != _LEAF:
+			key = (kind, children)
+			node = self._nodes.get(key)
+			if node is not None:
+				return node
+			self._nodes[key] = len(self.kinds)
+		self.kinds.append(kind)
+		self.children.append(children)
+		self.predicates.append(predicate)
+		return len(self.kinds) - 1
+
+
+def _compile_graph(condition: RuleCondition) -> Predicate:
+	graph = ConditionGraph()
+	root = graph.add(condition)
+	evaluate = graph.evaluate
+	return lambda data: evaluate(root, data, graph.new_results())
+
+
+def compile_rule_condition(condition: RuleCondition) -> Predicate:
+	"""Compile a condition group into a single short-circuiting predicate.
+
+	Produces the same results (and errors) as ``RuleEvaluator.evaluate``.
+	Nested groups are compiled into a ``ConditionGraph``.
+	"""
+	if not condition.conditions:
+		return lambda data: True
+	if is_nested(condition):
+		return _compile_graph(condition)
+
+	predicates: List[Predicate] = [compile_condition(c) for c in condition.conditions]
+
+	if condition.operator == LogicalOperator.AND:
+		if len(predicates) == 1:
+			(only,) = predicates
+			return lambda data: bool(only(data))
+
+		def all_of(data: Dict[str, Any]) -> bool:
+			for predicate in predicates:
+				if not predicate(data):
+					return False
+			return True
+
+		return all_of
+
+	if condition.operator == LogicalOperator.OR:
+		if len(predicates) == 1:
+			(only,) = predicates
+			return lambda data: bool(only(data))
+
+		def any_of(data: Dict[str, Any]) -> bool:
+			for predicate in predicates:
+				if predicate(data):
+					return True
+			return False
+
+		return any_of
+
+	if condition.operator == LogicalOperator.NOT:
+		if len(predicates) != 1:
+			return _raise_not_arity
+		(only,) = predicates
+		return lambda data: not only(data)
+
+	raise ValueError(f"Unknown logical operator: {condition.operator}")
+
+
+def compile_adaptive_condition(
+	condition: RuleCondition,
+	sample_every: int = ADAPTIVE_SAMPLE_EVERY,
+	reorder_after: int = ADAPTIVE_REORDER_AFTER,
+) -> Tuple[Predicate, Optional[ConditionStats]]:
+	"""Like ``compile_rule_condition``, but flat AND/OR groups of several
+	conditions reorder themselves by sampled selectivity and cost.
+
+	Returns the predicate and its statistics (None if the group isn't adaptive).
+	"""
+	flat_group = condition.operator in (LogicalOperator.AND, LogicalOperator.OR) and not is_nested(condition)
+	if flat_group and len(condition.conditions) > 1:
+		predicates = [compile_condition(c) for c in condition.conditions]
+		return _adaptive_group(predicates, condition.operator == LogicalOperator.OR, sample_every, reorder_after)
+	return compile_rule_condition(condition), None
+
+
+class CompiledRule:
+	"""A rule paired with its precompiled condition predicate.
+
+	With ``adaptive``, the predicate reorders the rule's conditions at
+	runtime (see ``compile_adaptive_condition``); ``stats`` then holds the
+	sampled statistics.
+	"""
+
+	__slots__ = ("rule", "predicate", "stats")
+
+	def __init__(self, rule: Rule, adaptive: bool = False) -> None:
+		self.rule = rule
+		self.stats: Optional[ConditionStats] = None
+		if adaptive:
+			self.predicate, self.stats = compile_adaptive_condition(rule.condition)
+		else:
+			self.predicate = compile_rule_condition(rule.condition)
+
+	def matches(self, data: Dict[str, Any]) -> bool:
+		return self.predicate(data)
@@ -1,6 +1,10 @@
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Iterator, List, Optional, Tuple
 from .models import Condition, ConditionOperator, RuleCondition, LogicalOperator
 
+# What evaluating conditions against event data can raise: incomparable
+# values, a malformed NOT group, numbers too large to convert
+EVALUATION_ERRORS = (TypeError, ValueError, OverflowError)
+
 
 class RuleEvaluator:
 	"""Evaluates rule conditions against event data."""
@@ -71,10 +75,18 @@ class RuleEvaluator:
 
 	@staticmethod
 	def evaluate(condition: RuleCondition, data: Dict[str, Any]) -> bool:
-		"""Evaluate a rule condition group against event data."""
+		"""Evaluate a rule condition group against event data.
+
+		Nested groups are walked with an explicit stack rather than
+		recursion, so tree depth isn't limited by the interpreter.
+		"""
 		if not condition.conditions:
 			return True
 
+		for cond in condition.conditions:
+			if isinstance(cond, RuleCondition):
+				return RuleEvaluator._evaluate_tree(condition, data)
+
 		if condition.operator == LogicalOperator.AND:
 			return all(
 				RuleEvaluator._evaluate_condition(cond, data) for cond in condition.conditions
@@ -90,3 +102,48 @@ class RuleEvaluator:
 		else:
 			raise ValueError(f"Unknown logical operator: {condition.operator}")
 
+	@staticmethod
+	def _evaluate_tree(condition: RuleCondition, data: Dict[str, Any]) -> bool:
+		"""Evaluate a non-empty group containing nested groups."""
+		RuleEvaluator._check_group(condition)
+		# (group, its remaining children) for every group being evaluated
+		stack: List[Tuple[RuleCondition, Iterator[Any]]] = [(condition, iter(condition.conditions))]
+		result: Optional[bool] = None  # result of the child that just finished
+		while True:
+			group, children = stack[-1]
+			done: Optional[bool] = None
+			if result is not None:
+				if group.operator == LogicalOperator.NOT:
+					done = not result
+				elif group.operator == LogicalOperator.AND and not result:
+					done = False
+				elif group.operator == LogicalOperator.OR and result:
+					done = True
+				result = None
+			if done is None:
+				child = next(children, None)
+				if child is None:
+					# Every child passed (AND) or failed (OR)
+					done = group.operator == LogicalOperator.AND
+				elif isinstance(child, RuleCondition):
+					if not child.conditions:
+						result = True
+					else:
+						RuleEvaluator._check_group(child)
+						stack.append((child, iter(child.conditions)))
+					continue
+				else:
+					result = RuleEvaluator._evaluate_condition(child, data)
+					continue
+			stack.pop()
+			if not stack:
+				return done
+			result = done
+
+	@staticmethod
+	def _check_group(condition: RuleCondition) -> None:
+		if condition.operator == LogicalOperator.NOT:
+			if len(condition.conditions) != 1:
+				raise ValueError("NOT operator requires exactly one condition")
+		elif condition.operator not in (LogicalOperator.AND, LogicalOperator.OR):
+			raise ValueError(f"Unknown logical operator: {condition.operator}")
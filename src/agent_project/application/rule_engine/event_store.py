@@ -0,0 +1,241 @@
+import math
+import os
+import threading
+from bisect import bisect_left, bisect_right, insort
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from .compiler import FieldGetter, compile_field_getter
+from .models import Condition, ConditionOperator, LogicalOperator, RuleCondition
+
+_RANGE_OPERATORS = (
+	ConditionOperator.GT,
+	ConditionOperator.GTE,
+	ConditionOperator.LT,
+	ConditionOperator.LTE,
+)
+
+
+def _is_number(value: Any) -> bool:
+	return isinstance(value, (int, float)) and not (isinstance(value, float) and math.isnan(value))
+
+
+class _FieldValues:
+	"""Stored events by the value of one field path."""
+
+	__slots__ = ("get", "present", "eq", "numbers")
+
+	def __init__(self, field: str) -> None:
+		self.get: FieldGetter = compile_field_getter(field)
+		self.present: Set[int] = set()
+		self.eq: Dict[Any, Set[int]] = {}
+		self.numbers: List[Tuple[float, int]] = []  # (value, event id), sorted
+
+	def add(self, event_id: int, event: Dict[str, Any]) -> None:
+		value = self.get(event)
+		if value is None:
+			return
+		self.present.add(event_id)
+		try:
+			self.eq.setdefault(value, set()).add(event_id)
+		except TypeError:
+			pass
+		if _is_number(value):
+			insort(self.numbers, (value, event_id))
+
+	def remove(self, event_id: int, event: Dict[str, Any]) -> None:
+		value = self.get(event)
+		if value is None:
+			return
+		self.present.discard(event_id)
+		try:
+			ids = self.eq.get(value)
+		except TypeError:
+			ids = None
+		if ids is not None:
+			ids.discard(event_id)
+			if not ids:
+				del self.eq[value]
+		if _is_number(value):
+			i = bisect_left(self.numbers, (value, event_id))
+			if i < len(self.numbers) and self.numbers[i] == (value, event_id):
+				del self.numbers[i]
+
+	def matching(self, condition: Condition) -> Optional[Set[int]]:
+		"""Events that may satisfy ``condition``, or None if the index can't tell."""
+		op = condition.operator
+		expected = condition.value
+		if op in (ConditionOperator.EXISTS, ConditionOperator.NOT_EXISTS):
+			if (op == ConditionOperator.EXISTS) != condition.negate:
+				return set(self.present)
+			return None
+		if condition.negate:
+			return None
+		try:
+			if op == ConditionOperator.EQ:
+				return set(self.eq.get(expected, ()))
+			if op == ConditionOperator.IN:
+				if not isinstance(expected, list):
+					return set()
+				found: Set[int] = set()
+				for value in expected:
+					found.update(self.eq.get(value, ()))
+				return found
+		except TypeError:
+			return None
+		if op in _RANGE_OPERATORS and _is_number(expected):
+			keys = self.numbers
+			# Pair bounds sort before/after every event id with the same value
+			if op == ConditionOperator.GT:
+				selected = keys[bisect_right(keys, (expected, math.inf)):]
+			elif op == ConditionOperator.GTE:
+				selected = keys[bisect_left(keys, (expected, -math.inf)):]
+			elif op == ConditionOperator.LT:
+				selected = keys[:bisect_left(keys, (expected, -math.inf))]
+			else:
+				selected = keys[:bisect_right(keys, (expected, math.inf))]
+			return {event_id for _, event_id in selected}
+		return None
+
+
+class TaggedEventStore:
+	"""In-memory store of analyzed events and their tags, for re-tagging.
+
+	Events get ids ``"<origin>-<n>"`` with an increasing ``n``; ``origin``
+	defaults to the process id, so ids handed out by different workers
+	never collide and a worker never returns another worker's event for an
+	id it didn't issue. The oldest events are evicted beyond
+	``max_events``. Stored events are kept without their ``tags``, which
+	are held separately so they can be rewritten in place. Two indexes find
+	the events a rule change can affect: event ids by matched rule, and
+	event ids by field value for every field path a changed rule has
+	referenced so far (built on first use, then kept up to date).
+	"""
+
+	def __init__(self, max_events: int = 100000, origin: Optional[str] = None) -> None:
+		if max_events < 1:
+			raise ValueError("max_events must be positive")
+		self.max_events = max_events
+		self.origin = str(os.getpid()) if origin is None else origin
+		self._prefix = self.origin + "-"
+		self._lock = threading.Lock()
+		self._next_id = 0
+		self._events: "OrderedDict[int, Dict[str, Any]]" = OrderedDict()
+		self._tags: Dict[int, Dict[str, Any]] = {}
+		self._by_rule: Dict[str, Set[int]] = {}
+		self._fields: Dict[str, _FieldValues] = {}
+
+	def __len__(self) -> int:
+		return len(self._events)
+
+	def add(self, tagged_event: Dict[str, Any]) -> str:
+		"""Store an event tagged by ``RuleEngine.process``; returns its id."""
+		event = {k: v for k, v in tagged_event.items() if k != "tags"}
+		tags = tagged_event.get("tags") or {}
+		with self._lock:
+			event_id = self._next_id
+			self._next_id += 1
+			self._events[event_id] = event
+			self._set_tags(event_id, tags)
+			for index in self._fields.values():
+				index.add(event_id, event)
+			if len(self._events) > self.max_events:
+				self._evict()
+		return self._prefix + str(event_id)
+
+	def get(self, event_id: str) -> Optional[Dict[str, Any]]:
+		"""The stored event with its current tags, or None if unknown, evicted or issued elsewhere."""
+		key = self._key(event_id)
+		with self._lock:
+			event = self._events.get(key)
+			if event is None:
+				return None
+			return {**event, "tags": self._tags[key]}
+
+	def events(self, event_ids: Iterable[str]) -> List[Tuple[str, Dict[str, Any]]]:
+		"""``(id, event without tags)`` for the ids still stored, oldest first."""
+		keys = sorted(k for k in map(self._key, event_ids) if k is not None)
+		with self._lock:
+			return [(self._prefix + str(k), self._events[k]) for k in keys if k in self._events]
+
+	def ids(self) -> Set[str]:
+		with self._lock:
+			return self._ids(self._events)
+
+	def matched_by(self, rule_id: str) -> Set[str]:
+		"""Events whose current tags list ``rule_id`` in ``matched_rules``."""
+		with self._lock:
+			return self._ids(self._by_rule.get(rule_id, ()))
+
+	def candidates(self, condition: RuleCondition) -> Optional[Set[str]]:
+		"""Events that may satisfy ``condition``, or None if any event might."""
+		with self._lock:
+			keys = self._candidates(condition)
+			return None if keys is None else self._ids(keys)
+
+	def update_tags(self, event_id: str, tags: Dict[str, Any]) -> bool:
+		"""Replace an event's tags; False if it is no longer stored."""
+		key = self._key(event_id)
+		with self._lock:
+			if key not in self._events:
+				return False
+			self._unset_tags(key)
+			self._set_tags(key, tags)
+			return True
+
+	def _key(self, event_id: str) -> Optional[int]:
+		"""Internal key of an id this store issued, else None."""
+		if not isinstance(event_id, str) or not event_id.startswith(self._prefix):
+			return None
+		n = event_id[len(self._prefix):]
+		return int(n) if n.isdigit() else None
+
+	def _ids(self, keys: Iterable[int]) -> Set[str]:
+		prefix = self._prefix
+		return {prefix + str(k) for k in keys}
+
+	def _candidates(self, group: RuleCondition) -> Optional[Set[int]]:
+		if not group.conditions or group.operator == LogicalOperator.NOT:
+			return None
+		found: List[Optional[Set[int]]] = []
+		for condition in group.conditions:
+			if isinstance(condition, RuleCondition):
+				found.append(self._candidates(condition))
+			else:
+				found.append(self._field(condition.field).matching(condition))
+		if group.operator == LogicalOperator.AND:
+			known = [ids for ids in found if ids is not None]
+			if not known:
+				return None
+			known.sort(key=len)
+			return known[0].intersection(*known[1:])
+		if any(ids is None for ids in found):
+			return None
+		return set().union(*found)
+
+	def _field(self, field: str) -> _FieldValues:
+		index = self._fields.get(field)
+		if index is None:
+			index = self._fields[field] = _FieldValues(field)
+			for event_id, event in self._events.items():
+				index.add(event_id, event)
+		return index
+
+	def _set_tags(self, event_id: int, tags: Dict[str, Any]) -> None:
+		self._tags[event_id] = tags
+		for rule_id in tags.get("matched_rules", ()):
+			self._by_rule.setdefault(rule_id, set()).add(event_id)
+
+	def _unset_tags(self, event_id: int) -> None:
+		for rule_id in self._tags.pop(event_id).get("matched_rules", ()):
+			ids = self._by_rule.get(rule_id)
+			if ids is not None:
+				ids.discard(event_id)
+				if not ids:
+					del self._by_rule[rule_id]
+
+	def _evict(self) -> None:
+		event_id, event = self._events.popitem(last=False)
+		self._unset_tags(event_id)
+		for index in self._fields.values():
+			index.remove(event_id, event)
@@ -0,0 +1,164 @@
+import math
+from bisect import bisect_left, bisect_right
+from typing import Any, Dict, Hashable, List, Optional, Sequence, Tuple
+
+from .compiler import CompiledRule, FieldGetter, compile_field_getter
+from .models import Condition, ConditionOperator, LogicalOperator
+
+_RANGE_OPERATORS = (
+	ConditionOperator.GT,
+	ConditionOperator.GTE,
+	ConditionOperator.LT,
+	ConditionOperator.LTE,
+)
+# Operators that raise TypeError when the field value and condition value don't compare
+_RAISING_OPERATORS = _RANGE_OPERATORS + (ConditionOperator.CONTAINS,)
+
+
+def _hashable(value: Any) -> bool:
+	if isinstance(value, float) and math.isnan(value):
+		return False
+	try:
+		hash(value)
+	except TypeError:
+		return False
+	return True
+
+
+def _is_number(value: Any) -> bool:
+	return isinstance(value, (int, float)) and not (isinstance(value, float) and math.isnan(value))
+
+
+def _discriminator(rule: CompiledRule) -> Optional[Condition]:
+	"""Pick a condition every match of the rule must satisfy, or None.
+
+	Only conditions directly in a top-level AND group qualify. Hash-indexable conditions (EQ/IN) are
+	preferred over range conditions, then declaration order. Nothing after the first condition that
+	can raise on a type mismatch qualifies, so a rule the evaluator would raise on is never skipped.
+	"""
+	group = rule.rule.condition
+	if group.operator != LogicalOperator.AND or not group.conditions:
+		return None
+	ranged: Optional[Condition] = None
+	for cond in group.conditions:
+		if not isinstance(cond, Condition):
+			# Nested groups can raise too
+			break
+		if not cond.negate:
+			if cond.operator == ConditionOperator.EQ and _hashable(cond.value):
+				return cond
+			if cond.operator == ConditionOperator.IN and isinstance(cond.value, list):
+				if all(_hashable(v) for v in cond.value):
+					return cond
+			if ranged is None and cond.operator in _RANGE_OPERATORS and _is_number(cond.value):
+				# Still a candidate for non-numeric values, so it raises as evaluated
+				ranged = cond
+		if cond.operator in _RAISING_OPERATORS:
+			break
+	return ranged
+
+
+class _RangeIndex:
+	"""Thresholds for one operator on one field, sorted for bisection."""
+
+	__slots__ = ("keys", "positions")
+
+	def __init__(self, entries: List[Tuple[Any, int]]) -> None:
+		entries.sort(key=lambda e: e[0])
+		self.keys = [k for k, _ in entries]
+		self.positions = [p for _, p in entries]
+
+
+class _FieldIndex:
+	"""Alpha-memory style buckets for all indexed conditions on one field path."""
+
+	__slots__ = ("get", "eq", "gt", "gte", "lt", "lte", "all_ranged")
+
+	def __init__(self, field: str) -> None:
+		self.get: FieldGetter = compile_field_getter(field)
+		self.eq: Dict[Hashable, List[int]] = {}
+		self.gt: Optional[_RangeIndex] = None
+		self.gte: Optional[_RangeIndex] = None
+		self.lt: Optional[_RangeIndex] = None
+		self.lte: Optional[_RangeIndex] = None
+		self.all_ranged: List[int] = []
+
+	def collect(self, data: Dict[str, Any], out: List[int]) -> None:
+		value = self.get(data)
+		# Conditions other than EXISTS/NOT_EXISTS never match a missing field
+		if value is None:
+			return
+		if self.eq:
+			try:
+				hit = self.eq.get(value)
+			except TypeError:
+				hit = None
+			if hit:
+				out.extend(hit)
+		if not self.all_ranged:
+			return
+		if not _is_number(value):
+			# Let the rules themselves decide (and raise, as the evaluator would)
+			out.extend(self.all_ranged)
+			return
+		if self.gt is not None:
+			out.extend(self.gt.positions[:bisect_left(self.gt.keys, value)])
+		if self.gte is not None:
+			out.extend(self.gte.positions[:bisect_right(self.gte.keys, value)])
+		if self.lt is not None:
+			out.extend(self.lt.positions[bisect_right(self.lt.keys, value):])
+		if self.lte is not None:
+			out.extend(self.lte.positions[bisect_left(self.lte.keys, value):])
+
+
+class RuleIndex:
+	"""Discrimination index selecting the rules that can still match an event.
+
+	Each rule is registered under one condition it cannot match without:
+	EQ/IN conditions go into hash buckets keyed by value, GT/GTE/LT/LTE into
+	sorted threshold lists. Rules without such a condition are always
+	candidates. Candidates are returned in the original priority order.
+	"""
+
+	def __init__(self, rules: Sequence[CompiledRule]) -> None:
+		self.rules: Tuple[CompiledRule, ...] = tuple(rules)
+		self._always: List[int] = []
+		fields: Dict[str, _FieldIndex] = {}
+		ranges: Dict[Tuple[str, ConditionOperator], List[Tuple[Any, int]]] = {}
+
+		for position, compiled in enumerate(self.rules):
+			cond = _discriminator(compiled)
+			if cond is None:
+				self._always.append(position)
+				continue
+			field = fields.get(cond.field)
+			if field is None:
+				field = fields[cond.field] = _FieldIndex(cond.field)
+			if cond.operator == ConditionOperator.EQ:
+				field.eq.setdefault(cond.value, []).append(position)
+			elif cond.operator == ConditionOperator.IN:
+				# A rule lands in each bucket once, even if the list repeats a value
+				for value in dict.fromkeys(cond.value):
+					field.eq.setdefault(value, []).append(position)
+			else:
+				ranges.setdefault((cond.field, cond.operator), []).append((cond.value, position))
+				field.all_ranged.append(position)
+
+		for (field_path, op), entries in ranges.items():
+			attr = op.value  # "gt", "gte", "lt", "lte"
+			setattr(fields[field_path], attr, _RangeIndex(entries))
+
+		self._fields: Tuple[_FieldIndex, ...] = tuple(fields.values())
+
+	def __len__(self) -> int:
+		return len(self.rules)
+
+	def candidates(self, data: Dict[str, Any]) -> Sequence[int]:
+		"""Return positions in ``rules`` of the rules that may match ``data``, ascending."""
+		if not self._fields:
+			return self._always
+		positions = list(self._always)
+		for field in self._fields:
+			field.collect(data, positions)
+		positions.sort()
+		return positions
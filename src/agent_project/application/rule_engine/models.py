@@ -1,7 +1,10 @@
-from typing import Dict, Any, List, Optional
-from pydantic import BaseModel, Field
+from typing import Dict, Any, List, Optional, Union
+from pydantic import BaseModel, Field, model_validator
 from enum import Enum
 
+# Deepest allowed nesting of condition groups (the rule's own group is depth 1)
+MAX_CONDITION_DEPTH = 64
+
 
 class ConditionOperator(str, Enum):
 	"""Supported condition operators."""
@@ -34,10 +37,22 @@ class Condition(BaseModel):
 
 
 class RuleCondition(BaseModel):
-	"""A condition group with logical operators."""
-	conditions: List[Condition] = Field(..., description="List of conditions")
+	"""A condition group with logical operators; groups may be nested."""
+	conditions: List[Union[Condition, "RuleCondition"]] = Field(
+		..., description="Conditions and nested condition groups"
+	)
 	operator: LogicalOperator = Field(LogicalOperator.AND, description="How to combine conditions")
 
+	def depth(self) -> int:
+		"""Nesting depth of this group (1 if it holds only conditions)."""
+		deepest = 0
+		stack = [(self, 1)]
+		while stack:
+			group, level = stack.pop()
+			deepest = max(deepest, level)
+			stack.extend((c, level + 1) for c in group.conditions if isinstance(c, RuleCondition))
+		return deepest
+
 
 class TagAction(BaseModel):
 	"""Action to tag event with features/labels when rule matches."""
@@ -56,3 +71,9 @@ class Rule(BaseModel):
 	condition: RuleCondition = Field(..., description="Condition to evaluate")
 	action: TagAction = Field(..., description="Action to take when condition matches")
 
+	@model_validator(mode="after")
+	def _check_depth(self) -> "Rule":
+		if self.condition.depth() > MAX_CONDITION_DEPTH:
+			raise ValueError(f"condition groups are nested deeper than {MAX_CONDITION_DEPTH} levels")
+		return self
+
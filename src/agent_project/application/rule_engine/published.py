@@ -0,0 +1,150 @@
+import fcntl
+import json
+import os
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from .models import Rule
+from .storage import RuleSnapshot, RuleStorage, _ordered
+
+# (inode, mtime, size) of the snapshot file last loaded
+_FileStamp = Tuple[int, int, int]
+
+
+class PublishedRuleStorage(RuleStorage):
+	"""Rule storage backed by a versioned snapshot file shared by worker processes.
+
+	Every mutation takes an exclusive ``flock`` on ``<path>.lock``, reloads
+	the latest snapshot, applies the change and publishes the whole rule set
+	as ``{"version": N, "rules": [...]}`` by writing a temporary file and
+	renaming it over ``path``, so readers only ever see complete snapshots.
+	Workers watch the file with ``stat`` (at most every ``poll_interval``
+	seconds, from ``snapshot()``) and swap in a newly published version
+	between requests; rules that didn't change keep their objects, so their
+	compiled predicates are reused.
+	"""
+
+	def __init__(self, path: str, poll_interval: float = 0.5) -> None:
+		super().__init__()
+		self.path = path
+		self.poll_interval = poll_interval
+		self._stamp: Optional[_FileStamp] = None
+		self._next_poll = 0.0
+		with self._lock:
+			self._reload()
+
+	def snapshot(self) -> RuleSnapshot:
+		"""Return the current enabled-rule snapshot, checking the file if due."""
+		if time.monotonic() >= self._next_poll and self._lock.acquire(blocking=False):
+			try:
+				self._reload()
+			finally:
+				self._lock.release()
+		return self._snapshot
+
+	def refresh(self) -> None:
+		"""Load a newly published snapshot now."""
+		with self._lock:
+			self._reload()
+
+	def add(self, rule: Rule) -> None:
+		"""Add or update a rule and publish the new rule set."""
+		def change(rules: Dict[str, Rule]) -> bool:
+			rules[rule.id] = rule
+			return True
+
+		self._publish_change(change)
+
+	def get(self, rule_id: str) -> Optional[Rule]:
+		"""Get a rule by ID."""
+		self.refresh()
+		return super().get(rule_id)
+
+	def get_all(self, enabled_only: bool = False) -> List[Rule]:
+		"""Get all rules, optionally filtering by enabled status."""
+		self.refresh()
+		return super().get_all(enabled_only=enabled_only)
+
+	def delete(self, rule_id: str) -> bool:
+		"""Delete a rule. Returns True if rule existed."""
+		return self._publish_change(lambda rules: rules.pop(rule_id, None) is not None)
+
+	def exists(self, rule_id: str) -> bool:
+		"""Check if a rule exists."""
+		self.refresh()
+		return super().exists(rule_id)
+
+	def replace_all(self, rules: Iterable[Rule]) -> None:
+		"""Publish ``rules`` as the complete rule set in a single version."""
+		replacement = {rule.id: rule for rule in rules}
+
+		def change(current: Dict[str, Rule]) -> bool:
+			current.clear()
+			current.update(replacement)
+			return True
+
+		self._publish_change(change)
+
+	def _publish_change(self, change: Callable[[Dict[str, Rule]], bool]) -> bool:
+		"""Apply ``change`` to the latest rule set under the publish lock and publish it.
+
+		``change`` edits a copy of the rules and returns False if there was nothing to do.
+		"""
+		with self._lock:
+			fd = os.open(self.path + ".lock", os.O_RDWR | os.O_CREAT, 0o644)
+			try:
+				fcntl.flock(fd, fcntl.LOCK_EX)
+				self._reload()
+				rules = dict(self._rules)
+				if not change(rules):
+					return False
+				version = self._snapshot.version + 1
+				self._install(rules, version, self._write(rules, version))
+				return True
+			finally:
+				os.close(fd)
+
+	def _write(self, rules: Dict[str, Rule], version: int) -> _FileStamp:
+		"""Atomically replace the snapshot file; returns the new file's stamp."""
+		payload = {
+			"version": version,
+			"rules": [rule.model_dump(mode="json") for rule in rules.values()],
+		}
+		tmp = f"{self.path}.{os.getpid()}.tmp"
+		with open(tmp, "w", encoding="utf-8") as f:
+			json.dump(payload, f, separators=(",", ":"))
+			f.flush()
+			os.fsync(f.fileno())
+			stat = os.fstat(f.fileno())
+		os.replace(tmp, self.path)
+		return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+	def _reload(self) -> None:
+		"""Swap in the published snapshot if the file changed. Caller must hold the lock."""
+		self._next_poll = time.monotonic() + self.poll_interval
+		try:
+			stat = os.stat(self.path)
+		except FileNotFoundError:
+			return
+		stamp = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+		if stamp == self._stamp:
+			return
+		with open(self.path, "r", encoding="utf-8") as f:
+			payload = json.load(f)
+		if payload["version"] == self._snapshot.version:
+			self._stamp = stamp
+			return
+
+		rules: Dict[str, Rule] = {}
+		for data in payload["rules"]:
+			rule = Rule.model_validate(data)
+			previous = self._rules.get(rule.id)
+			rules[rule.id] = previous if previous == rule else rule
+		self._install(rules, payload["version"], stamp)
+
+	def _install(self, rules: Dict[str, Rule], version: int, stamp: _FileStamp) -> None:
+		self._rules = rules
+		self._stamp = stamp
+		enabled = _ordered([r for r in rules.values() if r.enabled])
+		# Single attribute assignment, so readers see either the old or new snapshot
+		self._snapshot = RuleSnapshot(version=version, rules=tuple(enabled))
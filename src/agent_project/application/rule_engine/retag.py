@@ -0,0 +1,90 @@
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from .evaluator import EVALUATION_ERRORS
+from .event_store import TaggedEventStore
+from .models import Rule
+from .service import RuleEngine
+
+
+class Retagger:
+	"""Incrementally re-tags stored events after a rule is added, edited or deleted.
+
+	Only two kinds of events can change: those the rule matched before
+	(found through the store's matched-rule index) and those it may match
+	now (found through the store's field-value index from the conditions
+	of the new rule). Those events are re-run through the engine, which
+	must already hold the change, and their tags are rewritten in place
+	when they differ. Events the engine fails on keep their tags.
+
+	``sync()`` finds the changed rules itself by comparing the engine's
+	rule snapshot with the one it last saw, so a worker also re-tags its
+	events for changes another worker published to shared rule storage.
+	"""
+
+	def __init__(self, engine: RuleEngine, store: TaggedEventStore, batch_size: int = 512) -> None:
+		self.engine = engine
+		self.store = store
+		self.batch_size = batch_size
+		self._lock = threading.Lock()
+		snapshot = engine.storage.snapshot()
+		# Enabled rules by id as of the last sync
+		self._version = snapshot.version
+		self._rules: Dict[str, Rule] = {rule.id: rule for rule in snapshot.rules}
+
+	def sync(self) -> Dict[str, int]:
+		"""Re-tag for every rule added, edited, disabled or deleted since the last sync.
+
+		Returns how many events were re-evaluated, updated and failed.
+		"""
+		stats = {"evaluated": 0, "updated": 0, "errors": 0}
+		with self._lock:
+			snapshot = self.engine.storage.snapshot()
+			if snapshot.version == self._version:
+				return stats
+			current = {rule.id: rule for rule in snapshot.rules}
+			for rule_id in sorted(set(self._rules) | set(current)):
+				previous, rule = self._rules.get(rule_id), current.get(rule_id)
+				if previous is rule or previous == rule:
+					continue
+				for key, count in self.rule_changed(rule_id, rule).items():
+					stats[key] += count
+			self._version, self._rules = snapshot.version, current
+		return stats
+
+	def rule_changed(self, rule_id: str, rule: Optional[Rule] = None) -> Dict[str, int]:
+		"""Re-tag the events affected by a change to ``rule_id``; ``rule`` is None after a delete.
+
+		Returns how many events were re-evaluated, updated and failed.
+		"""
+		affected = self.store.matched_by(rule_id)
+		if rule is not None and rule.enabled:
+			candidates = self.store.candidates(rule.condition)
+			affected |= self.store.ids() if candidates is None else candidates
+
+		stats = {"evaluated": 0, "updated": 0, "errors": 0}
+		events = self.store.events(affected)
+		for start in range(0, len(events), self.batch_size):
+			self._retag(events[start:start + self.batch_size], stats)
+		return stats
+
+	def _retag(self, chunk: List[Tuple[str, Dict[str, Any]]], stats: Dict[str, int]) -> None:
+		try:
+			tagged = self.engine.process_batch([event for _, event in chunk])
+		except EVALUATION_ERRORS:
+			# Find the offending events one at a time
+			tagged = []
+			for _, event in chunk:
+				try:
+					tagged.append(self.engine.process(event))
+				except EVALUATION_ERRORS:
+					tagged.append(None)
+		for (event_id, _), tagged_event in zip(chunk, tagged):
+			stats["evaluated"] += 1
+			if tagged_event is None:
+				stats["errors"] += 1
+				continue
+			current = self.store.get(event_id)
+			if current is not None and current["tags"] != tagged_event["tags"]:
+				if self.store.update_tags(event_id, tagged_event["tags"]):
+					stats["updated"] += 1
@@ -1,15 +1,44 @@
-from typing import Dict, Any, List
+import time
+from collections import Counter
+from typing import Callable, Dict, Any, Hashable, List, Optional, Sequence, Tuple
+
+from ...infrastructure.monitoring.metrics import MetricsRegistry
 from .models import Rule, TagAction
-from .evaluator import RuleEvaluator
+from .batch import BatchEvaluator
+from .compiler import CompiledRule, compile_fingerprint, condition_fields
+from .evaluator import EVALUATION_ERRORS, RuleEvaluator
+from .index import RuleIndex
+from .shared import SharedPredicates
 from .storage import RuleStorage
 
+# Upper bound on distinct matched-rule combinations memoized per rule version
+_TAG_MEMO_LIMIT = 4096
+
 
 class RuleEngine:
 	"""Rule engine service that evaluates rules and tags events with features/labels."""
 
-	def __init__(self, storage: RuleStorage | None = None) -> None:
+	def __init__(
+		self,
+		storage: RuleStorage | None = None,
+		metrics: MetricsRegistry | None = None,
+		adaptive: bool = True,
+	) -> None:
 		self.storage = storage or RuleStorage()
+		# Reorder each rule's conditions by observed selectivity and cost
+		self.adaptive = adaptive
+		# Per-rule evaluation counts and timings are recorded only with a registry
+		self.metrics = metrics
 		self.evaluator = RuleEvaluator()
+		# Rule ID -> compiled predicate, built once when a rule is added
+		self._compiled: Dict[str, CompiledRule] = {}
+		# (storage version, index over compiled rules, shared predicate table,
+		# tag memo), swapped as one tuple
+		self._active: Tuple[int, RuleIndex, SharedPredicates, Dict[Tuple[int, ...], Dict[str, Any]]] = (
+			-1, RuleIndex(()), SharedPredicates(()), {}
+		)
+		# (storage version, key function over the fields the enabled rules reference)
+		self._fingerprint: Tuple[int, Callable[[Dict[str, Any]], Hashable]] = (-1, lambda data: ())
 
 	def process(self, event: Dict[str, Any]) -> Dict[str, Any]:
 		"""Process an event through all enabled rules and return tagged event.
@@ -20,39 +49,190 @@ class RuleEngine:
 		- metadata: Dict of custom metadata
 		- matched_rules: List of rule IDs that matched
 		"""
+		index, memo, matched = self._match(event)
+		return self._tag(event, matched, index.rules, memo)
+
+	def tag(self, event: Dict[str, Any]) -> Dict[str, Any]:
+		"""Return just the tags ``process`` would attach, without copying the event.
+
+		The tags dict is shared with every event matching the same rules, so
+		callers must treat it as read-only.
+		"""
+		index, memo, matched = self._match(event)
+		return self._merged(matched, index.rules, memo)
+
+	def fingerprint(self, event: Dict[str, Any]) -> Optional[Tuple[int, Hashable]]:
+		"""Rule set version and the event's values for every field the enabled
+		rules reference, or None if a value can't be keyed.
+
+		Events with equal fingerprints get the same tags from ``process``.
+		"""
+		self._active_rules()
+		version, index, _, _ = self._active
+		current, fingerprint = self._fingerprint
+		if current != version:
+			fields = set()
+			for compiled in index.rules:
+				fields |= condition_fields(compiled.rule.condition)
+			fingerprint = compile_fingerprint(fields)
+			self._fingerprint = (version, fingerprint)
+		try:
+			return version, fingerprint(event)
+		except TypeError:
+			return None
+
+	def _match(
+		self, event: Dict[str, Any]
+	) -> Tuple[RuleIndex, Dict[Tuple[int, ...], Dict[str, Any]], Tuple[int, ...]]:
+		"""Positions of the rules matching ``event``, with the index and tag memo they refer to."""
+		# Evaluate candidate rules in priority order; the index skips rules
+		# whose discriminating condition cannot hold for this event, and
+		# conditions shared between rules are evaluated once
+		index, shared, memo = self._active_rules()
+		results = shared.new_results()
+		if self.metrics is None:
+			match = shared.matchers
+			matched = tuple(p for p in index.candidates(event) if match[p](event, results))
+		else:
+			matched = self._match_timed(event, index, shared, results)
+		return index, memo, matched
+
+	def process_batch(self, events: Sequence[Dict[str, Any]]) -> List[Dict[str, Any]]:
+		"""Process many events at once; equivalent to ``process`` on each event.
+
+		Referenced fields are extracted into columns once and every rule is
+		evaluated as a vectorized mask over the whole batch.
+		"""
+		index, _, memo = self._active_rules()
+		rules = index.rules
+		timings: List[int] | None = None if self.metrics is None else []
+		try:
+			matched = BatchEvaluator(events).match([compiled.rule for compiled in rules], timings)
+		except EVALUATION_ERRORS:
+			# Column-wise evaluation doesn't short-circuit, so it can hit errors
+			# (e.g. incomparable types) that per-event evaluation would skip or
+			# raise differently. Replay per event to reproduce exact behaviour.
+			return [self.process(event) for event in events]
+		if timings:
+			counts = Counter(position for positions in matched for position in positions)
+			self.metrics.record_rules(
+				(compiled.rule.id, len(events), counts[position], ns)
+				for position, (compiled, ns) in enumerate(zip(rules, timings))
+			)
+		return [
+			self._tag(event, tuple(positions), rules, memo)
+			for event, positions in zip(events, matched)
+		]
+
+	def _match_timed(
+		self, event: Dict[str, Any], index: RuleIndex, shared: SharedPredicates, results: bytearray
+	) -> Tuple[int, ...]:
+		"""``process`` matching that also records each candidate rule's evaluation.
+
+		A condition shared with an earlier rule is charged to that rule only.
+		"""
+		rules = index.rules
+		match = shared.matchers
+		clock = time.perf_counter_ns
+		matched = []
+		samples = []
+		for position in index.candidates(event):
+			compiled = rules[position]
+			start = clock()
+			hit = match[position](event, results)
+			samples.append((compiled.rule.id, 1, 1 if hit else 0, clock() - start))
+			if hit:
+				matched.append(position)
+		self.metrics.record_rules(samples)
+		return tuple(matched)
+
+	@classmethod
+	def _tag(
+		cls,
+		event: Dict[str, Any],
+		matched: Tuple[int, ...],
+		rules: Sequence[CompiledRule],
+		memo: Dict[Tuple[int, ...], Dict[str, Any]],
+	) -> Dict[str, Any]:
+		"""Merge the actions of matched rules into a tagged copy of the event."""
+		merged = cls._merged(matched, rules, memo)
+
+		# Hand out fresh containers so callers can't corrupt the memo
 		tags = {
-			"features": [],
-			"labels": [],
-			"metadata": {},
-			"matched_rules": [],
+			"features": list(merged["features"]),
+			"labels": list(merged["labels"]),
+			"metadata": dict(merged["metadata"]),
+			"matched_rules": list(merged["matched_rules"]),
 		}
 
-		# Evaluate all enabled rules in priority order
-		rules = self.storage.get_all(enabled_only=True)
-		for rule in rules:
-			if self.evaluator.evaluate(rule.condition, event):
+		# Add tags to event (create copy to avoid mutation)
+		tagged_event = event.copy()
+		tagged_event["tags"] = tags
+
+		return tagged_event
+
+	@staticmethod
+	def _merged(
+		matched: Tuple[int, ...],
+		rules: Sequence[CompiledRule],
+		memo: Dict[Tuple[int, ...], Dict[str, Any]],
+	) -> Dict[str, Any]:
+		"""Merged actions of the matched rules (positions in ``rules``).
+
+		Memoized per distinct matched set, since the same combinations recur
+		across events.
+		"""
+		merged = memo.get(matched)
+		if merged is None:
+			merged = {
+				"features": [],
+				"labels": [],
+				"metadata": {},
+				"matched_rules": [],
+			}
+			for position in matched:
+				rule = rules[position].rule
 				# Rule matched - apply tagging action
 				if rule.action.features:
-					tags["features"].extend(rule.action.features)
+					merged["features"].extend(rule.action.features)
 				if rule.action.labels:
-					tags["labels"].extend(rule.action.labels)
+					merged["labels"].extend(rule.action.labels)
 				if rule.action.metadata:
-					tags["metadata"].update(rule.action.metadata)
-				tags["matched_rules"].append(rule.id)
+					merged["metadata"].update(rule.action.metadata)
+				merged["matched_rules"].append(rule.id)
 
-		# Deduplicate lists
-		tags["features"] = list(dict.fromkeys(tags["features"]))
-		tags["labels"] = list(dict.fromkeys(tags["labels"]))
+			# Deduplicate lists
+			merged["features"] = list(dict.fromkeys(merged["features"]))
+			merged["labels"] = list(dict.fromkeys(merged["labels"]))
+			if len(memo) < _TAG_MEMO_LIMIT:
+				memo[matched] = merged
+		return merged
 
-		# Add tags to event (create copy to avoid mutation)
-		tagged_event = event.copy()
-		tagged_event["tags"] = tags
+	def _active_rules(self) -> Tuple[RuleIndex, SharedPredicates, Dict[Tuple[int, ...], Dict[str, Any]]]:
+		"""Return the rule index, shared predicates and tag memo, rebuilt only
+		when the storage snapshot changes."""
+		snapshot = self.storage.snapshot()
+		version, index, shared, memo = self._active
+		if version != snapshot.version:
+			index = RuleIndex([self._compiled_for(rule) for rule in snapshot.rules])
+			shared = SharedPredicates(index.rules)
+			memo = {}
+			self._active = (snapshot.version, index, shared, memo)
+		return index, shared, memo
 
-		return tagged_event
+	def _compiled_for(self, rule: Rule) -> CompiledRule:
+		"""Return the compiled form of a rule, compiling rules added directly to storage."""
+		compiled = self._compiled.get(rule.id)
+		if compiled is None or compiled.rule is not rule:
+			compiled = CompiledRule(rule, adaptive=self.adaptive)
+			self._compiled[rule.id] = compiled
+		return compiled
 
 	def add_rule(self, rule: Rule) -> None:
 		"""Add a new rule to the engine."""
+		compiled = CompiledRule(rule, adaptive=self.adaptive)
 		self.storage.add(rule)
+		self._compiled[rule.id] = compiled
 
 	def get_rule(self, rule_id: str) -> Rule | None:
 		"""Get a rule by ID."""
@@ -64,5 +244,6 @@ class RuleEngine:
 
 	def delete_rule(self, rule_id: str) -> bool:
 		"""Delete a rule."""
+		self._compiled.pop(rule_id, None)
 		return self.storage.delete(rule_id)
 
@@ -0,0 +1,118 @@
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from .compiler import (
+	ADAPTIVE_SAMPLE_EVERY,
+	RESULT_FALSE,
+	RESULT_TRUE,
+	CompiledRule,
+	ConditionGraph,
+	ConditionStats,
+	Predicate,
+	is_nested,
+)
+from .evaluator import EVALUATION_ERRORS
+from .models import LogicalOperator
+
+# Rule predicate over an event and its per-event condition results
+SharedMatcher = Callable[[Dict[str, Any], bytearray], bool]
+
+
+class SharedPredicates:
+	"""Conditions of a rule set deduplicated into one predicate table.
+
+	All rules' conditions live in a single ``ConditionGraph``, where
+	identical conditions (same field, operator, value and negate) and
+	identical nested subtrees share one node. ``matchers[i]`` evaluates
+	``rules[i]`` against an event and a ``results`` bytearray from
+	``new_results()``, one byte per node (unknown/false/true), so each
+	condition runs at most once per event however many rules use it.
+	Adaptive rules keep sampling and reordering their conditions (see
+	``ConditionStats``); results and errors are those of the rules' own
+	predicates.
+	"""
+
+	def __init__(self, rules: Sequence[CompiledRule]) -> None:
+		self.graph = ConditionGraph()
+		self.matchers: List[SharedMatcher] = [self._matcher(compiled) for compiled in rules]
+
+	@property
+	def size(self) -> int:
+		return self.graph.size
+
+	def new_results(self) -> bytearray:
+		return self.graph.new_results()
+
+	def _matcher(self, compiled: CompiledRule) -> SharedMatcher:
+		group = compiled.rule.condition
+		graph = self.graph
+		if not group.conditions:
+			return lambda data, results: True
+		if is_nested(group):
+			root = graph.add(group)
+			evaluate = graph.evaluate
+			return lambda data, results: evaluate(root, data, results)
+		predicate = compiled.predicate
+		if group.operator == LogicalOperator.NOT:
+			if len(group.conditions) != 1:
+				# Raises the arity error
+				return lambda data, results: predicate(data)
+			return _negation(graph.predicates, graph.leaf(group.conditions[0]))
+		if group.operator in (LogicalOperator.AND, LogicalOperator.OR):
+			slots = tuple(graph.leaf(c) for c in group.conditions)
+			return _group(graph.predicates, slots, group.operator == LogicalOperator.OR, compiled.stats)
+		return lambda data, results: predicate(data)
+
+
+def _negation(predicates: List[Optional[Predicate]], slot: int) -> SharedMatcher:
+	def negation(data: Dict[str, Any], results: bytearray) -> bool:
+		state = results[slot]
+		if not state:
+			state = results[slot] = RESULT_TRUE if predicates[slot](data) else RESULT_FALSE
+		return state == RESULT_FALSE
+
+	return negation
+
+
+def _group(
+	predicates: List[Optional[Predicate]],
+	slots: Tuple[int, ...],
+	short_circuit: bool,
+	stats: Optional[ConditionStats],
+	sample_every: int = ADAPTIVE_SAMPLE_EVERY,
+) -> SharedMatcher:
+	"""AND (``short_circuit`` False) / OR over result slots, in ``stats`` order if adaptive."""
+	settles = RESULT_TRUE if short_circuit else RESULT_FALSE
+	settled = not short_circuit
+	order = None if stats is None else stats.order
+	ordered = slots if order is None else tuple(slots[i] for i in order)
+	countdown = sample_every
+
+	def run(data: Dict[str, Any], results: bytearray, sequence: Tuple[int, ...]) -> bool:
+		for slot in sequence:
+			state = results[slot]
+			if not state:
+				state = results[slot] = RESULT_TRUE if predicates[slot](data) else RESULT_FALSE
+			if state == settles:
+				return short_circuit
+		return settled
+
+	def match(data: Dict[str, Any], results: bytearray) -> bool:
+		nonlocal order, ordered, countdown
+		if stats is not None:
+			countdown -= 1
+			if not countdown:
+				countdown = sample_every
+				result = stats.sample(data)
+				if stats.order is not order:
+					order = stats.order
+					ordered = tuple(slots[i] for i in order)
+				return result
+		try:
+			return run(data, results, ordered)
+		except EVALUATION_ERRORS:
+			if ordered is slots:
+				raise
+			# Replay in declaration order; slots settled so far stay valid
+			return run(data, results, slots)
+
+	return match
@@ -0,0 +1,185 @@
+import sqlite3
+import time
+import zlib
+from contextlib import contextmanager
+from typing import Iterator, List, Optional
+
+from .models import Rule
+from .storage import RuleSnapshot, RuleStorage, _ordered
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS rules (
+	id TEXT PRIMARY KEY,
+	enabled INTEGER NOT NULL,
+	priority INTEGER NOT NULL,
+	version INTEGER NOT NULL,
+	deleted INTEGER NOT NULL DEFAULT 0,
+	body BLOB
+);
+CREATE INDEX IF NOT EXISTS rules_enabled_priority ON rules (enabled, priority DESC, id);
+CREATE INDEX IF NOT EXISTS rules_version ON rules (version);
+CREATE TABLE IF NOT EXISTS rule_meta (
+	key TEXT PRIMARY KEY,
+	value INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO rule_meta (key, value) VALUES ('version', 0), ('purged', 0);
+"""
+
+
+def _encode(rule: Rule) -> bytes:
+	return zlib.compress(rule.model_dump_json(exclude_defaults=True).encode())
+
+
+def _decode(body: bytes) -> Rule:
+	return Rule.model_validate_json(zlib.decompress(body))
+
+
+class SQLiteRuleStorage(RuleStorage):
+	"""Rule storage persisted in SQLite and shared by every process using the file.
+
+	Each write bumps a database-wide version counter and stamps the changed
+	row with it; deletes leave a tombstone row so they propagate the same
+	way. A process reloads only rows stamped after the version it last saw,
+	checking for changes at most every ``poll_interval`` seconds when the
+	engine asks for a snapshot (reads through ``get``/``get_all`` always
+	check). Rules are stored as zlib-compressed JSON without default fields.
+	"""
+
+	def __init__(self, path: str, poll_interval: float = 1.0) -> None:
+		super().__init__()
+		self.path = path
+		self.poll_interval = poll_interval
+		self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+		self._conn.execute("PRAGMA journal_mode=WAL")
+		self._conn.execute("PRAGMA busy_timeout=5000")
+		self._conn.executescript(_SCHEMA)
+		self._data_version: Optional[int] = None
+		self._next_poll = 0.0
+		with self._lock:
+			self._refresh()
+
+	def snapshot(self) -> RuleSnapshot:
+		"""Return the current enabled-rule snapshot, polling for changes if due."""
+		if time.monotonic() >= self._next_poll and self._lock.acquire(blocking=False):
+			# Whoever gets the lock polls; everyone else keeps the current snapshot
+			try:
+				self._refresh()
+			finally:
+				self._lock.release()
+		return self._snapshot
+
+	def refresh(self) -> None:
+		"""Pick up changes made by other processes now."""
+		with self._lock:
+			self._refresh()
+
+	def add(self, rule: Rule) -> None:
+		"""Add or update a rule."""
+		with self._lock:
+			with self._transaction():
+				self._conn.execute(
+					"INSERT INTO rules (id, enabled, priority, version, deleted, body) VALUES (?, ?, ?, ?, 0, ?) "
+					"ON CONFLICT (id) DO UPDATE SET enabled = excluded.enabled, priority = excluded.priority, "
+					"version = excluded.version, deleted = 0, body = excluded.body",
+					(rule.id, int(rule.enabled), rule.priority, self._next_version(), _encode(rule)),
+				)
+			self._refresh(force=True)
+
+	def get(self, rule_id: str) -> Optional[Rule]:
+		"""Get a rule by ID."""
+		self.refresh()
+		return super().get(rule_id)
+
+	def get_all(self, enabled_only: bool = False) -> List[Rule]:
+		"""Get all rules, optionally filtering by enabled status."""
+		self.refresh()
+		return super().get_all(enabled_only=enabled_only)
+
+	def delete(self, rule_id: str) -> bool:
+		"""Delete a rule, leaving a tombstone. Returns True if rule existed."""
+		with self._lock:
+			with self._transaction():
+				row = self._conn.execute(
+					"SELECT 1 FROM rules WHERE id = ? AND deleted = 0", (rule_id,)
+				).fetchone()
+				if row is not None:
+					self._conn.execute(
+						"UPDATE rules SET version = ?, deleted = 1, body = NULL WHERE id = ?",
+						(self._next_version(), rule_id),
+					)
+			self._refresh(force=True)
+			return row is not None
+
+	def exists(self, rule_id: str) -> bool:
+		"""Check if a rule exists."""
+		self.refresh()
+		return super().exists(rule_id)
+
+	def purge_tombstones(self) -> int:
+		"""Drop the tombstones of deleted rules. Processes that hadn't seen them reload fully."""
+		with self._lock:
+			with self._transaction():
+				(purged,) = self._conn.execute(
+					"SELECT COALESCE(MAX(version), 0) FROM rules WHERE deleted = 1"
+				).fetchone()
+				count = self._conn.execute("DELETE FROM rules WHERE deleted = 1").rowcount
+				if count:
+					self._conn.execute("UPDATE rule_meta SET value = ? WHERE key = 'purged'", (purged,))
+					self._next_version()
+			self._refresh(force=True)
+			return count
+
+	def close(self) -> None:
+		self._conn.close()
+
+	@contextmanager
+	def _transaction(self) -> Iterator[None]:
+		self._conn.execute("BEGIN IMMEDIATE")
+		try:
+			yield
+		except BaseException:
+			self._conn.execute("ROLLBACK")
+			raise
+		self._conn.execute("COMMIT")
+
+	def _next_version(self) -> int:
+		"""Bump and return the database version. Call inside a write transaction."""
+		self._conn.execute("UPDATE rule_meta SET value = value + 1 WHERE key = 'version'")
+		(version,) = self._conn.execute("SELECT value FROM rule_meta WHERE key = 'version'").fetchone()
+		return version
+
+	def _refresh(self, force: bool = False) -> None:
+		"""Apply rows changed since the local version. Caller must hold the lock."""
+		self._next_poll = time.monotonic() + self.poll_interval
+		# data_version changes only when another connection commits, so our
+		# own writes pass ``force`` instead
+		(data_version,) = self._conn.execute("PRAGMA data_version").fetchone()
+		if data_version == self._data_version and not force:
+			return
+		self._data_version = data_version
+
+		local = self._snapshot.version
+		self._conn.execute("BEGIN")
+		try:
+			meta = dict(self._conn.execute("SELECT key, value FROM rule_meta"))
+			reset = meta["purged"] > local
+			if reset:
+				# Tombstones we never saw are gone; reload everything
+				local = 0
+			rows = self._conn.execute(
+				"SELECT id, deleted, body FROM rules WHERE version > ?", (local,)
+			).fetchall()
+		finally:
+			self._conn.execute("COMMIT")
+
+		if not rows and not reset:
+			return
+		if reset:
+			self._rules = {}
+		for rule_id, deleted, body in rows:
+			if deleted:
+				self._rules.pop(rule_id, None)
+			else:
+				self._rules[rule_id] = _decode(body)
+		enabled = _ordered([r for r in self._rules.values() if r.enabled])
+		self._snapshot = RuleSnapshot(version=meta["version"], rules=tuple(enabled))
@@ -1,16 +1,52 @@
-from typing import Dict, List, Optional
+import threading
+from typing import Dict, List, NamedTuple, Optional, Tuple
 from .models import Rule
 
 
+class RuleSnapshot(NamedTuple):
+	"""Immutable view of the enabled rules in evaluation order."""
+	version: int
+	rules: Tuple[Rule, ...]
+
+
+def _ordered(rules: List[Rule]) -> List[Rule]:
+	# Sort by priority (higher first), then by ID
+	rules.sort(key=lambda r: (-r.priority, r.id))
+	return rules
+
+
 class RuleStorage:
-	"""Simple in-memory rule storage. Replace with database in production."""
+	"""Simple in-memory rule storage. Replace with database in production.
+
+	Writers serialize on a lock and publish a new ``RuleSnapshot`` after each
+	mutation; readers pick up the current snapshot without locking.
+	"""
 
 	def __init__(self) -> None:
 		self._rules: Dict[str, Rule] = {}
+		self._lock = threading.Lock()
+		self._snapshot = RuleSnapshot(version=0, rules=())
+
+	def _publish(self) -> None:
+		"""Rebuild the enabled-rule snapshot. Caller must hold the write lock."""
+		enabled = _ordered([r for r in self._rules.values() if r.enabled])
+		# Single attribute assignment, so readers see either the old or new snapshot
+		self._snapshot = RuleSnapshot(version=self._snapshot.version + 1, rules=tuple(enabled))
+
+	def snapshot(self) -> RuleSnapshot:
+		"""Return the current enabled-rule snapshot (lock-free)."""
+		return self._snapshot
+
+	@property
+	def version(self) -> int:
+		"""Version counter, incremented on every mutation."""
+		return self._snapshot.version
 
 	def add(self, rule: Rule) -> None:
 		"""Add or update a rule."""
-		self._rules[rule.id] = rule
+		with self._lock:
+			self._rules[rule.id] = rule
+			self._publish()
 
 	def get(self, rule_id: str) -> Optional[Rule]:
 		"""Get a rule by ID."""
@@ -18,21 +54,19 @@ class RuleStorage:
 
 	def get_all(self, enabled_only: bool = False) -> List[Rule]:
 		"""Get all rules, optionally filtering by enabled status."""
-		rules = list(self._rules.values())
 		if enabled_only:
-			rules = [r for r in rules if r.enabled]
-		# Sort by priority (higher first), then by ID
-		rules.sort(key=lambda r: (-r.priority, r.id))
-		return rules
+			return list(self.snapshot().rules)
+		return _ordered(list(self._rules.values()))
 
 	def delete(self, rule_id: str) -> bool:
 		"""Delete a rule. Returns True if rule existed."""
-		if rule_id in self._rules:
-			del self._rules[rule_id]
-			return True
-		return False
+		with self._lock:
+			if rule_id in self._rules:
+				del self._rules[rule_id]
+				self._publish()
+				return True
+			return False
 
 	def exists(self, rule_id: str) -> bool:
 		"""Check if a rule exists."""
 		return rule_id in self._rules
-
@@ -1,3 +1,5 @@
 from .agent import HealthAgent
+from .cache import AnalysisCache
+from .pool import AnalysisPool
 
-__all__ = ["HealthAgent"]
+__all__ = ["HealthAgent", "AnalysisCache", "AnalysisPool"]
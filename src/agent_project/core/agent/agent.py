@@ -1,7 +1,14 @@
-from typing import Dict, Any, List
+import asyncio
+import time
+from functools import partial
+from typing import Dict, Any, Hashable, List, Optional, Sequence, Tuple
 
-from ..tools.vitals import evaluate_vitals_against_thresholds
-from ..tools.alerts import AlertDispatcher
+from ..tools.vitals import ThresholdBounds, evaluate_vitals_against_thresholds, evaluate_vitals_batch
+from ..tools.alerts import AlertDispatcher, DeliveryCallback
+from ..tools.thresholds import ThresholdProfiles
+from ..tools.windows import WindowStore
+from .cache import AnalysisCache, CacheEntry
+from .pool import AnalysisPool, Evaluation
 
 
 class HealthAgent:
@@ -11,40 +18,410 @@ class HealthAgent:
 		self,
 		alert_dispatcher: AlertDispatcher | None = None,
 		rule_engine=None,  # RuleEngine type, avoiding circular import
+		window_store: Optional[WindowStore] = None,
+		pool: Optional[AnalysisPool] = None,
+		metrics=None,  # MetricsRegistry, injected by the infrastructure layer
+		event_store=None,  # TaggedEventStore type, avoiding circular import
+		cache: Optional[AnalysisCache] = None,
+		threshold_profiles: Optional[ThresholdProfiles] = None,
+		history=None,  # TimeSeriesStore, injected by the infrastructure layer
+		wal=None,  # WriteAheadLog, injected by the infrastructure layer
 	) -> None:
 		self.alert_dispatcher = alert_dispatcher or AlertDispatcher()
 		self.rule_engine = rule_engine
+		self.window_store = window_store
+		self.pool = pool
+		self.metrics = metrics
+		self.event_store = event_store
+		# Tags and assessments of repeated identical readings; alerts still dispatch
+		self.cache = cache
+		# Per-cohort/per-patient vital bounds; VITAL_THRESHOLDS without
+		self.threshold_profiles = threshold_profiles
+		self.history = history
+		# Readings are logged before analysis and acknowledged once their alerts are delivered
+		self.wal = wal
 
-	def analyze(self, vitals_event: Dict[str, Any]) -> Dict[str, Any]:
+	def analyze(self, vitals_event: Dict[str, Any], owned: bool = False) -> Dict[str, Any]:
 		"""Analyze incoming vitals and produce actions.
 
 		Processes event through rule engine to tag with features/labels,
 		then evaluates vitals and generates alerts if needed.
 
+		With a window store, the patient's rolling-window aggregates are
+		added to the event as ``window`` (so rules can use fields such as
+		``window.5m.heart_rate.mean``) and to the decision.
+
+		``owned`` is the zero-copy path for callers that hand the event over
+		(e.g. freshly parsed from a request) and only serialize the decision:
+		the event is annotated in place, and the decision's tags are shared
+		with other events and must not be modified. A tagged copy is only
+		made for alerts and the event store.
+
 		Returns a decision dict with assessment, alerts, and tags.
 		"""
+		if self.wal is not None:
+			seq = self.wal.append(vitals_event)
+			try:
+				return self._analyze(vitals_event, owned, partial(self.wal.ack, seq))
+			except Exception:
+				# It would fail the same way on replay
+				self.wal.ack(seq)
+				raise
+		return self._analyze(vitals_event, owned)
+
+	def _analyze(
+		self, vitals_event: Dict[str, Any], owned: bool = False, receipt: Optional[DeliveryCallback] = None
+	) -> Dict[str, Any]:
+		if self.metrics is not None:
+			return self._analyze_timed(vitals_event, owned, receipt)
+		vitals_event = self._with_windows(vitals_event, owned)
+		bounds = self._bounds(vitals_event)
+
+		key = None
+		if self.cache is not None:
+			key = self.cache.key(vitals_event, self.rule_engine, bounds)
+			entry = self.cache.get(key) if key is not None else None
+			if entry is not None:
+				return self._decide_cached(vitals_event, entry, owned, receipt)
+
 		# Apply rule engine to tag event with features/labels
+		tagged_event, tags = self._tag(vitals_event, owned or key is not None)
+
+		# Evaluate vitals (can use tags in future enhancements)
+		assessment = evaluate_vitals_against_thresholds(tagged_event, bounds)
+		if key is not None:
+			return self._decide_cached(vitals_event, self._remember(key, tags, assessment), owned, receipt)
+		return self._decide(tagged_event, assessment, tags, receipt)
+
+	def _analyze_timed(
+		self, vitals_event: Dict[str, Any], owned: bool = False, receipt: Optional[DeliveryCallback] = None
+	) -> Dict[str, Any]:
+		"""``analyze`` recording each stage's latency in ``stage_seconds``."""
+		observe = self.metrics.observe
+		clock = time.perf_counter
+		start = clock()
+		vitals_event = self._with_windows(vitals_event, owned)
+		bounds = self._bounds(vitals_event)
+		windowed = clock()
+		observe("stage_seconds", windowed - start, stage="windows")
+		key = entry = None
+		if self.cache is not None:
+			key = self.cache.key(vitals_event, self.rule_engine, bounds)
+			entry = self.cache.get(key) if key is not None else None
+			looked_up = clock()
+			observe("stage_seconds", looked_up - windowed, stage="cache")
+			windowed = looked_up
+		if entry is None:
+			tagged_event, tags = self._tag(vitals_event, owned or key is not None)
+			tagged = clock()
+			assessment = evaluate_vitals_against_thresholds(tagged_event, bounds)
+			assessed = clock()
+			observe("stage_seconds", tagged - windowed, stage="rules")
+			observe("stage_seconds", assessed - tagged, stage="thresholds")
+			if key is None:
+				decision = self._decide(tagged_event, assessment, tags, receipt)
+			else:
+				decision = self._decide_cached(vitals_event, self._remember(key, tags, assessment), owned, receipt)
+		else:
+			assessed = windowed
+			decision = self._decide_cached(vitals_event, entry, owned, receipt)
+		decided = clock()
+		observe("stage_seconds", decided - assessed, stage="decide")
+		observe("analyze_seconds", decided - start)
+		return decision
+
+	async def analyze_async(self, vitals_event: Dict[str, Any], owned: bool = False) -> Dict[str, Any]:
+		"""Async ``analyze``: tagging and threshold checks run in the process
+		pool if one is configured (else a worker thread); window state and
+		alert dispatch stay in this process."""
+		if self.pool is None:
+			return await asyncio.to_thread(self.analyze, vitals_event, owned)
+		seqs = await self._log([vitals_event])
+		try:
+			return (await self._analyze_in_pool([vitals_event], self._receipts(seqs, 1), owned))[0]
+		except Exception:
+			self._ack(seqs)
+			raise
+
+	async def analyze_many_async(self, vitals_events: Sequence[Dict[str, Any]]) -> List[Dict[str, Any]]:
+		"""Async ``analyze_many``, spreading the batch across the process pool if configured."""
+		if self.pool is None:
+			return await asyncio.to_thread(self.analyze_many, vitals_events)
+		seqs = await self._log(vitals_events)
+		try:
+			return await self._analyze_in_pool(vitals_events, self._receipts(seqs, len(vitals_events)))
+		except Exception:
+			self._ack(seqs)
+			raise
+
+	async def _log(self, vitals_events: Sequence[Dict[str, Any]]) -> Optional[List[int]]:
+		if self.wal is None:
+			return None
+		return await asyncio.to_thread(self.wal.append_many, vitals_events)
+
+	def _ack(self, seqs: Optional[List[int]]) -> None:
+		if seqs is not None:
+			self.wal.ack_many(seqs)
+
+	def _receipts(self, seqs: Optional[List[int]], count: int) -> List[Optional[DeliveryCallback]]:
+		"""Per reading, the callback acknowledging it once its alert is delivered."""
+		if seqs is None:
+			return [None] * count
+		return [partial(self.wal.ack, seq) for seq in seqs]
+
+	async def _analyze_in_pool(
+		self,
+		vitals_events: Sequence[Dict[str, Any]],
+		receipts: List[Optional[DeliveryCallback]],
+		owned: bool = False,
+	) -> List[Dict[str, Any]]:
+		events = [self._with_windows(e, owned) for e in vitals_events]
+		bounds = self._bounds_many(events)
+		if self.cache is None:
+			evaluations = await self._pool_evaluate(events, bounds)
+			return [
+				self._decide(tagged_event, assessment, None, receipt)
+				for (tagged_event, assessment), receipt in zip(evaluations, receipts)
+			]
+		keys, entries, misses = self._lookup(events, bounds)
+		if misses:
+			evaluations = await self._pool_evaluate(
+				[events[i] for i in misses], None if bounds is None else [bounds[i] for i in misses]
+			)
+			self._fill(keys, entries, misses, evaluations)
+		return self._decide_all(events, entries, receipts, owned)
+
+	async def _pool_evaluate(
+		self, events: List[Dict[str, Any]], bounds: Optional[List[ThresholdBounds]]
+	) -> List[Evaluation]:
+		if len(events) == 1:
+			return [await self.pool.evaluate(events[0], None if bounds is None else bounds[0])]
+		return await self.pool.evaluate_many(events, bounds)
+
+	def analyze_many(self, vitals_events: Sequence[Dict[str, Any]]) -> List[Dict[str, Any]]:
+		"""Analyze a burst of vitals events.
+
+		Equivalent to calling ``analyze`` on each event in order, but rule
+		tagging and threshold checks run column-wise over the whole batch.
+		With a cache, only readings neither cached nor repeated earlier in
+		the batch are evaluated.
+		"""
+		if self.wal is not None:
+			seqs = self.wal.append_many(vitals_events)
+			try:
+				return self._analyze_many(vitals_events, self._receipts(seqs, len(seqs)))
+			except Exception:
+				self.wal.ack_many(seqs)
+				raise
+		return self._analyze_many(vitals_events, [None] * len(vitals_events))
+
+	def _analyze_many(
+		self, vitals_events: Sequence[Dict[str, Any]], receipts: List[Optional[DeliveryCallback]]
+	) -> List[Dict[str, Any]]:
+		vitals_events = [self._with_windows(e) for e in vitals_events]
+		bounds = self._bounds_many(vitals_events)
+		if self.cache is None:
+			return [
+				self._decide(tagged_event, assessment, None, receipt)
+				for (tagged_event, assessment), receipt in zip(self._evaluate_batch(vitals_events, bounds), receipts)
+			]
+		keys, entries, misses = self._lookup(vitals_events, bounds)
+		if misses:
+			evaluations = self._evaluate_batch(
+				[vitals_events[i] for i in misses], None if bounds is None else [bounds[i] for i in misses]
+			)
+			self._fill(keys, entries, misses, evaluations)
+		return self._decide_all(vitals_events, entries, receipts)
+
+	def recover(self) -> int:
+		"""Re-analyze readings the write-ahead log holds unacknowledged from before a crash.
+
+		Their alerts are dispatched again, so some may be delivered twice
+		(at-least-once), and each reading is acknowledged once its alert is
+		delivered. A reading whose analysis raises is acknowledged at once,
+		so a bad reading can't block every later start. Returns the number
+		of readings replayed.
+		"""
+		if self.wal is None:
+			return 0
+		recovered = self.wal.recovered()
+		for seq, vitals_event in recovered:
+			try:
+				self._analyze(vitals_event, receipt=partial(self.wal.ack, seq))
+			except Exception:
+				self.wal.ack(seq)
+				raise
+		self.wal.checkpoint()
+		return len(recovered)
+
+	def _evaluate_batch(
+		self, vitals_events: List[Dict[str, Any]], bounds: Optional[List[ThresholdBounds]]
+	) -> List[Evaluation]:
 		if self.rule_engine:
-			tagged_event = self.rule_engine.process(vitals_event)
-			tags = tagged_event.get("tags", {})
+			tagged_events = self.rule_engine.process_batch(vitals_events)
 		else:
-			tagged_event = vitals_event
-			tags = {}
+			tagged_events = list(vitals_events)
+		return list(zip(tagged_events, evaluate_vitals_batch(tagged_events, bounds)))
 
-		# Evaluate vitals (can use tags in future enhancements)
-		assessment = evaluate_vitals_against_thresholds(tagged_event)
+	def _bounds(self, vitals_event: Dict[str, Any]) -> Optional[ThresholdBounds]:
+		"""The event's threshold profile bounds, or None for ``VITAL_THRESHOLDS``."""
+		if not self.threshold_profiles:
+			return None
+		return self.threshold_profiles.resolve(vitals_event)
+
+	def _bounds_many(self, vitals_events: List[Dict[str, Any]]) -> Optional[List[ThresholdBounds]]:
+		if not self.threshold_profiles:
+			return None
+		return self.threshold_profiles.resolve_many(vitals_events)
+
+	def _tag(
+		self, vitals_event: Dict[str, Any], shared: bool
+	) -> Tuple[Dict[str, Any], Optional[Dict[str, Any]]]:
+		"""Tag an event: ``(tagged copy, None)``, or ``(event, read-only tags)`` if ``shared``."""
+		if not self.rule_engine:
+			return vitals_event, None
+		if shared:
+			return vitals_event, self.rule_engine.tag(vitals_event)
+		return self.rule_engine.process(vitals_event), None
+
+	def _remember(self, key: Hashable, tags: Optional[Dict[str, Any]], assessment: Dict[str, Any]) -> CacheEntry:
+		entry = (tags, assessment)
+		self.cache.put(key, entry)
+		return entry
+
+	def _lookup(
+		self, events: List[Dict[str, Any]], bounds: Optional[List[ThresholdBounds]]
+	) -> Tuple[List[Optional[Hashable]], List[Optional[CacheEntry]], List[int]]:
+		"""Cache keys and entries of a batch, and the positions still to evaluate.
+
+		Repeats of a reading missing from the cache are evaluated only once.
+		"""
+		keys: List[Optional[Hashable]] = []
+		entries: List[Optional[CacheEntry]] = []
+		misses: List[int] = []
+		pending = set()
+		for i, event in enumerate(events):
+			key = self.cache.key(event, self.rule_engine, None if bounds is None else bounds[i])
+			entry = None
+			if key is None:
+				misses.append(i)
+			elif key not in pending:
+				entry = self.cache.get(key)
+				if entry is None:
+					pending.add(key)
+					misses.append(i)
+			keys.append(key)
+			entries.append(entry)
+		return keys, entries, misses
+
+	def _fill(
+		self,
+		keys: List[Optional[Hashable]],
+		entries: List[Optional[CacheEntry]],
+		misses: List[int],
+		evaluations: List[Evaluation],
+	) -> None:
+		"""Store evaluated misses and give repeats of them the same entry."""
+		fresh: Dict[Hashable, CacheEntry] = {}
+		for i, (tagged_event, assessment) in zip(misses, evaluations):
+			tags = tagged_event["tags"] if self.rule_engine else None
+			entries[i] = (tags, assessment)
+			if keys[i] is not None:
+				fresh[keys[i]] = self._remember(keys[i], tags, assessment)
+		for i, key in enumerate(keys):
+			if entries[i] is None:
+				entries[i] = fresh[key]
+
+	def _decide_all(
+		self,
+		events: List[Dict[str, Any]],
+		entries: List[CacheEntry],
+		receipts: List[Optional[DeliveryCallback]],
+		owned: bool = False,
+	) -> List[Dict[str, Any]]:
+		return [
+			self._decide_cached(event, entry, owned, receipt)
+			for event, entry, receipt in zip(events, entries, receipts)
+		]
+
+	def _decide_cached(
+		self, vitals_event: Dict[str, Any], entry: CacheEntry, owned: bool, receipt: Optional[DeliveryCallback] = None
+	) -> Dict[str, Any]:
+		"""Decide from a cache entry, handing out copies unless the caller accepts shared tags."""
+		tags, assessment = entry
+		if tags is not None and not owned:
+			tags = {k: v.copy() if isinstance(v, (list, dict)) else v for k, v in tags.items()}
+		return self._decide(vitals_event, dict(assessment), tags, receipt)
+
+	def _with_windows(self, vitals_event: Dict[str, Any], owned: bool = False) -> Dict[str, Any]:
+		"""Record the event in the window store and attach its aggregates (in place if ``owned``)."""
+		if self.window_store is None:
+			return vitals_event
+		aggregates = self.window_store.observe(vitals_event)
+		if aggregates is None:
+			return vitals_event
+		if owned:
+			vitals_event["window"] = aggregates
+			return vitals_event
+		return {**vitals_event, "window": aggregates}
+
+	def _decide(
+		self,
+		tagged_event: Dict[str, Any],
+		assessment: Dict[str, Any],
+		tags: Optional[Dict[str, Any]] = None,
+		receipt: Optional[DeliveryCallback] = None,
+	) -> Dict[str, Any]:
+		"""Dispatch alerts for an assessment and build the decision dict.
+
+		Given ``tags``, ``tagged_event`` is the untagged event they belong to
+		and the tagged copy is only built if an alert or the event store
+		needs it. ``receipt`` is called once the alert has been delivered,
+		or once the decision is made if there is none.
+		"""
+		event = tagged_event
+		if tags is None:
+			tags = tagged_event.get("tags", {}) if self.rule_engine else {}
+		else:
+			tagged_event = None
 		alerts: List[Dict[str, Any]] = []
 		if assessment.get("should_alert"):
+			if tagged_event is None:
+				tagged_event = {**event, "tags": tags}
 			alert_payload = {
 				"type": assessment["severity"],
 				"message": assessment["message"],
 				"data": tagged_event,
 			}
-			self.alert_dispatcher.dispatch(alert_payload)
+			if self.metrics is None:
+				self._dispatch(alert_payload, receipt)
+			else:
+				start = time.perf_counter()
+				self._dispatch(alert_payload, receipt)
+				self.metrics.observe("alert_dispatch_seconds", time.perf_counter() - start, type=alert_payload["type"])
 			alerts.append(alert_payload)
+			receipt = None
 
-		return {
+		decision = {
 			"assessment": assessment,
 			"alerts": alerts,
 			"tags": tags,
 		}
+		if self.window_store is not None and "window" in event:
+			decision["window"] = event["window"]
+		if self.history is not None:
+			self.history.append(event, assessment)
+		if self.event_store is not None and self.rule_engine:
+			# Kept with its tags so rule changes can re-tag it later
+			if tagged_event is None:
+				tagged_event = {**event, "tags": tags}
+			decision["event_id"] = self.event_store.add(tagged_event)
+		if receipt is not None:
+			receipt()
+		return decision
+
+	def _dispatch(self, alert: Dict[str, Any], receipt: Optional[DeliveryCallback]) -> None:
+		if receipt is None:
+			self.alert_dispatcher.dispatch(alert)
+		else:
+			self.alert_dispatcher.dispatch_tracked(alert, receipt)
@@ -0,0 +1,109 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+from ..tools.vitals import DEFAULT_BOUNDS, ThresholdBounds
+
+# (tags shared by every hit or None without a rule engine, assessment)
+CacheEntry = Tuple[Optional[Dict[str, Any]], Dict[str, Any]]
+
+
+def _threshold_key(event: Dict[str, Any], bounds: Optional[ThresholdBounds]) -> Hashable:
+	"""Inputs of ``evaluate_vitals_against_thresholds``; raises TypeError if unhashable."""
+	if bounds is None or bounds is DEFAULT_BOUNDS:
+		bounds, checks = DEFAULT_BOUNDS, None
+	else:
+		checks = bounds.checks
+	values = []
+	for field, _, _ in bounds.checks:
+		value = event.get(field)
+		hash(value)
+		# 40 and 40.0 compare equal but render differently in the message
+		values.append((type(value), value))
+	values.append(bool(event.get("fall_detected")))
+	return (checks, tuple(values))
+
+
+class AnalysisCache:
+	"""Bounded LRU/TTL cache of tags and assessments for repeated identical readings.
+
+	Keys hold only what the result depends on: the values of the fields the
+	rule engine's enabled rules reference (``RuleEngine.fingerprint``) and
+	those the vital thresholds read, so readings that differ elsewhere
+	(timestamps, device metadata no rule uses) share an entry. Entries
+	expire after ``ttl_seconds`` (None keeps them until evicted) and all of
+	them are dropped when the rule set version changes. Readings resolved
+	to other threshold profiles get other entries. Events that can't be
+	keyed (unhashable values) are never cached.
+	"""
+
+	def __init__(
+		self,
+		max_entries: int = 10000,
+		ttl_seconds: Optional[float] = 60.0,
+		clock: Callable[[], float] = time.monotonic,
+	) -> None:
+		if max_entries < 1:
+			raise ValueError("max_entries must be positive")
+		self.max_entries = max_entries
+		self.ttl_seconds = ttl_seconds
+		self.clock = clock
+		self.hits = 0
+		self.misses = 0
+		self._lock = threading.Lock()
+		self._version: Optional[int] = None
+		# Key -> (expiry time, entry), least recently used first
+		self._entries: "OrderedDict[Hashable, Tuple[float, CacheEntry]]" = OrderedDict()
+
+	def __len__(self) -> int:
+		return len(self._entries)
+
+	def key(
+		self, event: Dict[str, Any], rule_engine=None, bounds: Optional[ThresholdBounds] = None
+	) -> Optional[Hashable]:
+		"""Cache key of an event checked against ``bounds``, or None if it can't be cached."""
+		try:
+			thresholds = _threshold_key(event, bounds)
+		except TypeError:
+			return None
+		if not rule_engine:
+			return (None, None, thresholds)
+		fingerprint = rule_engine.fingerprint(event)
+		if fingerprint is None:
+			return None
+		version, values = fingerprint
+		if version != self._version:
+			with self._lock:
+				if version != self._version:
+					self._entries.clear()
+					self._version = version
+		# The version keeps results computed under older rules from ever matching
+		return (version, values, thresholds)
+
+	def get(self, key: Hashable) -> Optional[CacheEntry]:
+		now = self.clock()
+		with self._lock:
+			item = self._entries.get(key)
+			if item is None or item[0] <= now:
+				if item is not None:
+					del self._entries[key]
+				self.misses += 1
+				return None
+			self._entries.move_to_end(key)
+			self.hits += 1
+			return item[1]
+
+	def put(self, key: Hashable, entry: CacheEntry) -> None:
+		expires = self.clock() + self.ttl_seconds if self.ttl_seconds is not None else float("inf")
+		with self._lock:
+			if key[0] is not None and key[0] != self._version:
+				return  # computed under a rule set that has since changed
+			self._entries[key] = (expires, entry)
+			self._entries.move_to_end(key)
+			while len(self._entries) > self.max_entries:
+				self._entries.popitem(last=False)
+
+	def clear(self) -> None:
+		with self._lock:
+			self._entries.clear()
@@ -0,0 +1,115 @@
+import asyncio
+import math
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Any, List, Optional, Sequence, Tuple
+
+from ..tools.vitals import ThresholdBounds, evaluate_vitals_against_thresholds, evaluate_vitals_batch
+
+Evaluation = Tuple[Dict[str, Any], Dict[str, Any]]  # (tagged event, assessment)
+RulesPayload = Optional[List[Dict[str, Any]]]
+
+# Per worker process: (rule set version, RuleEngine or None)
+_worker_state: Tuple[Optional[int], Any] = (None, None)
+
+
+def _install_rules(version: Optional[int], rules: RulesPayload) -> None:
+	"""Build this worker's rule engine from a serialized rule set."""
+	global _worker_state
+	engine = None
+	if rules is not None:
+		# Imported here: the rule engine package depends on core
+		from ...application.rule_engine import Rule, RuleEngine
+
+		engine = RuleEngine()
+		for data in rules:
+			engine.add_rule(Rule.model_validate(data))
+	_worker_state = (version, engine)
+
+
+def _evaluate_chunk(
+	version: Optional[int],
+	events: List[Dict[str, Any]],
+	bounds: Optional[List[Optional[ThresholdBounds]]] = None,
+	rules: RulesPayload = None,
+	with_rules: bool = False,
+) -> Optional[List[Evaluation]]:
+	"""Tag and assess events (against ``bounds``, if given) in a worker; None if its rule set isn't ``version``."""
+	if with_rules:
+		_install_rules(version, rules)
+	current, engine = _worker_state
+	if current != version:
+		return None
+	if len(events) == 1:
+		tagged = [engine.process(events[0]) if engine is not None else events[0]]
+		return [(tagged[0], evaluate_vitals_against_thresholds(tagged[0], None if bounds is None else bounds[0]))]
+	tagged = engine.process_batch(events) if engine is not None else list(events)
+	return list(zip(tagged, evaluate_vitals_batch(tagged, bounds)))
+
+
+class AnalysisPool:
+	"""Process pool that runs rule tagging and threshold checks off the event loop.
+
+	Each worker holds its own compiled copy of the rule set, installed when
+	the pool starts. Requests carry the rule set version; a worker holding
+	an older version answers "stale" and the request is resubmitted with the
+	current rules attached, so rule changes reach every worker lazily.
+	"""
+
+	def __init__(self, rule_engine=None, max_workers: Optional[int] = None) -> None:
+		self.rule_engine = rule_engine
+		self.max_workers = max_workers or os.cpu_count() or 1
+		self._rules_cache: Tuple[Optional[int], RulesPayload] = (None, None)
+		version, rules = self._current_rules()
+		# spawn: forking a process that already runs threads is unsafe
+		self._executor = ProcessPoolExecutor(
+			max_workers=self.max_workers,
+			mp_context=multiprocessing.get_context("spawn"),
+			initializer=_install_rules,
+			initargs=(version, rules),
+		)
+
+	async def evaluate(self, event: Dict[str, Any], bounds: Optional[ThresholdBounds] = None) -> Evaluation:
+		"""Return ``(tagged event, assessment)`` for one event, checked against ``bounds`` if given."""
+		return (await self._run([event], None if bounds is None else [bounds]))[0]
+
+	async def evaluate_many(
+		self, events: Sequence[Dict[str, Any]], bounds: Optional[Sequence[ThresholdBounds]] = None
+	) -> List[Evaluation]:
+		"""Evaluate events split into one chunk per worker; results keep input order."""
+		if not events:
+			return []
+		size = math.ceil(len(events) / self.max_workers)
+		chunks = [
+			(list(events[i:i + size]), None if bounds is None else list(bounds[i:i + size]))
+			for i in range(0, len(events), size)
+		]
+		results = await asyncio.gather(*(self._run(chunk, chunk_bounds) for chunk, chunk_bounds in chunks))
+		return [evaluation for chunk in results for evaluation in chunk]
+
+	def close(self) -> None:
+		self._executor.shutdown(wait=True, cancel_futures=True)
+
+	async def _run(
+		self, events: List[Dict[str, Any]], bounds: Optional[List[ThresholdBounds]] = None
+	) -> List[Evaluation]:
+		loop = asyncio.get_running_loop()
+		version, _ = self._current_rules()
+		result = await loop.run_in_executor(self._executor, _evaluate_chunk, version, events, bounds)
+		while result is None:
+			# The worker has an older rule set; send the current one along
+			version, rules = self._current_rules()
+			result = await loop.run_in_executor(
+				self._executor, _evaluate_chunk, version, events, bounds, rules, True
+			)
+		return result
+
+	def _current_rules(self) -> Tuple[Optional[int], RulesPayload]:
+		"""Version and serialized enabled rules, re-serialized only when the version changes."""
+		if self.rule_engine is None:
+			return None, None
+		snapshot = self.rule_engine.storage.snapshot()
+		if self._rules_cache[0] != snapshot.version:
+			self._rules_cache = (snapshot.version, [rule.model_dump(mode="json") for rule in snapshot.rules])
+		return self._rules_cache
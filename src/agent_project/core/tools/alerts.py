@@ -1,5 +1,22 @@
+import asyncio
+import logging
 import os
-from typing import Dict, Any
+import threading
+import time
+from collections import deque
+from functools import partial
+from typing import Callable, Deque, Dict, Any, Iterable, List, Optional, Tuple
+
+import httpx
+
+from ..utils.subjects import subject_id
+
+OVERFLOW_POLICIES = ("drop_oldest", "drop_newest", "block")
+
+logger = logging.getLogger("health-agent")
+
+# Called once an alert has been delivered
+DeliveryCallback = Callable[[], None]
 
 
 class AlertDispatcher:
@@ -15,3 +32,333 @@ class AlertDispatcher:
 			# Placeholder for outbound call
 			# e.g., httpx.post(self.webhook_url, json=alert)
 			pass
+
+	def dispatch_tracked(self, alert: Dict[str, Any], on_delivered: DeliveryCallback) -> None:
+		"""Dispatch an alert and call ``on_delivered()`` once it has been delivered.
+
+		Synchronous dispatch has delivered the alert when ``dispatch`` returns.
+		"""
+		self.dispatch(alert)
+		on_delivered()
+
+	def close(self) -> None:
+		"""Release delivery resources. Nothing to do for synchronous dispatch."""
+
+
+class AsyncAlertDispatcher(AlertDispatcher):
+	"""Non-blocking dispatcher that delivers webhook alerts from background workers.
+
+	``dispatch()`` only enqueues onto a bounded queue and returns. Worker
+	coroutines on a dedicated event-loop thread drain the queue through one
+	pooled ``httpx.AsyncClient``, retrying failed deliveries with exponential
+	backoff. When the queue is full, ``overflow`` decides whether the oldest
+	alert is dropped, the new alert is dropped, or the caller blocks.
+	``dispatch_tracked`` callbacks run on the delivery thread after a 2xx
+	response, never for alerts that fail or are dropped.
+	"""
+
+	def __init__(
+		self,
+		webhook_url: Optional[str] = None,
+		max_queue_size: int = 1000,
+		workers: int = 4,
+		overflow: str = "drop_oldest",
+		max_retries: int = 3,
+		backoff_base: float = 0.2,
+		backoff_max: float = 5.0,
+		timeout: float = 5.0,
+	) -> None:
+		super().__init__()
+		if webhook_url is not None:
+			self.webhook_url = webhook_url
+		if overflow not in OVERFLOW_POLICIES:
+			raise ValueError(f"Unknown overflow policy: {overflow}")
+		if max_queue_size < 1 or workers < 1:
+			raise ValueError("max_queue_size and workers must be positive")
+		self.max_queue_size = max_queue_size
+		self.workers = workers
+		self.overflow = overflow
+		self.max_retries = max_retries
+		self.backoff_base = backoff_base
+		self.backoff_max = backoff_max
+		self.timeout = timeout
+
+		self.sent = 0
+		self.failed = 0
+		self.dropped = 0
+
+		self._pending: Deque[Tuple[Dict[str, Any], Optional[DeliveryCallback]]] = deque()
+		self._lock = threading.Lock()
+		self._not_full = threading.Condition(self._lock)
+		self._in_flight = 0
+		self._closed = False
+		self._loop: Optional[asyncio.AbstractEventLoop] = None
+		self._thread: Optional[threading.Thread] = None
+		self._ready = threading.Event()
+		self._available: Optional[asyncio.Semaphore] = None
+		self._tasks: list = []
+		self._client: Optional[httpx.AsyncClient] = None
+
+	# -- producer side (any thread) -------------------------------------
+
+	def dispatch(self, alert: Dict[str, Any]) -> None:
+		self._enqueue(alert, None)
+
+	def dispatch_tracked(self, alert: Dict[str, Any], on_delivered: DeliveryCallback) -> None:
+		self._enqueue(alert, on_delivered)
+
+	def _enqueue(self, alert: Dict[str, Any], on_delivered: Optional[DeliveryCallback]) -> None:
+		logger.info("[ALERT] %s: %s", alert["type"].upper(), alert["message"])
+		if not self.webhook_url:
+			# Logging is the only channel
+			if on_delivered is not None:
+				on_delivered()
+			return
+		if not self._closed:
+			self.start()
+		with self._lock:
+			if self._closed:
+				self.dropped += 1
+				return
+			while len(self._pending) >= self.max_queue_size:
+				if self.overflow == "drop_newest":
+					self.dropped += 1
+					return
+				if self.overflow == "drop_oldest":
+					self._pending.popleft()
+					self.dropped += 1
+					break
+				self._not_full.wait()
+				if self._closed:
+					self.dropped += 1
+					return
+			self._pending.append((alert, on_delivered))
+			# Under the lock: close() marks the dispatcher closed before the loop stops
+			self._loop.call_soon_threadsafe(self._available.release)
+
+	def pending(self) -> int:
+		"""Alerts queued or being delivered."""
+		with self._lock:
+			return len(self._pending) + self._in_flight
+
+	# -- lifecycle --------------------------------------------------------
+
+	def start(self) -> None:
+		"""Start the delivery thread; called lazily by the first dispatch."""
+		if self._thread is not None:
+			return
+		with self._lock:
+			if self._thread is not None:
+				return
+			self._thread = threading.Thread(target=self._run, name="alert-dispatcher", daemon=True)
+			self._thread.start()
+		self._ready.wait()
+
+	def close(self, timeout: float = 10.0) -> None:
+		"""Stop accepting alerts and drain the queue, waiting up to ``timeout`` seconds."""
+		with self._lock:
+			self._closed = True
+			self._not_full.notify_all()
+		if self._thread is None:
+			return
+		future = asyncio.run_coroutine_threadsafe(self._shutdown(timeout), self._loop)
+		future.result()
+		self._thread.join()
+		self._thread = None
+
+	def _run(self) -> None:
+		loop = asyncio.new_event_loop()
+		asyncio.set_event_loop(loop)
+		self._loop = loop
+		self._available = asyncio.Semaphore(0)
+		limits = httpx.Limits(max_connections=self.workers, max_keepalive_connections=self.workers)
+		self._client = httpx.AsyncClient(timeout=self.timeout, limits=limits)
+		self._tasks = []
+		for _ in range(self.workers):
+			self._spawn_worker()
+		self._ready.set()
+		try:
+			loop.run_forever()
+		finally:
+			loop.close()
+
+	async def _shutdown(self, timeout: float) -> None:
+		deadline = self._loop.time() + timeout
+		while self.pending() and self._loop.time() < deadline:
+			await asyncio.sleep(0.01)
+		for task in self._tasks:
+			task.cancel()
+		await asyncio.gather(*self._tasks, return_exceptions=True)
+		with self._lock:
+			# Anything still queued after the deadline is abandoned
+			self.dropped += len(self._pending)
+			self._pending.clear()
+		await self._client.aclose()
+		self._loop.call_soon(self._loop.stop)
+
+	# -- consumer side (delivery thread) ------------------------------------
+
+	def _spawn_worker(self) -> None:
+		task = self._loop.create_task(self._worker())
+		task.add_done_callback(self._worker_done)
+		self._tasks.append(task)
+
+	def _worker_done(self, task: "asyncio.Task[None]") -> None:
+		"""Replace a worker that died on an unexpected error, counting its alert as failed."""
+		if task.cancelled():
+			return
+		logger.error("Alert delivery failed", exc_info=task.exception())
+		self.failed += 1
+		self._tasks.remove(task)
+		self._spawn_worker()
+
+	async def _worker(self) -> None:
+		while True:
+			await self._available.acquire()
+			with self._lock:
+				if not self._pending:
+					# The alert behind this permit was dropped on overflow
+					continue
+				alert, on_delivered = self._pending.popleft()
+				self._in_flight += 1
+				self._not_full.notify()
+			try:
+				if await self._deliver(alert) and on_delivered is not None:
+					on_delivered()
+			except asyncio.CancelledError:
+				# Shut down mid-delivery
+				self.dropped += 1
+				raise
+			finally:
+				with self._lock:
+					self._in_flight -= 1
+
+	async def _deliver(self, alert: Dict[str, Any]) -> bool:
+		"""Post an alert, retrying transient failures; True once the webhook accepted it."""
+		for attempt in range(self.max_retries + 1):
+			try:
+				response = await self._client.post(self.webhook_url, json=alert)
+				if response.status_code < 500 and response.status_code != 429:
+					if response.is_success:
+						self.sent += 1
+						return True
+					# Client errors won't succeed on retry
+					self.failed += 1
+					return False
+			except httpx.TransportError:
+				pass
+			if attempt < self.max_retries:
+				await asyncio.sleep(min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+		self.failed += 1
+		return False
+
+
+class AlertCoalescer(AlertDispatcher):
+	"""Groups repeated alerts and delivers them in batches to another dispatcher.
+
+	Alerts are grouped by subject (patient/device id), type and message for
+	``window_seconds``; each window is then delivered as one ``batch``
+	payload with a count per group. Alert types in ``immediate_types``
+	(falls are ``critical``) bypass coalescing and go out at once.
+	``dispatch_tracked`` callbacks of coalesced alerts run once their batch
+	has been delivered downstream.
+	"""
+
+	def __init__(
+		self,
+		downstream: Optional[AlertDispatcher] = None,
+		window_seconds: float = 30.0,
+		immediate_types: Iterable[str] = ("critical",),
+		autoflush: bool = True,
+		clock: Callable[[], float] = time.time,
+	) -> None:
+		super().__init__()
+		self.downstream = downstream or AlertDispatcher()
+		self.window_seconds = window_seconds
+		self.immediate_types = frozenset(immediate_types)
+		self.autoflush = autoflush
+		self.clock = clock
+		self._lock = threading.Lock()
+		self._groups: Dict[Tuple[Optional[str], str, str], Dict[str, Any]] = {}
+		self._receipts: List[DeliveryCallback] = []
+		self._window_start: Optional[float] = None
+		self._timer: Optional[threading.Timer] = None
+
+	def dispatch(self, alert: Dict[str, Any]) -> None:
+		self._add(alert, None)
+
+	def dispatch_tracked(self, alert: Dict[str, Any], on_delivered: DeliveryCallback) -> None:
+		self._add(alert, on_delivered)
+
+	def _add(self, alert: Dict[str, Any], on_delivered: Optional[DeliveryCallback]) -> None:
+		if alert["type"] in self.immediate_types:
+			self._send(alert, on_delivered)
+			return
+
+		now = self.clock()
+		data = alert.get("data") or {}
+		key = (subject_id(data), alert["type"], alert["message"])
+		with self._lock:
+			expired = self._window_start is not None and now - self._window_start >= self.window_seconds
+		if expired:
+			self.flush()
+
+		with self._lock:
+			group = self._groups.get(key)
+			if group is None:
+				self._groups[key] = {
+					"subject": key[0],
+					"type": alert["type"],
+					"message": alert["message"],
+					"count": 1,
+					"first_seen": now,
+					"last_seen": now,
+					"data": data,
+				}
+			else:
+				group["count"] += 1
+				group["last_seen"] = now
+				group["data"] = data
+			if on_delivered is not None:
+				self._receipts.append(on_delivered)
+			if self._window_start is None:
+				self._window_start = now
+				if self.autoflush:
+					self._timer = threading.Timer(self.window_seconds, self.flush)
+					self._timer.daemon = True
+					self._timer.start()
+
+	def flush(self) -> None:
+		"""Deliver everything buffered in the current window as one batch."""
+		with self._lock:
+			groups: List[Dict[str, Any]] = list(self._groups.values())
+			self._groups = {}
+			receipts, self._receipts = self._receipts, []
+			self._window_start = None
+			timer, self._timer = self._timer, None
+		if timer is not None:
+			timer.cancel()
+		if not groups:
+			return
+		total = sum(g["count"] for g in groups)
+		batch = {
+			"type": "batch",
+			"message": f"{total} alerts in {len(groups)} groups",
+			"alerts": groups,
+		}
+		self._send(batch, partial(_run_all, receipts) if receipts else None)
+
+	def _send(self, alert: Dict[str, Any], on_delivered: Optional[DeliveryCallback]) -> None:
+		if on_delivered is None:
+			self.downstream.dispatch(alert)
+		else:
+			self.downstream.dispatch_tracked(alert, on_delivered)
+
+	def close(self) -> None:
+		self.flush()
+		self.downstream.close()
+
+
+def _run_all(callbacks: List[DeliveryCallback]) -> None:
+	for callback in callbacks:
+		callback()
@@ -0,0 +1,253 @@
+import fcntl
+import json
+import logging
+import math
+import os
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from .vitals import DEFAULT_BOUNDS, VITAL_THRESHOLDS, ThresholdBounds
+
+# Upper bound on distinct matching-profile combinations compiled per profile set
+_BOUNDS_MEMO_LIMIT = 4096
+
+logger = logging.getLogger("health-agent")
+
+# (inode, mtime, size) of the profiles file last loaded
+_FileStamp = Tuple[int, int, int]
+
+_PROFILE_KEYS = frozenset({"id", "match", "thresholds", "priority"})
+_MISSING = object()
+
+# (match keys, match values -> positions of the profiles with them)
+_Shape = Tuple[Tuple[str, ...], Dict[Tuple[Any, ...], List[int]]]
+
+
+def _is_bound(value: Any) -> bool:
+	return value is None or (
+		isinstance(value, (int, float)) and not isinstance(value, bool) and not math.isnan(value)
+	)
+
+
+def _validated(profile: Dict[str, Any]) -> Dict[str, Any]:
+	"""Normalized copy of a profile dict; raises ValueError if it is malformed."""
+	if not isinstance(profile, dict):
+		raise ValueError("Threshold profile must be an object")
+	unknown = set(profile) - _PROFILE_KEYS
+	if unknown:
+		raise ValueError(f"Unknown threshold profile keys: {sorted(unknown)}")
+	profile_id = profile.get("id")
+	if not isinstance(profile_id, str) or not profile_id:
+		raise ValueError("Threshold profile needs a non-empty string id")
+	match = profile.get("match", {})
+	if not isinstance(match, dict) or not all(isinstance(k, str) for k in match):
+		raise ValueError(f"Threshold profile {profile_id}: match must map meta keys to values")
+	try:
+		hash(tuple(match.values()))
+	except TypeError:
+		raise ValueError(f"Threshold profile {profile_id}: match values must be scalars")
+	priority = profile.get("priority", 0)
+	if not isinstance(priority, int) or isinstance(priority, bool):
+		raise ValueError(f"Threshold profile {profile_id}: priority must be an integer")
+	thresholds = profile.get("thresholds", {})
+	if not isinstance(thresholds, dict):
+		raise ValueError(f"Threshold profile {profile_id}: thresholds must map vitals to bounds")
+	for vital, bounds in thresholds.items():
+		if not isinstance(bounds, dict) or not set(bounds) <= {"low", "high"}:
+			raise ValueError(f"Threshold profile {profile_id}: {vital} bounds may only set low and high")
+		if not all(_is_bound(v) for v in bounds.values()):
+			raise ValueError(f"Threshold profile {profile_id}: {vital} bounds must be numbers or null")
+		low, high = bounds.get("low"), bounds.get("high")
+		if low is not None and high is not None and low > high:
+			raise ValueError(f"Threshold profile {profile_id}: {vital} low is above high")
+	return {
+		"id": profile_id,
+		"match": dict(match),
+		"thresholds": {vital: dict(bounds) for vital, bounds in thresholds.items()},
+		"priority": priority,
+	}
+
+
+class ThresholdProfiles:
+	"""Per-cohort and per-patient vital thresholds, resolved from event ``meta``.
+
+	A profile is a dict ``{"id", "match", "thresholds", "priority"}``. It
+	applies to events whose ``meta`` has every ``match`` key and value
+	(e.g. ``{"cohort": "post_op"}`` or ``{"patient_id": "p1"}``) and
+	overrides the given ``low``/``high`` bounds (null removes one) on top of
+	``VITAL_THRESHOLDS``. Every matching profile applies, lowest ``priority``
+	first and then fewest match keys first, so a patient's profile refines
+	their cohort's.
+
+	Profiles are indexed by the tuple of keys they match on, so resolving
+	an event costs one hash lookup per distinct tuple however many profiles
+	there are. Each distinct set of matching profiles is compiled once into
+	a ``ThresholdBounds``.
+	"""
+
+	def __init__(self, profiles: Iterable[Dict[str, Any]] = ()) -> None:
+		self._lock = threading.Lock()
+		# (profiles in application order, shape index, bounds memo), swapped as one tuple
+		self._active: Tuple[Tuple[Dict[str, Any], ...], List[_Shape], Dict[Tuple[int, ...], ThresholdBounds]] = (
+			(), [], {}
+		)
+		self._install(profiles)
+
+	def __len__(self) -> int:
+		return len(self._active[0])
+
+	def replace_all(self, profiles: Iterable[Dict[str, Any]]) -> None:
+		"""Validate and install a new profile set; raises ValueError and keeps the old one if invalid."""
+		self._install(profiles)
+
+	def _install(self, profiles: Iterable[Dict[str, Any]]) -> None:
+		validated = [_validated(profile) for profile in profiles]
+		ids = [profile["id"] for profile in validated]
+		if len(set(ids)) != len(ids):
+			raise ValueError("Threshold profile ids must be unique")
+		ordered = tuple(sorted(validated, key=lambda p: (p["priority"], len(p["match"]))))
+		tables: Dict[Tuple[str, ...], Dict[Tuple[Any, ...], List[int]]] = {}
+		for position, profile in enumerate(ordered):
+			keys = tuple(sorted(profile["match"]))
+			values = tuple(profile["match"][k] for k in keys)
+			tables.setdefault(keys, {}).setdefault(values, []).append(position)
+		with self._lock:
+			self._active = (ordered, list(tables.items()), {})
+
+	def list_profiles(self) -> List[Dict[str, Any]]:
+		"""Profiles in the order they apply."""
+		return [_validated(profile) for profile in self._active[0]]
+
+	def resolve(self, event: Dict[str, Any]) -> ThresholdBounds:
+		"""Bounds for an event: ``VITAL_THRESHOLDS`` refined by every matching profile."""
+		profiles, shapes, memo = self._active
+		if not shapes:
+			return DEFAULT_BOUNDS
+		meta = event.get("meta")
+		if not isinstance(meta, dict):
+			meta = {}
+		matched: List[int] = []
+		for keys, table in shapes:
+			try:
+				positions = table.get(tuple(meta.get(k, _MISSING) for k in keys))
+			except TypeError:
+				continue  # unhashable meta value; no profile matches it
+			if positions:
+				matched.extend(positions)
+		if not matched:
+			return DEFAULT_BOUNDS
+		key = tuple(sorted(matched))
+		bounds = memo.get(key)
+		if bounds is None:
+			bounds = self._compile([profiles[position] for position in key])
+			if len(memo) < _BOUNDS_MEMO_LIMIT:
+				memo[key] = bounds
+		return bounds
+
+	def resolve_many(self, events: Iterable[Dict[str, Any]]) -> List[ThresholdBounds]:
+		return [self.resolve(event) for event in events]
+
+	@staticmethod
+	def _compile(profiles: List[Dict[str, Any]]) -> ThresholdBounds:
+		thresholds = {vital: dict(bounds) for vital, bounds in VITAL_THRESHOLDS.items()}
+		for profile in profiles:
+			for vital, bounds in profile["thresholds"].items():
+				thresholds.setdefault(vital, {}).update(bounds)
+		return ThresholdBounds(thresholds, tuple(profile["id"] for profile in profiles))
+
+
+class PublishedThresholdProfiles(ThresholdProfiles):
+	"""Threshold profiles shared by worker processes through a versioned JSON file.
+
+	Works like ``PublishedRuleStorage``: ``replace_all`` takes an exclusive
+	``flock`` on ``<path>.lock``, installs the new set and publishes it as
+	``{"version": N, "profiles": [...]}`` by writing a temporary file and
+	renaming it over ``path``. Every worker checks the file with ``stat``
+	(at most every ``poll_interval`` seconds, from ``resolve``) and swaps in
+	a newly published version, so all workers apply the same bounds and
+	the set survives restarts. A plain JSON list, as written by hand, is
+	read as version 0. A missing file means no profiles.
+	"""
+
+	def __init__(self, path: str, poll_interval: float = 1.0) -> None:
+		self.path = path
+		self.poll_interval = poll_interval
+		self._file_lock = threading.Lock()
+		self._stamp: Optional[_FileStamp] = None
+		self._version: Optional[int] = None
+		self._next_poll = 0.0
+		super().__init__()
+		with self._file_lock:
+			self._reload()
+
+	def __len__(self) -> int:
+		self._poll()
+		return super().__len__()
+
+	def replace_all(self, profiles: Iterable[Dict[str, Any]]) -> None:
+		"""Validate, install and publish a new profile set; raises ValueError and publishes nothing if invalid."""
+		profiles = list(profiles)
+		with self._file_lock:
+			fd = os.open(self.path + ".lock", os.O_RDWR | os.O_CREAT, 0o644)
+			try:
+				fcntl.flock(fd, fcntl.LOCK_EX)
+				self._reload()
+				self._install(profiles)
+				self._version = (self._version or 0) + 1
+				self._stamp = self._write(self._version)
+			finally:
+				os.close(fd)
+
+	def list_profiles(self) -> List[Dict[str, Any]]:
+		self._poll()
+		return super().list_profiles()
+
+	def resolve(self, event: Dict[str, Any]) -> ThresholdBounds:
+		self._poll()
+		return super().resolve(event)
+
+	def _poll(self) -> None:
+		if time.monotonic() >= self._next_poll and self._file_lock.acquire(blocking=False):
+			# Whoever gets the lock polls; everyone else keeps the current set
+			try:
+				self._reload()
+			except (OSError, ValueError):
+				logger.exception("Keeping the current threshold profiles; %s is unreadable or invalid", self.path)
+			finally:
+				self._file_lock.release()
+
+	def _write(self, version: int) -> _FileStamp:
+		"""Atomically replace the profiles file; returns the new file's stamp."""
+		payload = {"version": version, "profiles": super().list_profiles()}
+		tmp = f"{self.path}.{os.getpid()}.tmp"
+		with open(tmp, "w", encoding="utf-8") as f:
+			json.dump(payload, f, separators=(",", ":"))
+			f.flush()
+			os.fsync(f.fileno())
+			stat = os.fstat(f.fileno())
+		os.replace(tmp, self.path)
+		return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+	def _reload(self) -> None:
+		"""Install the published profiles if the file changed. Caller must hold the file lock."""
+		self._next_poll = time.monotonic() + self.poll_interval
+		try:
+			stat = os.stat(self.path)
+		except FileNotFoundError:
+			return
+		stamp = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+		if stamp == self._stamp:
+			return
+		with open(self.path, "r", encoding="utf-8") as f:
+			payload = json.load(f)
+		if isinstance(payload, list):
+			version, profiles = 0, payload
+		elif isinstance(payload, dict) and isinstance(payload.get("profiles"), list):
+			version, profiles = payload.get("version", 0), payload["profiles"]
+		else:
+			raise ValueError(f"{self.path} must hold a list of threshold profiles")
+		# Mark the file seen first, so an invalid one is reported once
+		self._stamp = stamp
+		self._install(profiles)
+		self._version = version
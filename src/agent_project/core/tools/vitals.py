@@ -1,4 +1,7 @@
-from typing import Dict, Any
+import math
+from typing import Dict, Any, List, Optional, Sequence, Tuple
+
+import numpy as np
 
 VITAL_THRESHOLDS = {
 	"heart_rate": {"low": 45, "high": 120},
@@ -7,11 +10,40 @@ VITAL_THRESHOLDS = {
 }
 
 
-def evaluate_vitals_against_thresholds(vitals: Dict[str, Any]) -> Dict[str, Any]:
+class ThresholdBounds:
+	"""Vital thresholds compiled into flat ``(vital, low, high)`` checks.
+
+	A missing or None bound becomes an infinity, which no reading crosses.
+	``profiles`` names the threshold profiles the bounds were resolved from.
+	"""
+
+	__slots__ = ("checks", "profiles")
+
+	def __init__(self, thresholds: Dict[str, Dict[str, Any]], profiles: Tuple[str, ...] = ()) -> None:
+		checks = []
+		for key, bounds in thresholds.items():
+			low = bounds.get("low")
+			high = bounds.get("high")
+			checks.append((key, -math.inf if low is None else low, math.inf if high is None else high))
+		self.checks: Tuple[Tuple[str, Any, Any], ...] = tuple(checks)
+		self.profiles = profiles
+
+
+DEFAULT_BOUNDS = ThresholdBounds(VITAL_THRESHOLDS)
+
+# Types whose comparisons against the (small, float-representable) bounds give
+# the same answer after conversion to float64
+_NUMERIC_TYPES = frozenset({int, float, bool, type(None)})
+
+
+def evaluate_vitals_against_thresholds(
+	vitals: Dict[str, Any], bounds: Optional[ThresholdBounds] = None
+) -> Dict[str, Any]:
 	"""Return a simple assessment and severity for the provided vitals.
 
 	Rules are intentionally simple and transparent to start; they can be
-	replaced with learned policies later.
+	replaced with learned policies later. ``bounds`` defaults to
+	``VITAL_THRESHOLDS``.
 	"""
 	issues: list[str] = []
 	severity = "info"
@@ -21,17 +53,120 @@ def evaluate_vitals_against_thresholds(vitals: Dict[str, Any]) -> Dict[str, Any]
 		issues.append("Fall detected")
 		severity = "critical"
 
-	for key, bounds in VITAL_THRESHOLDS.items():
+	for key, low, high in (DEFAULT_BOUNDS if bounds is None else bounds).checks:
 		value = vitals.get(key)
 		if value is None:
 			continue
-		if value < bounds["low"]:
+		if value < low:
 			issues.append(f"{key} low: {value}")
 			severity = "high" if severity != "critical" else severity
-		elif value > bounds["high"]:
+		elif value > high:
 			issues.append(f"{key} high: {value}")
 			severity = "high" if severity != "critical" else severity
 
 	should_alert = len(issues) > 0
 	message = ", ".join(issues) if issues else "Vitals within expected ranges"
 	return {"should_alert": should_alert, "severity": severity, "message": message}
+
+
+def _column(values: List[Any], fallback: np.ndarray) -> np.ndarray:
+	"""Convert one vital's values to float64, NaN for missing ones.
+
+	Values of any other type are left as NaN and flagged for the scalar path.
+	"""
+	if all(type(v) in _NUMERIC_TYPES for v in values):
+		try:
+			return np.array(values, dtype=np.float64)
+		except OverflowError:
+			pass
+	column = np.full(len(values), np.nan)
+	for i, value in enumerate(values):
+		if value is None:
+			continue
+		if type(value) in _NUMERIC_TYPES or isinstance(value, (int, float)):
+			try:
+				column[i] = value
+				continue
+			except OverflowError:
+				pass
+		fallback[i] = True
+	return column
+
+
+def evaluate_vitals_batch(
+	events: Sequence[Dict[str, Any]], bounds: Optional[Sequence[Optional[ThresholdBounds]]] = None
+) -> List[Dict[str, Any]]:
+	"""Columnar variant of ``evaluate_vitals_against_thresholds`` for many events.
+
+	Each vital is gathered into a float64 column and compared against its
+	bounds as a whole array. Events whose values are not plain numbers fall
+	back to the scalar path, so every result matches it exactly. ``bounds``
+	gives each event's thresholds; events sharing bounds are checked together.
+	"""
+	if bounds is None:
+		return _evaluate_columns(events, DEFAULT_BOUNDS)
+	groups: Dict[int, Tuple[ThresholdBounds, List[int]]] = {}
+	for i, event_bounds in enumerate(bounds):
+		if event_bounds is None:
+			event_bounds = DEFAULT_BOUNDS
+		group = groups.get(id(event_bounds))
+		if group is None:
+			group = groups[id(event_bounds)] = (event_bounds, [])
+		group[1].append(i)
+	if len(groups) == 1:
+		return _evaluate_columns(events, next(iter(groups.values()))[0])
+	results: List[Dict[str, Any]] = [None] * len(events)  # type: ignore[list-item]
+	for group_bounds, positions in groups.values():
+		assessments = _evaluate_columns([events[i] for i in positions], group_bounds)
+		for i, assessment in zip(positions, assessments):
+			results[i] = assessment
+	return results
+
+
+def _evaluate_columns(events: Sequence[Dict[str, Any]], bounds: ThresholdBounds) -> List[Dict[str, Any]]:
+	n = len(events)
+	if n == 0:
+		return []
+
+	fallback = np.zeros(n, dtype=bool)
+	columns: List[List[Any]] = []
+	low_masks: List[np.ndarray] = []
+	high_masks: List[np.ndarray] = []
+	for key, low, high in bounds.checks:
+		column = [event.get(key) for event in events]
+		values = _column(column, fallback)
+		# NaN (missing) compares False on both sides, like a skipped key
+		columns.append(column)
+		low_masks.append(values < low)
+		high_masks.append(values > high)
+
+	falls = np.fromiter((bool(event.get("fall_detected")) for event in events), dtype=bool, count=n)
+	flagged = falls | fallback
+	for low, high in zip(low_masks, high_masks):
+		flagged |= low | high
+
+	keys = [key for key, _, _ in bounds.checks]
+	results: List[Dict[str, Any]] = []
+	for i in range(n):
+		if not flagged[i]:
+			results.append({"should_alert": False, "severity": "info", "message": "Vitals within expected ranges"})
+			continue
+		if fallback[i]:
+			results.append(evaluate_vitals_against_thresholds(events[i], bounds))
+			continue
+		issues: List[str] = []
+		severity = "info"
+		if falls[i]:
+			issues.append("Fall detected")
+			severity = "critical"
+		for k, key in enumerate(keys):
+			if low_masks[k][i]:
+				issues.append(f"{key} low: {columns[k][i]}")
+			elif high_masks[k][i]:
+				issues.append(f"{key} high: {columns[k][i]}")
+			else:
+				continue
+			if severity != "critical":
+				severity = "high"
+		results.append({"should_alert": True, "severity": severity, "message": ", ".join(issues)})
+	return results
@@ -0,0 +1,210 @@
+import threading
+import time
+from array import array
+from collections import OrderedDict, deque
+from typing import Callable, Deque, Dict, Any, Optional, Sequence, Tuple
+
+from ..utils.subjects import event_timestamp, subject_id
+
+# Window name -> duration in seconds; names become virtual field segments,
+# e.g. ``window.5m.heart_rate.mean``
+DEFAULT_WINDOWS: Dict[str, float] = {"1m": 60.0, "5m": 300.0, "15m": 900.0}
+WINDOW_VITALS = ("heart_rate", "spo2", "temperature_c")
+
+
+class _WindowStats:
+	"""Running sums and min/max candidates for one window over a series."""
+
+	__slots__ = ("duration", "count", "t0", "v0", "sv", "svv", "st", "stt", "stv", "mins", "maxs")
+
+	def __init__(self, duration: float) -> None:
+		self.duration = duration
+		self.count = 0
+		# Sums are over samples shifted by a reference (t0, v0) to keep them precise
+		self.t0 = 0.0
+		self.v0 = 0.0
+		self.sv = self.svv = self.st = self.stt = self.stv = 0.0
+		# (seq, value) candidates for the minimum/maximum, oldest first
+		self.mins: Deque[Tuple[int, float]] = deque()
+		self.maxs: Deque[Tuple[int, float]] = deque()
+
+	def add(self, timestamp: float, value: float, sign: float = 1.0) -> None:
+		t = timestamp - self.t0
+		v = value - self.v0
+		self.sv += sign * v
+		self.svv += sign * v * v
+		self.st += sign * t
+		self.stt += sign * t * t
+		self.stv += sign * t * v
+
+
+class VitalSeries:
+	"""Recent samples of one vital with O(1) amortized statistics over several windows.
+
+	Samples live in one ring of at most ``capacity`` entries (two
+	``array('d')`` buffers grown up to that size) shared by every window;
+	each window covers the newest samples no older than its duration.
+	Count, mean, variance and the least-squares slope come from running
+	sums, which are recomputed now and then against a newer reference sample.
+	Min/max use monotonic deques.
+	"""
+
+	__slots__ = ("capacity", "_times", "_values", "_seq", "_windows")
+
+	def __init__(self, durations: Sequence[float], capacity: int = 1024) -> None:
+		if capacity < 1 or any(d <= 0 for d in durations):
+			raise ValueError("durations and capacity must be positive")
+		self.capacity = capacity
+		self._times = array("d")
+		self._values = array("d")
+		self._seq = 0  # samples ever pushed; sample i lives at i % capacity
+		self._windows = tuple(_WindowStats(d) for d in durations)
+
+	def push(self, timestamp: float, value: float) -> None:
+		"""Add a sample; timestamps must not go backwards (earlier ones are clamped)."""
+		if self._seq:
+			timestamp = max(timestamp, self._times[(self._seq - 1) % self.capacity])
+		for window in self._windows:
+			self._expire(window, timestamp)
+			if window.count == self.capacity:
+				# Its oldest sample is about to be overwritten
+				self._pop_oldest(window)
+			if not window.count or timestamp - window.t0 > 4 * window.duration:
+				self._rebase(window, timestamp, value)
+
+		if len(self._times) < self.capacity:
+			self._times.append(timestamp)
+			self._values.append(value)
+		else:
+			slot = self._seq % self.capacity
+			self._times[slot] = timestamp
+			self._values[slot] = value
+
+		seq = self._seq
+		for window in self._windows:
+			window.add(timestamp, value)
+			window.count += 1
+			while window.mins and window.mins[-1][1] >= value:
+				window.mins.pop()
+			window.mins.append((seq, value))
+			while window.maxs and window.maxs[-1][1] <= value:
+				window.maxs.pop()
+			window.maxs.append((seq, value))
+		self._seq = seq + 1
+
+	def count(self, index: int) -> int:
+		return self._windows[index].count
+
+	def stats(self, index: int) -> Dict[str, Any]:
+		"""Count, mean, (population) variance, min, max and slope per minute of a window."""
+		window = self._windows[index]
+		n = window.count
+		if not n:
+			return {"count": 0, "mean": None, "var": None, "min": None, "max": None, "slope": None}
+		mean = window.sv / n
+		slope = None
+		spread = n * window.stt - window.st * window.st
+		if n > 1 and spread > 0:
+			slope = 60.0 * (n * window.stv - window.st * window.sv) / spread
+		return {
+			"count": n,
+			"mean": window.v0 + mean,
+			"var": max(window.svv / n - mean * mean, 0.0),
+			"min": window.mins[0][1],
+			"max": window.maxs[0][1],
+			"slope": slope,
+		}
+
+	def _expire(self, window: _WindowStats, now: float) -> None:
+		while window.count and now - self._times[(self._seq - window.count) % self.capacity] > window.duration:
+			self._pop_oldest(window)
+
+	def _pop_oldest(self, window: _WindowStats) -> None:
+		oldest = self._seq - window.count
+		slot = oldest % self.capacity
+		window.add(self._times[slot], self._values[slot], -1.0)
+		window.count -= 1
+		if window.mins[0][0] == oldest:
+			window.mins.popleft()
+		if window.maxs[0][0] == oldest:
+			window.maxs.popleft()
+
+	def _rebase(self, window: _WindowStats, timestamp: float, value: float) -> None:
+		"""Recompute a window's sums relative to its oldest sample (or the new one)."""
+		first = self._seq - window.count
+		if window.count:
+			slot = first % self.capacity
+			timestamp, value = self._times[slot], self._values[slot]
+		window.t0, window.v0 = timestamp, value
+		window.sv = window.svv = window.st = window.stt = window.stv = 0.0
+		for seq in range(first, self._seq):
+			slot = seq % self.capacity
+			window.add(self._times[slot], self._values[slot])
+
+
+class WindowStore:
+	"""Per-patient rolling-window state for vitals trends.
+
+	``observe`` records an event's readings under its ``meta`` patient (or
+	device) id and returns the aggregates for every window, shaped for use as
+	the event's ``window`` field: ``{"5m": {"heart_rate": {"mean": ...}}}``.
+	Readings are timestamped with the event's ``timestamp`` (epoch seconds,
+	top level or in ``meta``) or, failing that, the time of observation. The
+	least recently seen subjects are forgotten beyond ``max_subjects``.
+	"""
+
+	def __init__(
+		self,
+		windows: Optional[Dict[str, float]] = None,
+		vitals: Sequence[str] = WINDOW_VITALS,
+		capacity: int = 1024,
+		max_subjects: int = 10000,
+		clock: Callable[[], float] = time.time,
+	) -> None:
+		self.windows = dict(windows or DEFAULT_WINDOWS)
+		self.vitals = tuple(vitals)
+		self.capacity = capacity
+		self.max_subjects = max_subjects
+		self.clock = clock
+		self._lock = threading.Lock()
+		self._subjects: "OrderedDict[str, Dict[str, VitalSeries]]" = OrderedDict()
+
+	def __len__(self) -> int:
+		return len(self._subjects)
+
+	def observe(self, event: Dict[str, Any]) -> Optional[Dict[str, Dict[str, Dict[str, Any]]]]:
+		"""Record the event's vitals; returns the window aggregates, or None without a subject."""
+		subject = subject_id(event)
+		if subject is None:
+			return None
+		timestamp = event_timestamp(event)
+		if timestamp is None:
+			timestamp = self.clock()
+		readings = [(vital, event.get(vital)) for vital in self.vitals]
+		readings = [(vital, float(v)) for vital, v in readings if type(v) in (int, float)]
+
+		with self._lock:
+			series = self._subjects.get(subject)
+			if series is None:
+				durations = tuple(self.windows.values())
+				series = self._subjects[subject] = {v: VitalSeries(durations, self.capacity) for v in self.vitals}
+				if len(self._subjects) > self.max_subjects:
+					self._subjects.popitem(last=False)
+			else:
+				self._subjects.move_to_end(subject)
+			for vital, value in readings:
+				series[vital].push(timestamp, value)
+			return self._aggregates(series)
+
+	def get(self, subject: str) -> Optional[Dict[str, Dict[str, Dict[str, Any]]]]:
+		"""Current aggregates for a subject, without recording anything."""
+		with self._lock:
+			series = self._subjects.get(subject)
+			return None if series is None else self._aggregates(series)
+
+	def _aggregates(self, series: Dict[str, VitalSeries]) -> Dict[str, Dict[str, Dict[str, Any]]]:
+		return {
+			name: {vital: s.stats(i) for vital, s in series.items() if s.count(i)}
+			for i, name in enumerate(self.windows)
+		}
+
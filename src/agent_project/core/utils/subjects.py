@@ -0,0 +1,35 @@
+from typing import Dict, Any, Optional
+
+# meta keys identifying who/what a reading belongs to, most specific first
+SUBJECT_KEYS = ("patient_id", "device_id")
+
+# Largest timestamp (epoch seconds) accepted: its milliseconds fit in an
+# int64 with headroom for float rounding (about 146 million years)
+MAX_TIMESTAMP = 2 ** 62 // 1000
+
+
+def subject_id(event: Dict[str, Any]) -> Optional[str]:
+	"""Return the patient (or, failing that, device) id from an event's meta."""
+	meta = event.get("meta")
+	if not isinstance(meta, dict):
+		return None
+	for key in SUBJECT_KEYS:
+		value = meta.get(key)
+		if value is not None:
+			return str(value)
+	return None
+
+
+def event_timestamp(event: Dict[str, Any]) -> Optional[float]:
+	"""Return the event's ``timestamp`` (epoch seconds, top level or in meta).
+
+	None unless it is a finite number whose milliseconds fit in an int64,
+	so callers fall back to their clock for values like ``1e300``.
+	"""
+	value = event.get("timestamp")
+	if value is None and isinstance(event.get("meta"), dict):
+		value = event["meta"].get("timestamp")
+	if type(value) in (int, float) and -MAX_TIMESTAMP <= value <= MAX_TIMESTAMP:
+		# NaN fails both comparisons; infinities fail one
+		return float(value)
+	return None
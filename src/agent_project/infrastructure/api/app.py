@@ -1,25 +1,174 @@
-from fastapi import FastAPI, HTTPException, status
-from pydantic import BaseModel, Field
-from typing import List, Optional
+import asyncio
+import os
+from contextlib import asynccontextmanager
 
-from ...core.agent import HealthAgent
+from fastapi import BackgroundTasks, FastAPI, HTTPException, Request, Response, WebSocket, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import ORJSONResponse
+from pydantic import ValidationError
+from typing import List
+
+from ...core.agent import AnalysisCache, AnalysisPool, HealthAgent
+from ...core.tools.alerts import AlertCoalescer, AlertDispatcher, AsyncAlertDispatcher
+from ...core.tools.thresholds import PublishedThresholdProfiles, ThresholdProfiles
+from ...core.tools.windows import WindowStore
 from ...core.utils.validators import validate_vitals_payload
-from ...application.rule_engine import RuleEngine, Rule
+from ...application.rule_engine import (
+	PublishedRuleStorage,
+	Retagger,
+	Rule,
+	RuleEngine,
+	RuleStorage,
+	SQLiteRuleStorage,
+	TaggedEventStore,
+)
+from ..monitoring.logger import logger
+from ..monitoring.metrics import MetricsRegistry
+from ..timeseries.store import COLUMNS, TimeSeriesStore
+from ..wal.log import WriteAheadLog, open_worker_log
+from .schemas import VitalsEvent, parse_vitals, parse_vitals_list
+from .streaming import (
+	DuplexStreamingResponse,
+	LineSplitter,
+	analyze_lines,
+	encode_result,
+	encode_results,
+	iter_line_batches,
+)
+
+
+def _build_alert_dispatcher() -> AlertDispatcher:
+	"""Deliver webhook alerts off the request path when a webhook is configured,
+	optionally coalescing non-critical alerts into windowed batches."""
+	dispatcher: AlertDispatcher
+	if os.getenv("ALERT_WEBHOOK_URL"):
+		dispatcher = AsyncAlertDispatcher(
+			max_queue_size=int(os.getenv("ALERT_QUEUE_SIZE", "1000")),
+			workers=int(os.getenv("ALERT_WORKERS", "4")),
+			overflow=os.getenv("ALERT_OVERFLOW", "drop_oldest"),
+			max_retries=int(os.getenv("ALERT_MAX_RETRIES", "3")),
+		)
+	else:
+		dispatcher = AlertDispatcher()
+	window = float(os.getenv("ALERT_COALESCE_WINDOW", "0"))
+	if window > 0:
+		dispatcher = AlertCoalescer(dispatcher, window_seconds=window)
+	return dispatcher
+
+
+def _build_rule_storage() -> RuleStorage:
+	"""Share rules between workers through a published snapshot file or SQLite, if configured."""
+	poll_interval = float(os.getenv("RULES_POLL_INTERVAL", "1.0"))
+	snapshot_path = os.getenv("RULES_SNAPSHOT_PATH")
+	if snapshot_path:
+		return PublishedRuleStorage(snapshot_path, poll_interval=poll_interval)
+	db_path = os.getenv("RULES_DB_PATH")
+	if db_path:
+		return SQLiteRuleStorage(db_path, poll_interval=poll_interval)
+	return RuleStorage()
+
+
+def _build_event_store() -> TaggedEventStore | None:
+	"""Keep the last EVENT_STORE_MAX_EVENTS tagged events for re-tagging, if set."""
+	max_events = int(os.getenv("EVENT_STORE_MAX_EVENTS", "0"))
+	if max_events > 0:
+		return TaggedEventStore(max_events=max_events)
+	return None
+
+
+def _build_analysis_cache() -> AnalysisCache | None:
+	"""Reuse results for up to ANALYSIS_CACHE_SIZE distinct readings, if set."""
+	max_entries = int(os.getenv("ANALYSIS_CACHE_SIZE", "0"))
+	if max_entries > 0:
+		ttl = float(os.getenv("ANALYSIS_CACHE_TTL_SECONDS", "60"))
+		return AnalysisCache(max_entries=max_entries, ttl_seconds=ttl if ttl > 0 else None)
+	return None
+
+
+def _build_threshold_profiles() -> ThresholdProfiles:
+	"""Share per-cohort/per-patient threshold profiles between workers through THRESHOLD_PROFILES_PATH, if set."""
+	path = os.getenv("THRESHOLD_PROFILES_PATH")
+	if not path:
+		return ThresholdProfiles()
+	return PublishedThresholdProfiles(path, poll_interval=float(os.getenv("RULES_POLL_INTERVAL", "1.0")))
+
+
+def _build_history() -> TimeSeriesStore | None:
+	"""Keep analyzed readings in a time-series store under TIMESERIES_PATH, if set."""
+	path = os.getenv("TIMESERIES_PATH")
+	if path:
+		return TimeSeriesStore(path, segment_rows=int(os.getenv("TIMESERIES_SEGMENT_ROWS", "4096")))
+	return None
+
 
+def _build_wal() -> WriteAheadLog | None:
+	"""Log accepted readings to a write-ahead log under WAL_PATH (one per worker), if set, and replay it on startup."""
+	path = os.getenv("WAL_PATH")
+	if path:
+		return open_worker_log(path, segment_bytes=int(os.getenv("WAL_SEGMENT_BYTES", str(64 * 1024 * 1024))))
+	return None
 
-class VitalsEvent(BaseModel):
-	heart_rate: float = Field(..., ge=0)
-	spo2: float = Field(..., ge=0, le=100)
-	temperature_c: float = Field(..., ge=25, le=45)
-	fall_detected: bool = False
-	meta: dict | None = None
 
+def _build_analysis_pool(engine: RuleEngine) -> AnalysisPool | None:
+	"""Run CPU-bound analysis in worker processes when ANALYSIS_WORKERS > 0."""
+	workers = int(os.getenv("ANALYSIS_WORKERS", "0"))
+	if workers > 0:
+		return AnalysisPool(engine, max_workers=workers)
+	return None
 
-app = FastAPI(title="Health Monitoring Agent API")
 
-# Initialize rule engine and agent
-rule_engine = RuleEngine()
-agent = HealthAgent(rule_engine=rule_engine)
+async def _sync_retagger(interval: float) -> None:
+	"""Re-tag stored events for rule changes published by any worker."""
+	while True:
+		await asyncio.sleep(interval)
+		try:
+			await asyncio.to_thread(retagger.sync)
+		except Exception:
+			logger.exception("Re-tagging after a rule change failed")
+
+
+@asynccontextmanager
+async def lifespan(_: FastAPI):
+	if agent.pool is None:
+		agent.pool = _build_analysis_pool(rule_engine)
+	# Re-dispatch alerts for readings accepted but not fully processed before a crash
+	await asyncio.to_thread(agent.recover)
+	syncing = None
+	if retagger is not None:
+		syncing = asyncio.create_task(_sync_retagger(float(os.getenv("RULES_POLL_INTERVAL", "1.0"))))
+	yield
+	if syncing is not None:
+		syncing.cancel()
+	if agent.pool is not None:
+		await asyncio.to_thread(agent.pool.close)
+	# Drain queued alerts and buffered history before the process exits
+	await asyncio.to_thread(agent.alert_dispatcher.close)
+	if agent.history is not None:
+		await asyncio.to_thread(agent.history.close)
+	if agent.wal is not None:
+		await asyncio.to_thread(agent.wal.close)
+
+
+app = FastAPI(title="Health Monitoring Agent API", lifespan=lifespan)
+
+# Initialize rule engine and agent; METRICS_ENABLED=1 turns on per-rule and per-stage timing,
+# which costs clock reads and a registry lock on every request
+metrics = MetricsRegistry() if os.getenv("METRICS_ENABLED") == "1" else None
+rule_engine = RuleEngine(storage=_build_rule_storage(), metrics=metrics)
+event_store = _build_event_store()
+retagger = Retagger(rule_engine, event_store) if event_store is not None else None
+agent = HealthAgent(
+	alert_dispatcher=_build_alert_dispatcher(),
+	rule_engine=rule_engine,
+	window_store=WindowStore(),
+	metrics=metrics,
+	event_store=event_store,
+	cache=_build_analysis_cache(),
+	threshold_profiles=_build_threshold_profiles(),
+	history=_build_history(),
+	wal=_build_wal(),
+)
 
 
 @app.get("/health")
@@ -27,24 +176,121 @@ def health() -> dict:
 	return {"status": "ok"}
 
 
-@app.post("/v1/analyze")
-def analyze(event: VitalsEvent) -> dict:
+@app.get("/metrics")
+def get_metrics() -> Response:
+	"""Per-rule counters and latency histograms in Prometheus text format."""
+	if metrics is None:
+		raise HTTPException(status_code=404, detail="Metrics are disabled")
+	return Response(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+def _request_body(schema: dict) -> dict:
+	"""OpenAPI request body for handlers that parse the raw body themselves."""
+	return {"requestBody": {"required": True, "content": {"application/json": {"schema": schema}}}}
+
+
+def _invalid_body(exc: ValidationError) -> RequestValidationError:
+	errors = exc.errors(include_url=False)
+	for error in errors:
+		error["loc"] = ("body", *error["loc"])
+	return RequestValidationError(errors)
+
+
+@app.post(
+	"/v1/analyze",
+	response_class=ORJSONResponse,
+	openapi_extra=_request_body(VitalsEvent.model_json_schema()),
+)
+async def analyze(request: Request) -> ORJSONResponse:
+	# Validated once into a plain dict that the agent takes over: no model
+	# instance, dumps or copies on the way to the rule engine
+	try:
+		payload = parse_vitals(await request.body())
+	except ValidationError as exc:
+		raise _invalid_body(exc)
+	try:
+		validate_vitals_payload(payload)
+	except ValueError as exc:
+		raise HTTPException(status_code=400, detail=str(exc))
+	return ORJSONResponse(await agent.analyze_async(payload, owned=True))
+
+
+@app.post(
+	"/v1/analyze/batch",
+	response_class=ORJSONResponse,
+	openapi_extra=_request_body({"type": "array", "items": VitalsEvent.model_json_schema()}),
+)
+async def analyze_batch(request: Request) -> ORJSONResponse:
+	"""Analyze a burst of vitals events; results are returned in request order."""
+	try:
+		payloads = parse_vitals_list(await request.body())
+	except ValidationError as exc:
+		raise _invalid_body(exc)
 	try:
-		validate_vitals_payload(event.model_dump())
+		for payload in payloads:
+			validate_vitals_payload(payload)
 	except ValueError as exc:
 		raise HTTPException(status_code=400, detail=str(exc))
-	return agent.analyze(event.model_dump())
+	return ORJSONResponse(await agent.analyze_many_async(payloads))
+
+
+@app.post("/v1/analyze/stream")
+async def analyze_stream(request: Request) -> DuplexStreamingResponse:
+	"""Analyze a chunked NDJSON body, streaming one NDJSON result per input line.
+
+	Input is read only as fast as results are consumed, so a slow client
+	applies backpressure to the sender.
+	"""
+	async def results():
+		async for lines in iter_line_batches(request.stream()):
+			yield encode_results(await run_in_threadpool(analyze_lines, agent, lines))
+
+	return DuplexStreamingResponse(results(), media_type="application/x-ndjson")
+
+
+@app.websocket("/v1/stream")
+async def stream(websocket: WebSocket) -> None:
+	"""Analyze vitals sent as WebSocket messages (one or more NDJSON lines each).
+
+	Results for a message are sent before the next message is read.
+	"""
+	await websocket.accept()
+	splitter = LineSplitter()
+	while True:
+		message = await websocket.receive()
+		if message["type"] == "websocket.disconnect":
+			return
+		data = message.get("bytes")
+		if data is None:
+			data = (message.get("text") or "").encode()
+		# Each message is self-contained, so terminate its last line
+		lines = splitter.feed(data) + splitter.close()
+		if not lines:
+			continue
+		for result in await run_in_threadpool(analyze_lines, agent, lines):
+			await websocket.send_text(encode_result(result))
+
+
+@app.get("/v1/events/{event_id}")
+def get_event(event_id: str) -> dict:
+	"""Get a stored event with its current tags (only on the worker that analyzed it)."""
+	event = event_store.get(event_id) if event_store is not None else None
+	if event is None:
+		raise HTTPException(status_code=404, detail=f"Event {event_id} not found")
+	return event
 
 
 # Rule Engine API endpoints
 @app.post("/v1/rules", status_code=status.HTTP_201_CREATED)
-def create_rule(rule: Rule) -> dict:
-	"""Create a new rule."""
+def create_rule(rule: Rule, background_tasks: BackgroundTasks) -> dict:
+	"""Create a new rule. Stored events it affects are re-tagged in the background."""
 	try:
 		rule_engine.add_rule(rule)
-		return {"status": "created", "rule_id": rule.id, "rule": rule.model_dump()}
-	except Exception as exc:
+	except ValueError as exc:
 		raise HTTPException(status_code=400, detail=str(exc))
+	if retagger is not None:
+		background_tasks.add_task(retagger.sync)
+	return {"status": "created", "rule_id": rule.id, "rule": rule.model_dump()}
 
 
 @app.get("/v1/rules", response_model=List[Rule])
@@ -63,7 +309,55 @@ def get_rule(rule_id: str) -> Rule:
 
 
 @app.delete("/v1/rules/{rule_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_rule(rule_id: str) -> None:
+def delete_rule(rule_id: str, background_tasks: BackgroundTasks) -> None:
 	"""Delete a rule by ID."""
 	if not rule_engine.delete_rule(rule_id):
 		raise HTTPException(status_code=404, detail=f"Rule {rule_id} not found")
+	if retagger is not None:
+		background_tasks.add_task(retagger.sync)
+
+
+@app.get("/v1/threshold-profiles")
+def list_threshold_profiles() -> List[dict]:
+	"""List threshold profiles in the order they apply."""
+	return agent.threshold_profiles.list_profiles()
+
+
+@app.put("/v1/threshold-profiles")
+def replace_threshold_profiles(profiles: List[dict]) -> dict:
+	"""Replace all threshold profiles; the old set stays active if any profile is invalid.
+
+	Published to every worker through THRESHOLD_PROFILES_PATH; without it
+	only this process changes, until restart.
+	"""
+	try:
+		agent.threshold_profiles.replace_all(profiles)
+	except ValueError as exc:
+		raise HTTPException(status_code=400, detail=str(exc))
+	return {"status": "replaced", "count": len(agent.threshold_profiles)}
+
+
+@app.get("/v1/patients/{patient_id}/history", response_class=ORJSONResponse)
+def patient_history(
+	patient_id: str,
+	start: float | None = None,
+	end: float | None = None,
+	columns: str | None = None,
+) -> ORJSONResponse:
+	"""A patient's analyzed readings with ``start <= timestamp < end`` (epoch seconds), oldest first.
+
+	``columns`` is a comma-separated subset of the stored columns; only
+	those are read from disk.
+	"""
+	if agent.history is None:
+		raise HTTPException(status_code=404, detail="History is disabled")
+	names = [c for c in columns.split(",") if c] if columns else list(COLUMNS)
+	try:
+		result = agent.history.query(patient_id, start, end, names)
+	except ValueError as exc:
+		raise HTTPException(status_code=400, detail=str(exc))
+	return ORJSONResponse({
+		"patient_id": patient_id,
+		"count": len(result["timestamp"]),
+		"columns": {name: values.tolist() if values.dtype == object else values for name, values in result.items()},
+	})
@@ -0,0 +1,43 @@
+from typing import Any, Dict, List
+
+from pydantic import BaseModel, Field, TypeAdapter
+from typing_extensions import Annotated, NotRequired, TypedDict
+
+
+class VitalsEvent(BaseModel):
+	heart_rate: float = Field(..., ge=0)
+	spo2: float = Field(..., ge=0, le=100)
+	temperature_c: float = Field(..., ge=25, le=45)
+	fall_detected: bool = False
+	meta: dict | None = None
+
+
+class VitalsPayload(TypedDict):
+	"""``VitalsEvent`` as a plain dict, for validating straight from JSON."""
+
+	heart_rate: Annotated[float, Field(ge=0)]
+	spo2: Annotated[float, Field(ge=0, le=100)]
+	temperature_c: Annotated[float, Field(ge=25, le=45)]
+	fall_detected: NotRequired[bool]
+	meta: NotRequired[dict | None]
+
+
+# Same constraints and output as ``VitalsEvent(...).model_dump()``, without a model instance
+_payload_adapter = TypeAdapter(VitalsPayload)
+_payloads_adapter = TypeAdapter(List[VitalsPayload])
+
+
+def _with_defaults(payload: Dict[str, Any]) -> Dict[str, Any]:
+	payload.setdefault("fall_detected", False)
+	payload.setdefault("meta", None)
+	return payload
+
+
+def parse_vitals(data: bytes | str) -> Dict[str, Any]:
+	"""Validate a JSON vitals event into a fresh dict; raises ``pydantic.ValidationError``."""
+	return _with_defaults(_payload_adapter.validate_json(data))
+
+
+def parse_vitals_list(data: bytes | str) -> List[Dict[str, Any]]:
+	"""Validate a JSON array of vitals events; raises ``pydantic.ValidationError``."""
+	return [_with_defaults(payload) for payload in _payloads_adapter.validate_json(data)]
@@ -0,0 +1,138 @@
+from typing import Any, AsyncIterator, Dict, Iterable, List, Tuple
+
+import orjson
+from pydantic import ValidationError
+from starlette.requests import ClientDisconnect
+from starlette.responses import StreamingResponse
+from starlette.types import Receive, Scope, Send
+
+from ...core.agent import HealthAgent
+from ...core.utils.validators import validate_vitals_payload
+from .schemas import parse_vitals
+
+# Longest accepted NDJSON line; longer lines are reported and skipped
+MAX_LINE_BYTES = 64 * 1024
+
+NumberedLine = Tuple[int, bytes]
+
+
+class LineSplitter:
+	"""Incrementally splits a byte stream into numbered, non-blank lines."""
+
+	def __init__(self, max_line_bytes: int = MAX_LINE_BYTES) -> None:
+		self.max_line_bytes = max_line_bytes
+		self._buffer = bytearray()
+		self._line_no = 0
+		self._oversized = False
+
+	def feed(self, chunk: bytes) -> List[NumberedLine]:
+		"""Return the complete lines in ``chunk`` (plus any carried-over prefix)."""
+		lines: List[NumberedLine] = []
+		start = 0
+		while True:
+			end = chunk.find(b"\n", start)
+			if end < 0:
+				break
+			self._append(chunk[start:end])
+			self._emit(lines)
+			start = end + 1
+		self._append(chunk[start:])
+		return lines
+
+	def close(self) -> List[NumberedLine]:
+		"""Return the trailing line if the stream did not end with a newline."""
+		lines: List[NumberedLine] = []
+		if self._buffer or self._oversized:
+			self._emit(lines)
+		return lines
+
+	def _append(self, data: bytes) -> None:
+		if self._oversized:
+			return
+		if len(self._buffer) + len(data) > self.max_line_bytes:
+			# Stop buffering; the line is reported as an error when it ends
+			self._oversized = True
+			self._buffer.clear()
+			return
+		self._buffer += data
+
+	def _emit(self, lines: List[NumberedLine]) -> None:
+		self._line_no += 1
+		if self._oversized:
+			lines.append((self._line_no, b""))
+			self._oversized = False
+		elif self._buffer.strip():
+			lines.append((self._line_no, bytes(self._buffer)))
+		self._buffer.clear()
+
+
+async def iter_line_batches(
+	chunks: AsyncIterator[bytes], max_line_bytes: int = MAX_LINE_BYTES
+) -> AsyncIterator[List[NumberedLine]]:
+	"""Group an async byte stream into batches of complete lines, one per chunk."""
+	splitter = LineSplitter(max_line_bytes)
+	async for chunk in chunks:
+		lines = splitter.feed(chunk)
+		if lines:
+			yield lines
+	tail = splitter.close()
+	if tail:
+		yield tail
+
+
+def analyze_lines(agent: HealthAgent, lines: Iterable[NumberedLine]) -> List[Dict[str, Any]]:
+	"""Validate and analyze a batch of lines, returning one result per line in order.
+
+	Invalid lines yield an ``error`` entry instead of failing the stream; the
+	valid ones are analyzed together through ``HealthAgent.analyze_many``.
+	"""
+	results: List[Dict[str, Any]] = []
+	pending: List[Tuple[int, Dict[str, Any]]] = []
+	for line_no, raw in lines:
+		if not raw:
+			results.append({"line": line_no, "error": "line too long"})
+			continue
+		try:
+			payload = parse_vitals(raw)
+			validate_vitals_payload(payload)
+		except ValidationError as exc:
+			results.append({"line": line_no, "error": exc.errors(include_url=False, include_context=False, include_input=False)})
+			continue
+		except ValueError as exc:
+			results.append({"line": line_no, "error": str(exc)})
+			continue
+		pending.append((len(results), payload))
+		results.append({"line": line_no})
+
+	if pending:
+		decisions = agent.analyze_many([payload for _, payload in pending])
+		for (slot, _), decision in zip(pending, decisions):
+			results[slot].update(decision)
+	return results
+
+
+def encode_result(result: Dict[str, Any]) -> str:
+	"""Serialize one result as compact JSON."""
+	return orjson.dumps(result, default=str).decode()
+
+
+def encode_results(results: Iterable[Dict[str, Any]]) -> bytes:
+	"""Serialize results as NDJSON."""
+	return b"".join(orjson.dumps(r, default=str, option=orjson.OPT_APPEND_NEWLINE) for r in results)
+
+
+class DuplexStreamingResponse(StreamingResponse):
+	"""Streaming response whose body iterator also consumes the request body.
+
+	``StreamingResponse`` may listen for disconnects on ``receive`` while
+	streaming, which would steal request body chunks from the iterator.
+	Here the iterator is the only reader; a disconnect surfaces through it.
+	"""
+
+	async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+		try:
+			await self.stream_response(send)
+		except (ClientDisconnect, OSError):
+			return
+		if self.background is not None:
+			await self.background()
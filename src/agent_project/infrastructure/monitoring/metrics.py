@@ -0,0 +1,131 @@
+import threading
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+# Latency buckets (seconds) for every histogram; +Inf is implicit
+DEFAULT_BUCKETS: Tuple[float, ...] = (
+	0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0,
+)
+
+# (rule id, evaluations, matches, nanoseconds)
+RuleSample = Tuple[str, int, int, int]
+_Labels = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+	"""Cumulative-bucket latency histogram in seconds."""
+
+	__slots__ = ("buckets", "counts", "sum", "count")
+
+	def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS) -> None:
+		self.buckets = tuple(buckets)
+		self.counts = [0] * (len(self.buckets) + 1)  # last slot is +Inf
+		self.sum = 0.0
+		self.count = 0
+
+	def observe(self, seconds: float) -> None:
+		self.counts[bisect_left(self.buckets, seconds)] += 1
+		self.sum += seconds
+		self.count += 1
+
+
+class MetricsRegistry:
+	"""In-process metrics for the analyze hot path, rendered as Prometheus text.
+
+	Holds per-rule counters (evaluations, matches, cumulative nanoseconds)
+	and labelled latency histograms. Components take an optional registry
+	and skip all timing when they have none, so disabling metrics costs
+	nothing beyond a ``None`` check.
+	"""
+
+	def __init__(self, namespace: str = "health_agent", buckets: Sequence[float] = DEFAULT_BUCKETS) -> None:
+		self.namespace = namespace
+		self.buckets = tuple(buckets)
+		self._lock = threading.Lock()
+		# Rule ID -> [evaluations, matches, nanoseconds]
+		self._rules: Dict[str, List[int]] = {}
+		# Metric name -> labels -> histogram
+		self._histograms: Dict[str, Dict[_Labels, Histogram]] = {}
+
+	def record_rules(self, samples: Iterable[RuleSample]) -> None:
+		"""Add rule evaluation samples, typically all those of one event or batch."""
+		with self._lock:
+			rules = self._rules
+			for rule_id, evaluations, matches, ns in samples:
+				stats = rules.get(rule_id)
+				if stats is None:
+					stats = rules[rule_id] = [0, 0, 0]
+				stats[0] += evaluations
+				stats[1] += matches
+				stats[2] += ns
+
+	def observe(self, name: str, seconds: float, **labels: str) -> None:
+		"""Record a latency in the histogram ``name`` with the given labels."""
+		key = tuple(sorted(labels.items()))
+		with self._lock:
+			series = self._histograms.setdefault(name, {})
+			histogram = series.get(key)
+			if histogram is None:
+				histogram = series[key] = Histogram(self.buckets)
+			histogram.observe(seconds)
+
+	def rule_stats(self) -> Dict[str, Dict[str, int]]:
+		"""Per-rule ``evaluations``, ``matches`` and ``nanoseconds`` so far."""
+		with self._lock:
+			return {
+				rule_id: {"evaluations": e, "matches": m, "nanoseconds": ns}
+				for rule_id, (e, m, ns) in self._rules.items()
+			}
+
+	def histogram(self, name: str, **labels: str) -> Histogram | None:
+		with self._lock:
+			return self._histograms.get(name, {}).get(tuple(sorted(labels.items())))
+
+	def reset(self) -> None:
+		with self._lock:
+			self._rules = {}
+			self._histograms = {}
+
+	def render(self) -> str:
+		"""Prometheus text exposition format (version 0.0.4)."""
+		prefix = self.namespace + "_"
+		with self._lock:
+			rules = [(rule_id, list(stats)) for rule_id, stats in self._rules.items()]
+			histograms = {
+				name: [(key, list(h.counts), h.sum, h.count) for key, h in series.items()]
+				for name, series in self._histograms.items()
+			}
+
+		lines: List[str] = []
+		if rules:
+			rules.sort()
+			for column, suffix, kind, doc in (
+				(0, "rule_evaluations_total", "counter", "Rule predicate evaluations."),
+				(1, "rule_matches_total", "counter", "Rule predicate matches."),
+				(2, "rule_evaluation_seconds_total", "counter", "Time spent evaluating rule predicates."),
+			):
+				lines.append(f"# HELP {prefix}{suffix} {doc}")
+				lines.append(f"# TYPE {prefix}{suffix} {kind}")
+				for rule_id, stats in rules:
+					value = stats[column] / 1e9 if column == 2 else stats[column]
+					lines.append(f'{prefix}{suffix}{{rule="{_escape(rule_id)}"}} {value}')
+
+		for name in sorted(histograms):
+			metric = prefix + name
+			lines.append(f"# TYPE {metric} histogram")
+			for key, counts, total, count in sorted(histograms[name], key=lambda h: h[0]):
+				labels = "".join(f'{k}="{_escape(v)}",' for k, v in key)
+				cumulative = 0
+				for bound, n in zip(self.buckets, counts):
+					cumulative += n
+					lines.append(f'{metric}_bucket{{{labels}le="{bound}"}} {cumulative}')
+				lines.append(f'{metric}_bucket{{{labels}le="+Inf"}} {count}')
+				labels = labels.rstrip(",")
+				selector = f"{{{labels}}}" if labels else ""
+				lines.append(f"{metric}_sum{selector} {total}")
+				lines.append(f"{metric}_count{selector} {count}")
+		return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+	return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
@@ -0,0 +1,137 @@
+import mmap
+import os
+import struct
+import zlib
+from typing import Dict, Iterable, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+MAGIC = b"VTS1"
+
+# Column encodings
+DELTA_INT64 = 0  # first value, then successive differences
+SHUFFLED_FLOAT64 = 1  # bytes regrouped by significance (all first bytes, ...)
+RAW_UINT8 = 2
+
+_DTYPES = {DELTA_INT64: np.int64, SHUFFLED_FLOAT64: np.float64, RAW_UINT8: np.uint8}
+
+# magic, column count, row count, first and last timestamp (ms)
+_HEADER = struct.Struct("<4sHIqq")
+# name, encoding, offset, compressed length, CRC32 of the compressed block
+_COLUMN = struct.Struct("<16sBQQI")
+
+
+class SegmentInfo(NamedTuple):
+	path: str
+	rows: int
+	min_ts: int  # epoch milliseconds
+	max_ts: int
+	# Column name -> (encoding, offset, length, crc)
+	columns: Dict[str, Tuple[int, int, int, int]]
+
+
+def _encode(encoding: int, values: np.ndarray) -> bytes:
+	if encoding == DELTA_INT64:
+		deltas = np.empty_like(values)
+		if len(values):
+			deltas[0] = values[0]
+			np.subtract(values[1:], values[:-1], out=deltas[1:])
+		raw = deltas.tobytes()
+	elif encoding == SHUFFLED_FLOAT64:
+		raw = values.view(np.uint8).reshape(-1, 8).T.tobytes()
+	else:
+		raw = values.tobytes()
+	return zlib.compress(raw, 6)
+
+
+def _decode(encoding: int, block: bytes, rows: int) -> np.ndarray:
+	raw = zlib.decompress(block)
+	if encoding == DELTA_INT64:
+		return np.cumsum(np.frombuffer(raw, dtype=np.int64))
+	if encoding == SHUFFLED_FLOAT64:
+		return np.frombuffer(raw, dtype=np.uint8).reshape(8, rows).T.copy().view(np.float64).ravel()
+	return np.frombuffer(raw, dtype=np.uint8).copy()
+
+
+def write_segment(path: str, timestamps: np.ndarray, columns: Iterable[Tuple[str, int, np.ndarray]]) -> SegmentInfo:
+	"""Write one segment file atomically; ``timestamps`` (epoch ms) must be sorted.
+
+	``columns`` are ``(name, encoding, values)`` with one value per timestamp.
+	"""
+	blocks = [("timestamp", DELTA_INT64, _encode(DELTA_INT64, timestamps.astype(np.int64)))]
+	for name, encoding, values in columns:
+		if len(name.encode()) > 16:
+			raise ValueError(f"Column name too long: {name}")
+		blocks.append((name, encoding, _encode(encoding, np.ascontiguousarray(values, dtype=_DTYPES[encoding]))))
+
+	rows = len(timestamps)
+	min_ts, max_ts = (int(timestamps[0]), int(timestamps[-1])) if rows else (0, 0)
+	offset = _HEADER.size + _COLUMN.size * len(blocks)
+	directory = []
+	info_columns: Dict[str, Tuple[int, int, int, int]] = {}
+	for name, encoding, block in blocks:
+		crc = zlib.crc32(block)
+		directory.append(_COLUMN.pack(name.encode(), encoding, offset, len(block), crc))
+		info_columns[name] = (encoding, offset, len(block), crc)
+		offset += len(block)
+
+	tmp = path + ".tmp"
+	with open(tmp, "wb") as f:
+		f.write(_HEADER.pack(MAGIC, len(blocks), rows, min_ts, max_ts))
+		f.writelines(directory)
+		f.writelines(block for _, _, block in blocks)
+		f.flush()
+		os.fsync(f.fileno())
+	os.replace(tmp, path)
+	return SegmentInfo(path, rows, min_ts, max_ts, info_columns)
+
+
+def read_info(path: str) -> SegmentInfo:
+	"""Read a segment's header and column directory only."""
+	with open(path, "rb") as f:
+		header = f.read(_HEADER.size)
+		if len(header) < _HEADER.size:
+			raise ValueError(f"Truncated segment {path}")
+		magic, count, rows, min_ts, max_ts = _HEADER.unpack(header)
+		if magic != MAGIC:
+			raise ValueError(f"Not a segment file: {path}")
+		directory = f.read(_COLUMN.size * count)
+	if len(directory) < _COLUMN.size * count:
+		raise ValueError(f"Truncated segment {path}")
+	columns = {}
+	for i in range(count):
+		name, encoding, offset, length, crc = _COLUMN.unpack_from(directory, i * _COLUMN.size)
+		columns[name.rstrip(b"\0").decode()] = (encoding, offset, length, crc)
+	return SegmentInfo(path, rows, min_ts, max_ts, columns)
+
+
+def read_columns(
+	info: SegmentInfo, names: Iterable[str], start: Optional[int] = None, end: Optional[int] = None
+) -> Dict[str, np.ndarray]:
+	"""Decode the named columns (plus ``timestamp``) for rows with ``start <= ts < end``.
+
+	The file is memory-mapped and only the blocks of the requested columns
+	are read. Columns the segment lacks come back as NaN. Raises ValueError
+	if a block fails its CRC.
+	"""
+	with open(info.path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+
+		def column(name: str) -> np.ndarray:
+			encoding, offset, length, crc = info.columns[name]
+			block = mm[offset:offset + length]
+			if zlib.crc32(block) != crc:
+				raise ValueError(f"Corrupt column {name} in segment {info.path}")
+			return _decode(encoding, block, info.rows)
+
+		timestamps = column("timestamp")
+		lo = 0 if start is None or start <= info.min_ts else int(np.searchsorted(timestamps, start, "left"))
+		hi = info.rows if end is None or end > info.max_ts else int(np.searchsorted(timestamps, end, "left"))
+		result = {"timestamp": timestamps[lo:hi]}
+		for name in names:
+			if name == "timestamp":
+				continue
+			if name in info.columns:
+				result[name] = column(name)[lo:hi]
+			else:
+				result[name] = np.full(hi - lo, np.nan)
+	return result
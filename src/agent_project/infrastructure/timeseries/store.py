@@ -0,0 +1,327 @@
+import datetime
+import os
+import threading
+import time
+from array import array
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+from urllib.parse import quote, unquote
+
+import numpy as np
+
+from ...core.utils.subjects import event_timestamp, subject_id
+from ..monitoring.logger import logger
+from .segment import RAW_UINT8, SHUFFLED_FLOAT64, SegmentInfo, read_columns, read_info, write_segment
+
+VITAL_COLUMNS = ("heart_rate", "spo2", "temperature_c")
+FLAG_COLUMNS = ("fall_detected", "should_alert")
+SEVERITIES = ("info", "high", "critical")
+COLUMNS = ("timestamp",) + VITAL_COLUMNS + FLAG_COLUMNS + ("severity",)
+
+_SEGMENT_SUFFIX = ".seg"
+_DAY_MS = 86400 * 1000
+# A directory modified this recently may change again without its mtime moving
+_MTIME_SETTLE_NS = 1_000_000_000
+
+
+def _number(value: Any) -> float:
+	if type(value) in (int, float):
+		try:
+			return float(value)
+		except OverflowError:
+			pass
+	return float("nan")
+
+
+class _Buffer:
+	"""Rows appended for one patient since the last flush, column by column."""
+
+	__slots__ = ("timestamps", "vitals", "flags", "severity")
+
+	def __init__(self) -> None:
+		self.timestamps = array("q")
+		self.vitals = [array("d") for _ in VITAL_COLUMNS]
+		self.flags = [array("B") for _ in FLAG_COLUMNS]
+		self.severity = array("B")
+
+	def __len__(self) -> int:
+		return len(self.timestamps)
+
+	def columns(self) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+		"""Timestamps and named columns, sorted by time (stable for equal times)."""
+		timestamps = np.frombuffer(self.timestamps, dtype=np.int64) if len(self) else np.empty(0, np.int64)
+		order = np.argsort(timestamps, kind="stable")
+		columns: Dict[str, np.ndarray] = {}
+		for name, values in zip(VITAL_COLUMNS, self.vitals):
+			columns[name] = np.array(values, dtype=np.float64)[order]
+		for name, values in zip(FLAG_COLUMNS, self.flags):
+			columns[name] = np.array(values, dtype=np.uint8)[order]
+		columns["severity"] = np.array(self.severity, dtype=np.uint8)[order]
+		return timestamps[order], columns
+
+
+class TimeSeriesStore:
+	"""Embedded per-patient store of analyzed vitals and their assessments.
+
+	Rows are appended to an in-memory buffer per patient and flushed to
+	immutable segment files once a patient has ``segment_rows`` buffered
+	rows, once ``max_buffered_rows`` are buffered in total, or on
+	``flush()``/``close()``. Files are partitioned by patient and UTC day::
+
+		<path>/patient=<id>/date=2024-05-01/<first ms>-<seq>.seg
+
+	Each segment is columnar: delta-encoded millisecond timestamps, then
+	one compressed block per column (see ``segment.py``). A patient's
+	segment headers are kept in a catalog, re-listed when a partition
+	directory's mtime changes, so segments other processes write show up;
+	queries skip segments outside the time range, then memory-map the rest
+	and decode only the requested columns. A flush swaps the buffer out
+	under the lock and encodes and writes it outside, so one patient's
+	flush doesn't stall appends for the others; until the segment is
+	written, queries read those rows from memory. A flush that fails to
+	write is logged and kept in memory, then retried by the next flush.
+	Buffered rows are lost if the process dies before a flush.
+	"""
+
+	def __init__(
+		self,
+		path: str,
+		segment_rows: int = 4096,
+		max_buffered_rows: int = 100000,
+		clock: Callable[[], float] = time.time,
+	) -> None:
+		if segment_rows < 1 or max_buffered_rows < 1:
+			raise ValueError("segment_rows and max_buffered_rows must be positive")
+		self.path = path
+		self.segment_rows = segment_rows
+		self.max_buffered_rows = max_buffered_rows
+		self.clock = clock
+		self._lock = threading.Lock()
+		self._buffers: Dict[str, _Buffer] = {}
+		self._buffered = 0
+		self._seq = 0
+		# Flush seq -> (patient, rows being written); segment names end with -<pid>-<seq>
+		self._flushing: Dict[int, Tuple[str, _Buffer]] = {}
+		# Flush seqs whose write failed, still in _flushing
+		self._failed: List[int] = []
+		self._catalog_lock = threading.Lock()
+		# Patient -> (patient dir mtime, scan time, day dir -> (mtime, scan time, segments))
+		self._catalog: Dict[str, Tuple[int, int, Dict[str, Tuple[int, int, List[SegmentInfo]]]]] = {}
+		os.makedirs(path, exist_ok=True)
+
+	def append(self, event: Dict[str, Any], assessment: Optional[Dict[str, Any]] = None) -> bool:
+		"""Buffer one analyzed reading; False if it has no patient (or device) id."""
+		patient = subject_id(event)
+		if patient is None:
+			return False
+		timestamp = event_timestamp(event)
+		if timestamp is None:
+			timestamp = self.clock()
+		assessment = assessment or {}
+		severity = assessment.get("severity", "info")
+		with self._lock:
+			buffer = self._buffers.get(patient)
+			if buffer is None:
+				buffer = self._buffers[patient] = _Buffer()
+			buffer.timestamps.append(int(round(timestamp * 1000)))
+			for column, name in zip(buffer.vitals, VITAL_COLUMNS):
+				column.append(_number(event.get(name)))
+			buffer.flags[0].append(bool(event.get("fall_detected")))
+			buffer.flags[1].append(bool(assessment.get("should_alert")))
+			buffer.severity.append(SEVERITIES.index(severity) if severity in SEVERITIES else 0)
+			self._buffered += 1
+			if len(buffer) >= self.segment_rows:
+				detached = [self._detach(patient)] + self._take_failed()
+			elif self._buffered >= self.max_buffered_rows:
+				detached = self._detach_all()
+			else:
+				return True
+		self._write(detached)
+		return True
+
+	def flush(self) -> None:
+		"""Write every buffered row to segment files."""
+		with self._lock:
+			detached = self._detach_all()
+		self._write(detached)
+
+	def close(self) -> None:
+		self.flush()
+
+	def patients(self) -> List[str]:
+		"""Patients with stored or buffered rows."""
+		with self._lock:
+			found = set(self._buffers) | {patient for patient, _ in self._flushing.values()}
+		for name in os.listdir(self.path):
+			if name.startswith("patient="):
+				found.add(unquote(name[len("patient="):]))
+		return sorted(found)
+
+	def query(
+		self,
+		patient_id: str,
+		start: Optional[float] = None,
+		end: Optional[float] = None,
+		columns: Optional[Sequence[str]] = None,
+	) -> Dict[str, np.ndarray]:
+		"""A patient's rows with ``start <= timestamp < end`` (epoch seconds), oldest first.
+
+		Returns one array per requested column (all by default) plus
+		``timestamp`` in epoch seconds; ``severity`` comes back as strings.
+		Missing vitals are NaN. Raises ValueError for unknown columns.
+		"""
+		names = [c for c in (columns or COLUMNS) if c != "timestamp"]
+		unknown = set(names) - set(COLUMNS)
+		if unknown:
+			raise ValueError(f"Unknown columns: {sorted(unknown)}")
+		start_ms = None if start is None else int(np.ceil(start * 1000))
+		end_ms = None if end is None else int(np.ceil(end * 1000))
+
+		with self._lock:
+			buffers = [b for p, b in self._flushing.values() if p == patient_id]
+			buffer = self._buffers.get(patient_id)
+			if buffer is not None and len(buffer):
+				buffers.append(buffer)
+			# Segments still being written are served from their buffers
+			in_flight = tuple(f"-{os.getpid()}-{seq}{_SEGMENT_SUFFIX}" for seq in self._flushing)
+		with self._catalog_lock:
+			segments = [
+				s for s in self._segments(patient_id, start_ms, end_ms)
+				if _overlaps(s.min_ts, s.max_ts, start_ms, end_ms) and not s.path.endswith(in_flight)
+			]
+
+		parts = [read_columns(segment, names, start_ms, end_ms) for segment in segments]
+		for buffer in buffers:
+			timestamps, values = buffer.columns()
+			keep = np.ones(len(timestamps), dtype=bool)
+			if start_ms is not None:
+				keep &= timestamps >= start_ms
+			if end_ms is not None:
+				keep &= timestamps < end_ms
+			parts.append({"timestamp": timestamps[keep], **{name: values[name][keep] for name in names}})
+
+		timestamps = np.concatenate([p["timestamp"] for p in parts]) if parts else np.empty(0, np.int64)
+		# Segments may overlap when readings arrive out of order
+		order = np.argsort(timestamps, kind="stable")
+		result = {"timestamp": timestamps[order] / 1000.0}
+		for name in names:
+			if parts:
+				values = np.concatenate([p[name] for p in parts])[order]
+			else:
+				values = np.empty(0, np.uint8 if name in FLAG_COLUMNS or name == "severity" else np.float64)
+			if name == "severity":
+				values = np.array(SEVERITIES, dtype=object)[values.astype(np.intp)]
+			elif name in FLAG_COLUMNS:
+				values = values.astype(bool)
+			result[name] = values
+		return result
+
+	# -- internals ----------------------------------------------------------
+
+	def _patient_dir(self, patient: str) -> str:
+		return os.path.join(self.path, "patient=" + quote(patient, safe=""))
+
+	def _segments(self, patient: str, start_ms: Optional[int], end_ms: Optional[int]) -> List[SegmentInfo]:
+		"""Segments of a patient in days overlapping the range, re-listing changed
+		partitions. Caller holds the catalog lock."""
+		directory = self._patient_dir(patient)
+		try:
+			mtime = os.stat(directory).st_mtime_ns
+		except FileNotFoundError:
+			return []
+		cached_mtime, scanned, days = self._catalog.get(patient, (None, 0, {}))
+		if not _settled(cached_mtime, mtime, scanned):
+			scanned = time.time_ns()
+			names = sorted(name for name in os.listdir(directory) if name.startswith("date="))
+			days = {name: days.get(name, (None, 0, [])) for name in names}
+		self._catalog[patient] = (mtime, scanned, days)
+
+		segments: List[SegmentInfo] = []
+		for name, (day_mtime, day_scanned, infos) in days.items():
+			day_ms = _day_ms(name)
+			if day_ms is not None and not _overlaps(day_ms, day_ms + _DAY_MS - 1, start_ms, end_ms):
+				continue
+			day_dir = os.path.join(directory, name)
+			try:
+				current = os.stat(day_dir).st_mtime_ns
+			except FileNotFoundError:
+				continue
+			if not _settled(day_mtime, current, day_scanned):
+				day_scanned = time.time_ns()
+				known = {info.path: info for info in infos}
+				infos = []
+				for file_name in sorted(os.listdir(day_dir)):
+					if file_name.endswith(_SEGMENT_SUFFIX):
+						path = os.path.join(day_dir, file_name)
+						infos.append(known.get(path) or read_info(path))
+				days[name] = (current, day_scanned, infos)
+			segments.extend(infos)
+		return segments
+
+	def _detach(self, patient: str) -> Optional[int]:
+		"""Take a patient's buffer for writing; returns its flush seq. Caller holds the lock."""
+		buffer = self._buffers.pop(patient, None)
+		if buffer is None or not len(buffer):
+			return None
+		self._buffered -= len(buffer)
+		self._seq += 1
+		self._flushing[self._seq] = (patient, buffer)
+		return self._seq
+
+	def _detach_all(self) -> List[Optional[int]]:
+		return [self._detach(patient) for patient in list(self._buffers)] + self._take_failed()
+
+	def _take_failed(self) -> List[Optional[int]]:
+		"""Claim failed flushes for another attempt. Caller holds the lock."""
+		failed, self._failed = self._failed, []
+		return failed
+
+	def _write(self, flushes: List[Optional[int]]) -> None:
+		"""Write detached buffers as one segment per UTC day, outside the lock.
+
+		Segment paths only depend on the rows and flush seq, and segments are
+		replaced atomically, so a retry rewrites whatever a failed attempt
+		already wrote.
+		"""
+		for seq in flushes:
+			if seq is None:
+				continue
+			patient, buffer = self._flushing[seq]
+			try:
+				timestamps, columns = buffer.columns()
+				days = timestamps // _DAY_MS
+				bounds = np.flatnonzero(np.diff(days)) + 1
+				for lo, hi in zip(np.concatenate(([0], bounds)), np.concatenate((bounds, [len(timestamps)]))):
+					date = datetime.datetime.fromtimestamp(int(days[lo]) * 86400, datetime.timezone.utc).date()
+					directory = os.path.join(self._patient_dir(patient), f"date={date.isoformat()}")
+					os.makedirs(directory, exist_ok=True)
+					path = os.path.join(directory, f"{int(timestamps[lo])}-{os.getpid()}-{seq}{_SEGMENT_SUFFIX}")
+					write_segment(path, timestamps[lo:hi], [
+						(name, RAW_UINT8 if name in FLAG_COLUMNS or name == "severity" else SHUFFLED_FLOAT64, values[lo:hi])
+						for name, values in columns.items()
+					])
+			except OSError:
+				# Keep the rows (still served from memory) for the next flush
+				logger.exception("Writing history for patient %s failed; retrying on the next flush", patient)
+				with self._lock:
+					self._failed.append(seq)
+				continue
+			with self._lock:
+				del self._flushing[seq]
+
+
+def _overlaps(min_ts: int, max_ts: int, start: Optional[int], end: Optional[int]) -> bool:
+	return (start is None or max_ts >= start) and (end is None or min_ts < end)
+
+
+def _settled(cached: Optional[int], mtime: int, scanned: int) -> bool:
+	"""Whether a listing made at ``scanned`` of a directory then at ``cached`` is still current."""
+	return cached == mtime and mtime < scanned - _MTIME_SETTLE_NS
+
+
+def _day_ms(name: str) -> Optional[int]:
+	"""Start (epoch ms) of a ``date=YYYY-MM-DD`` partition, or None if the name doesn't parse."""
+	try:
+		date = datetime.date.fromisoformat(name[len("date="):])
+	except ValueError:
+		return None
+	return (date - datetime.date(1970, 1, 1)).days * _DAY_MS
@@ -0,0 +1,118 @@
+from array import array
+from typing import List, Optional
+
+import numpy as np
+
+
+class IVFIndex:
+	"""Inverted-file approximate index over the slots of a vector store.
+
+	Vectors are clustered around ``nlist`` k-means centroids; a query only
+	scans the slots in its ``nprobe`` nearest clusters. Slots are reassigned
+	in place when the store overwrites them; stale list entries are skipped
+	at query time and dropped by periodic compaction.
+	"""
+
+	def __init__(self, nlist: int = 256, nprobe: int = 8, train_iterations: int = 10, seed: int = 0) -> None:
+		if nlist < 1 or nprobe < 1:
+			raise ValueError("nlist and nprobe must be positive")
+		self.nlist = nlist
+		self.nprobe = nprobe
+		self.train_iterations = train_iterations
+		self.seed = seed
+		self.centroids: Optional[np.ndarray] = None
+		self._lists: List[array] = []
+		# Cluster currently holding each slot, -1 when unassigned
+		self._slot_list = np.empty(0, dtype=np.int32)
+		self._stale = 0
+
+	@property
+	def is_trained(self) -> bool:
+		return self.centroids is not None
+
+	def train(self, vectors: np.ndarray) -> None:
+		"""Fit centroids with Lloyd's k-means on (a sample of) ``vectors``."""
+		rng = np.random.default_rng(self.seed)
+		n = len(vectors)
+		if n == 0:
+			raise ValueError("Cannot train an index without vectors")
+		nlist = min(self.nlist, n)
+		# A few dozen points per centroid is plenty for the fit
+		sample_size = min(n, nlist * 64)
+		sample = vectors[rng.choice(n, size=sample_size, replace=False)].astype(np.float32)
+		centroids = sample[rng.choice(sample_size, size=nlist, replace=False)].copy()
+		for _ in range(self.train_iterations):
+			assign = self._nearest(sample, centroids, 1)[:, 0]
+			sums = np.zeros_like(centroids)
+			np.add.at(sums, assign, sample)
+			counts = np.bincount(assign, minlength=nlist)
+			filled = counts > 0
+			centroids[filled] = sums[filled] / counts[filled, None]
+		self.centroids = centroids
+		self._lists = [array("q") for _ in range(nlist)]
+		self._slot_list = np.full(len(self._slot_list), -1, dtype=np.int32)
+		self._stale = 0
+
+	def add(self, slots: np.ndarray, vectors: np.ndarray) -> None:
+		"""Assign (or reassign) ``slots`` to the clusters nearest their vectors."""
+		if not self.is_trained or len(slots) == 0:
+			return
+		top = int(slots.max()) + 1
+		if top > len(self._slot_list):
+			grown = np.full(max(top, 2 * len(self._slot_list)), -1, dtype=np.int32)
+			grown[:len(self._slot_list)] = self._slot_list
+			self._slot_list = grown
+		assign = self._nearest(vectors, self.centroids, 1)[:, 0]
+		self._stale += int(np.count_nonzero(self._slot_list[slots] >= 0))
+		self._slot_list[slots] = assign
+		for slot, cluster in zip(slots.tolist(), assign.tolist()):
+			self._lists[cluster].append(slot)
+		if self._stale > len(self._slot_list):
+			self.compact()
+
+	def remove(self, slots: np.ndarray) -> None:
+		"""Forget ``slots`` (e.g. evicted without a replacement vector)."""
+		slots = slots[slots < len(self._slot_list)]
+		self._stale += int(np.count_nonzero(self._slot_list[slots] >= 0))
+		self._slot_list[slots] = -1
+
+	def reset(self) -> None:
+		"""Forget the centroids and every assignment; the next use retrains."""
+		self.centroids = None
+		self._lists = []
+		self._slot_list = np.empty(0, dtype=np.int32)
+		self._stale = 0
+
+	def compact(self) -> None:
+		"""Rebuild the inverted lists without stale entries."""
+		self._lists = [array("q") for _ in range(len(self._lists))]
+		live = np.flatnonzero(self._slot_list >= 0)
+		for slot, cluster in zip(live.tolist(), self._slot_list[live].tolist()):
+			self._lists[cluster].append(slot)
+		self._stale = 0
+
+	def candidates(self, queries: np.ndarray) -> List[np.ndarray]:
+		"""Return, per query, the live slots in its ``nprobe`` nearest clusters."""
+		probes = self._nearest(queries, self.centroids, min(self.nprobe, len(self.centroids)))
+		result = []
+		for clusters in probes:
+			parts = [np.frombuffer(self._lists[c], dtype=np.int64) for c in clusters if len(self._lists[c])]
+			if not parts:
+				result.append(np.empty(0, dtype=np.int64))
+				continue
+			slots = np.concatenate(parts)
+			# Keep slots still assigned to a probed cluster, once each
+			result.append(np.unique(slots[np.isin(self._slot_list[slots], clusters)]))
+		return result
+
+	@staticmethod
+	def _nearest(points: np.ndarray, centroids: np.ndarray, k: int) -> np.ndarray:
+		"""Indices of the ``k`` nearest centroids (squared L2) for each point."""
+		distances = (
+			np.einsum("ij,ij->i", centroids, centroids)[None, :]
+			- 2.0 * points @ centroids.T
+		)
+		if k >= centroids.shape[0]:
+			return np.argsort(distances, axis=1)
+		part = np.argpartition(distances, k - 1, axis=1)[:, :k]
+		return np.take_along_axis(part, np.argsort(np.take_along_axis(distances, part, axis=1), axis=1), axis=1)
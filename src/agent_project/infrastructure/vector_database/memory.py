@@ -1,15 +1,211 @@
-from collections import deque
-from typing import Deque, Dict, Any, Iterable
+from itertools import chain
+from typing import Dict, Any, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .ivf import IVFIndex
+
+METRICS = ("cosine", "l2")
+
+SearchHit = Tuple[float, Dict[str, Any]]
 
 
 class SimpleLongTermMemory:
-	"""A tiny append-only memory buffer acting as a vector DB placeholder."""
+	"""Bounded memory of items with optional embeddings and top-k similarity search.
+
+	Items live in a ring of ``max_items`` slots; once full, each new item
+	evicts the oldest. Embeddings are kept in one contiguous float32 matrix
+	(grown by doubling up to ``max_items`` rows) so searches are plain matrix
+	products. Pass an ``IVFIndex`` to trade exactness for speed on large
+	stores; it is trained on the stored vectors the first time it's needed.
+	"""
+
+	def __init__(
+		self,
+		max_items: int = 1000,
+		dim: Optional[int] = None,
+		metric: str = "cosine",
+		index: Optional[IVFIndex] = None,
+	) -> None:
+		if max_items < 1:
+			raise ValueError("max_items must be positive")
+		if metric not in METRICS:
+			raise ValueError(f"Unknown metric: {metric}")
+		self.max_items = max_items
+		self.dim = dim
+		self.metric = metric
+		self.index = index
+		self._items: List[Optional[Dict[str, Any]]] = []
+		self._vectors = np.empty((0, dim or 0), dtype=np.float32)
+		# Squared L2 norms of stored vectors; NaN marks slots without one
+		self._sq_norms = np.empty(0, dtype=np.float32)
+		self._head = 0  # oldest slot once the ring is full
+
+	def __len__(self) -> int:
+		return len(self._items)
 
-	def __init__(self, max_items: int = 1000) -> None:
-		self._items: Deque[Dict[str, Any]] = deque(maxlen=max_items)
+	def add(self, item: Dict[str, Any], embedding: Optional[Sequence[float]] = None) -> None:
+		if embedding is None:
+			self._write([item], None)
+		else:
+			self._write([item], np.asarray(embedding, dtype=np.float32).reshape(1, -1))
 
-	def add(self, item: Dict[str, Any]) -> None:
-		self._items.append(item)
+	def add_many(self, items: Sequence[Dict[str, Any]], embeddings: Optional[np.ndarray] = None) -> None:
+		"""Bulk-insert items (with one embedding row per item, if given)."""
+		if embeddings is not None:
+			embeddings = np.asarray(embeddings, dtype=np.float32)
+			if embeddings.ndim != 2 or len(embeddings) != len(items):
+				raise ValueError("embeddings must have one row per item")
+		# Only the newest max_items survive a bulk insert anyway
+		if len(items) > self.max_items:
+			items = items[-self.max_items:]
+			if embeddings is not None:
+				embeddings = embeddings[-self.max_items:]
+		self._write(items, embeddings)
 
 	def all(self) -> Iterable[Dict[str, Any]]:
-		return list(self._items)
+		"""Iterate over stored items, oldest first, without copying the buffer."""
+		return (self._items[slot] for slot in self._ordered_slots())
+
+	def search(self, query: Sequence[float], k: int = 5) -> List[SearchHit]:
+		"""Return up to ``k`` ``(score, item)`` pairs, best first.
+
+		Scores are cosine similarity (higher is better) or L2 distance
+		(lower is better), depending on ``metric``.
+		"""
+		return self.search_batch(np.asarray(query, dtype=np.float32).reshape(1, -1), k)[0]
+
+	def search_batch(self, queries: np.ndarray, k: int = 5) -> List[List[SearchHit]]:
+		"""Run ``search`` for each row of ``queries`` in one pass."""
+		queries = np.asarray(queries, dtype=np.float32)
+		if queries.ndim != 2:
+			raise ValueError("queries must be a 2-D array")
+		if self.dim is None or not len(self._items):
+			return [[] for _ in range(len(queries))]
+		if queries.shape[1] != self.dim:
+			raise ValueError(f"Expected {self.dim}-dimensional queries")
+
+		count = len(self._items)
+		vectors = self._vectors[:count]
+		sq_norms = self._sq_norms[:count]
+
+		if self.index is not None and self._ensure_index():
+			results = []
+			for query, slots in zip(queries, self.index.candidates(self._index_space(queries))):
+				scores = self._scores(query[None, :], vectors[slots], sq_norms[slots])[0]
+				results.append(self._top_k(scores, slots, k))
+			return results
+
+		scores = self._scores(queries, vectors, sq_norms)
+		every_slot = np.arange(count)
+		return [self._top_k(row, every_slot, k) for row in scores]
+
+	def clear(self) -> None:
+		"""Drop every item (and the index's trained state)."""
+		self._items = []
+		self._head = 0
+		self._sq_norms[:] = np.nan
+		if self.index is not None:
+			self.index.reset()
+
+	def build_index(self) -> None:
+		"""(Re)train the approximate index on the currently stored vectors."""
+		if self.index is None:
+			raise ValueError("No index configured")
+		slots = self._vector_slots()
+		self.index.train(self._index_space(self._vectors[slots]))
+		self.index.add(slots, self._index_space(self._vectors[slots]))
+
+	# -- internals ----------------------------------------------------------
+
+	def _ordered_slots(self) -> Iterator[int]:
+		count = len(self._items)
+		if count < self.max_items:
+			return iter(range(count))
+		return chain(range(self._head, count), range(self._head))
+
+	def _next_slots(self, n: int) -> np.ndarray:
+		"""Claim ``n`` slots: append while there is room, then overwrite the oldest."""
+		count = len(self._items)
+		fresh = min(n, self.max_items - count)
+		self._items.extend([None] * fresh)
+		reused = (self._head + np.arange(n - fresh)) % self.max_items
+		self._head = (self._head + n - fresh) % self.max_items
+		self._reserve(len(self._items))
+		return np.concatenate([np.arange(count, count + fresh), reused]).astype(np.int64)
+
+	def _reserve(self, rows: int) -> None:
+		if rows <= len(self._sq_norms) or self.dim is None:
+			return
+		old = len(self._sq_norms)
+		capacity = min(self.max_items, max(rows, 2 * old, 16))
+		vectors = np.zeros((capacity, self.dim), dtype=np.float32)
+		sq_norms = np.full(capacity, np.nan, dtype=np.float32)
+		if old:
+			vectors[:old] = self._vectors[:old]
+			sq_norms[:old] = self._sq_norms
+		self._vectors, self._sq_norms = vectors, sq_norms
+
+	def _write(self, items: Sequence[Dict[str, Any]], embeddings: Optional[np.ndarray]) -> None:
+		if embeddings is not None and self.dim is None:
+			self.dim = embeddings.shape[1]
+		if embeddings is not None and embeddings.shape[1] != self.dim:
+			raise ValueError(f"Expected {self.dim}-dimensional embeddings")
+		slots = self._next_slots(len(items))
+		for slot, item in zip(slots.tolist(), items):
+			self._items[slot] = item
+		if self.dim is None:
+			return
+		if embeddings is None:
+			self._sq_norms[slots] = np.nan
+			if self.index is not None:
+				self.index.remove(slots)
+			return
+		self._vectors[slots] = embeddings
+		self._sq_norms[slots] = np.einsum("ij,ij->i", embeddings, embeddings)
+		if self.index is not None and self.index.is_trained:
+			self.index.add(slots, self._index_space(embeddings))
+
+	def _vector_slots(self) -> np.ndarray:
+		return np.flatnonzero(~np.isnan(self._sq_norms[:len(self._items)]))
+
+	def _ensure_index(self) -> bool:
+		"""Train the index on first use; fall back to exact search until there's enough data."""
+		if self.index.is_trained:
+			return True
+		if len(self._vector_slots()) < self.index.nlist:
+			return False
+		self.build_index()
+		return True
+
+	def _index_space(self, vectors: np.ndarray) -> np.ndarray:
+		# Cosine search clusters directions, so normalize before assigning
+		if self.metric != "cosine":
+			return vectors
+		norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+		return vectors / np.where(norms == 0, 1, norms)
+
+	def _scores(self, queries: np.ndarray, vectors: np.ndarray, sq_norms: np.ndarray) -> np.ndarray:
+		dots = queries @ vectors.T
+		if self.metric == "cosine":
+			query_norms = np.linalg.norm(queries, axis=1, keepdims=True)
+			denom = query_norms * np.sqrt(sq_norms)[None, :]
+			with np.errstate(invalid="ignore", divide="ignore"):
+				scores = dots / denom
+			# Zero vectors have no direction; they never match
+			return np.where(denom > 0, scores, np.nan)
+		query_sq = np.einsum("ij,ij->i", queries, queries)[:, None]
+		return np.sqrt(np.maximum(query_sq - 2.0 * dots + sq_norms[None, :], 0.0))
+
+	def _top_k(self, scores: np.ndarray, slots: np.ndarray, k: int) -> List[SearchHit]:
+		"""Pick the best ``k`` scores, ignoring NaN (slots without embeddings)."""
+		valid = np.flatnonzero(~np.isnan(scores))
+		if not len(valid) or k <= 0:
+			return []
+		keyed = -scores[valid] if self.metric == "cosine" else scores[valid]
+		if len(valid) > k:
+			part = np.argpartition(keyed, k - 1)[:k]
+		else:
+			part = np.arange(len(valid))
+		best = part[np.argsort(keyed[part], kind="stable")]
+		return [(float(scores[valid[i]]), self._items[int(slots[valid[i]])]) for i in best]
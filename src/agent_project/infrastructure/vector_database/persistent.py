@@ -0,0 +1,345 @@
+import fcntl
+import json
+import os
+import struct
+import zlib
+from typing import BinaryIO, Dict, Any, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .ivf import IVFIndex
+from .memory import SearchHit, SimpleLongTermMemory
+
+VECTORS_FILE = "vectors.npy"
+NORMS_FILE = "norms.npy"
+LOG_FILE = "meta.log"
+LOCK_FILE = "writer.lock"
+
+# Every log record is framed as (payload length, CRC32 of payload)
+_RECORD_HEADER = struct.Struct("<II")
+
+
+def _row_crc(row: np.ndarray) -> int:
+	return zlib.crc32(row.tobytes())
+
+
+def _encode_record(record: Dict[str, Any]) -> bytes:
+	payload = json.dumps(record, separators=(",", ":"), default=str).encode()
+	return _RECORD_HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+
+
+def _decode_records(data: bytes) -> Iterator[Tuple[int, Dict[str, Any]]]:
+	"""Yield ``(end offset, record)`` for each intact record, stopping at a torn tail."""
+	pos = 0
+	while pos + _RECORD_HEADER.size <= len(data):
+		length, crc = _RECORD_HEADER.unpack_from(data, pos)
+		start = pos + _RECORD_HEADER.size
+		end = start + length
+		if end > len(data) or zlib.crc32(data[start:end]) != crc:
+			return
+		yield end, json.loads(data[start:end])
+		pos = end
+
+
+def _fsync_dir(path: str) -> None:
+	fd = os.open(path, os.O_RDONLY)
+	try:
+		os.fsync(fd)
+	finally:
+		os.close(fd)
+
+
+def _create_matrix(path: str, shape: Tuple[int, ...], fill: float) -> None:
+	tmp = path + ".tmp"
+	matrix = np.lib.format.open_memmap(tmp, mode="w+", dtype=np.float32, shape=shape)
+	matrix[:] = fill
+	matrix.flush()
+	del matrix
+	os.replace(tmp, path)
+
+
+class PersistentLongTermMemory(SimpleLongTermMemory):
+	"""SimpleLongTermMemory stored in a directory and shareable between processes.
+
+	- ``vectors.npy``: ``max_items x dim`` float32 matrix, one row per ring slot, memory-mapped
+	- ``norms.npy``: squared norm of each row
+	- ``meta.log``: append-only log of length/CRC32-framed JSON records
+
+	A write first logs a ``reserve`` record for the slots it is about to
+	overwrite, then writes and flushes the vector rows, then logs one ``put``
+	record per item (with the CRC of its row) and fsyncs; the ``put`` records
+	are the commit point. Opening replays the log: a torn tail is dropped, and
+	reserved-but-uncommitted slots keep their old item only if the row still
+	matches its CRC. ``compact()`` rewrites the log with just the live records.
+
+	Only one process may open a store for writing. Any number may open it with
+	``readonly=True``; they map the same pages instead of loading copies and
+	pick up new writes on ``refresh()`` (done automatically before searches).
+	"""
+
+	def __init__(
+		self,
+		path: str,
+		max_items: Optional[int] = None,
+		dim: Optional[int] = None,
+		metric: str = "cosine",
+		index: Optional[IVFIndex] = None,
+		readonly: bool = False,
+		auto_compact: bool = True,
+	) -> None:
+		self.path = path
+		self.readonly = readonly
+		self.auto_compact = auto_compact
+		self._lock_fd: Optional[int] = None
+		self._log: Optional[BinaryIO] = None
+		vectors_path = os.path.join(path, VECTORS_FILE)
+		norms_path = os.path.join(path, NORMS_FILE)
+
+		if not os.path.exists(vectors_path):
+			if readonly:
+				raise FileNotFoundError(f"No memory store at {path}")
+			if dim is None:
+				raise ValueError("dim is required to create a new store")
+			os.makedirs(path, exist_ok=True)
+			shape = (max_items or 1000, dim)
+			_create_matrix(norms_path, shape[:1], np.nan)
+			_create_matrix(vectors_path, shape, 0.0)
+			_fsync_dir(path)
+
+		mode = "r" if readonly else "r+"
+		vectors = np.load(vectors_path, mmap_mode=mode)
+		capacity, stored_dim = vectors.shape
+		if max_items is not None and max_items != capacity:
+			raise ValueError(f"Store at {path} holds {capacity} items, not {max_items}")
+		if dim is not None and dim != stored_dim:
+			raise ValueError(f"Store at {path} holds {stored_dim}-dimensional vectors, not {dim}")
+		super().__init__(max_items=capacity, dim=stored_dim, metric=metric, index=index)
+		self._vectors = vectors
+		self._norms_file = np.load(norms_path, mmap_mode=mode)
+
+		if not readonly:
+			self._lock_fd = os.open(os.path.join(path, LOCK_FILE), os.O_RDWR | os.O_CREAT, 0o644)
+			try:
+				fcntl.flock(self._lock_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+			except BlockingIOError:
+				os.close(self._lock_fd)
+				self._lock_fd = None
+				raise RuntimeError(f"Memory store at {path} is already open for writing")
+		self._load()
+
+	# -- public API ---------------------------------------------------------
+
+	def search_batch(self, queries: np.ndarray, k: int = 5) -> List[List[SearchHit]]:
+		self.refresh()
+		return super().search_batch(queries, k)
+
+	def refresh(self) -> None:
+		"""Apply records appended (or a compaction done) by the writer since the last load."""
+		if not self.readonly:
+			return
+		try:
+			stat = os.stat(self._log_path)
+		except FileNotFoundError:
+			return
+		if stat.st_ino != self._log_ino:
+			self._load()
+			return
+		if stat.st_size <= self._log_offset:
+			return
+		self._log.seek(self._log_offset)
+		self._apply(self._log.read())
+
+	def compact(self) -> None:
+		"""Rewrite the log keeping only records for live items."""
+		self._check_writable()
+		first = self._seq - len(self._items)
+		records = []
+		for seq in range(first, self._seq):
+			slot = seq % self.max_items
+			records.append({"op": "put", "seq": seq, "item": self._items[slot], "crc": self._crcs[slot]})
+		self._rewrite_log(records)
+
+	def clear(self) -> None:
+		self._check_writable()
+		self._rewrite_log([])
+		super().clear()
+		self._seq = 0
+		self._crcs = []
+		self._norms_file[:] = np.nan
+		self._norms_file.flush()
+
+	def close(self) -> None:
+		"""Release the log handle and (for the writer) the lock."""
+		if self._log is not None:
+			self._log.close()
+			self._log = None
+		if self._lock_fd is not None:
+			os.close(self._lock_fd)
+			self._lock_fd = None
+
+	# -- internals ----------------------------------------------------------
+
+	@property
+	def _log_path(self) -> str:
+		return os.path.join(self.path, LOG_FILE)
+
+	def _check_writable(self) -> None:
+		if self.readonly:
+			raise ValueError("Memory store is open read-only")
+
+	def _reserve(self, rows: int) -> None:
+		# The mapped matrix already has a row for every slot
+		return
+
+	def _write(self, items: Sequence[Dict[str, Any]], embeddings: Optional[np.ndarray]) -> None:
+		self._check_writable()
+		if embeddings is not None and embeddings.shape[1] != self.dim:
+			raise ValueError(f"Expected {self.dim}-dimensional embeddings")
+		if not len(items):
+			return
+		start = self._seq
+		self._append([{"op": "reserve", "seq": start, "count": len(items)}])
+		super()._write(items, embeddings)
+
+		slots = (start + np.arange(len(items))) % self.max_items
+		self._norms_file[slots] = self._sq_norms[slots]
+		self._vectors.flush()
+		self._norms_file.flush()
+
+		records = []
+		for offset, (slot, item) in enumerate(zip(slots.tolist(), items)):
+			crc = None if embeddings is None else _row_crc(self._vectors[slot])
+			records.append({"op": "put", "seq": start + offset, "item": item, "crc": crc})
+			self._set_crc(slot, crc)
+		self._append(records)
+		self._seq = start + len(items)
+		self._pending = None
+
+		if self.auto_compact and self._log_records > 2 * self.max_items:
+			self.compact()
+
+	def _set_crc(self, slot: int, crc: Optional[int]) -> None:
+		if slot == len(self._crcs):
+			self._crcs.append(crc)
+		else:
+			self._crcs[slot] = crc
+
+	def _load(self) -> None:
+		"""(Re)build in-memory state from the log."""
+		self._items = []
+		self._head = 0
+		self._seq = 0
+		self._crcs: List[Optional[int]] = []
+		self._pending: Optional[Tuple[int, int]] = None
+		self._log_records = 0
+		self._log_offset = 0
+		self._sq_norms = np.full(self.max_items, np.nan, dtype=np.float32)
+		if self.index is not None:
+			self.index.reset()
+
+		if self.readonly:
+			# Readers keep the log open so its inode can't be reused behind their back
+			try:
+				self._reopen_log("rb")
+			except FileNotFoundError:
+				self._log_ino = None
+				return
+			self._apply(self._log.read())
+			return
+		if self._log is not None:
+			self._log.close()
+			self._log = None
+
+		with open(self._log_path, "ab+") as log:
+			log.seek(0)
+			data = log.read()
+		self._apply(data)
+		if self._log_offset < len(data):
+			# Drop a torn tail left by a crash mid-append
+			os.truncate(self._log_path, self._log_offset)
+		if self._pending is not None:
+			self._recover_pending()
+		self._reopen_log("ab")
+
+	def _reopen_log(self, mode: str) -> None:
+		"""Replace the log handle with a fresh one on the current log file.
+
+		The handle is long-lived and owned by the store: it is closed by
+		``close()`` or by the next reopen, never by the opening scope.
+		"""
+		if self._log is not None:
+			self._log.close()
+			self._log = None
+		self._log = open(self._log_path, mode)  # noqa: SIM115 - owned by the store, see docstring
+		self._log_ino = os.fstat(self._log.fileno()).st_ino
+
+	def _apply(self, data: bytes) -> None:
+		base = self._log_offset
+		for end, record in _decode_records(data):
+			self._log_offset = base + end
+			self._log_records += 1
+			if record["op"] == "reserve":
+				self._pending = (record["seq"], record["seq"] + record["count"])
+				self._mask_pending()
+				continue
+			seq = record["seq"]
+			slot = seq % self.max_items
+			if slot >= len(self._items):
+				# A compacted log starts at the oldest live item, not slot 0
+				self._items.extend([None] * (slot + 1 - len(self._items)))
+				self._crcs.extend([None] * (slot + 1 - len(self._crcs)))
+			self._items[slot] = record["item"]
+			self._crcs[slot] = record["crc"]
+			self._sq_norms[slot] = np.nan if record["crc"] is None else self._norms_file[slot]
+			self._seq = seq + 1
+			if self._pending is not None and self._seq >= self._pending[1]:
+				self._pending = None
+		self._head = self._seq % self.max_items if len(self._items) == self.max_items else 0
+
+	def _pending_slots(self) -> List[int]:
+		start, end = self._pending
+		# Slots of items not yet committed by the in-progress write
+		return [seq % self.max_items for seq in range(max(start, self._seq), end)]
+
+	def _mask_pending(self) -> None:
+		for slot in self._pending_slots():
+			if slot < len(self._items):
+				self._sq_norms[slot] = np.nan
+
+	def _recover_pending(self) -> None:
+		"""Keep old items whose rows survived an interrupted write; others lose their vector."""
+		for slot in self._pending_slots():
+			if slot >= len(self._items) or self._crcs[slot] is None:
+				continue
+			row = self._vectors[slot]
+			if _row_crc(row) == self._crcs[slot]:
+				norm = float(np.dot(row, row))
+				self._sq_norms[slot] = self._norms_file[slot] = norm
+			else:
+				self._crcs[slot] = None
+		self._norms_file.flush()
+		self._pending = None
+
+	def _append(self, records: List[Dict[str, Any]]) -> None:
+		data = b"".join(_encode_record(r) for r in records)
+		self._log.write(data)
+		self._log.flush()
+		os.fsync(self._log.fileno())
+		self._log_offset += len(data)
+		self._log_records += len(records)
+
+	def _rewrite_log(self, records: List[Dict[str, Any]]) -> None:
+		tmp = self._log_path + ".tmp"
+		data = b"".join(_encode_record(r) for r in records)
+		with open(tmp, "wb") as log:
+			log.write(data)
+			log.flush()
+			os.fsync(log.fileno())
+		if self._log is not None:
+			self._log.close()
+			self._log = None
+		os.replace(tmp, self._log_path)
+		_fsync_dir(self.path)
+		self._reopen_log("ab")
+		self._log_offset = len(data)
+		self._log_records = len(records)
@@ -0,0 +1,337 @@
+import fcntl
+import json
+import os
+import shutil
+import struct
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import Any, BinaryIO, Dict, List, Optional, Sequence, Tuple
+
+import orjson
+
+CHECKPOINT_FILE = "checkpoint"
+LOCK_FILE = "writer.lock"
+CLAIM_LOCK_FILE = "claim.lock"
+_SEGMENT_PREFIX = "wal-"
+_SEGMENT_SUFFIX = ".log"
+
+READING = 1
+ACK = 2
+
+# payload length, CRC32 of (kind, seq, payload), kind, seq
+_RECORD_HEADER = struct.Struct("<IIBQ")
+_CRC_START = struct.calcsize("<II")
+
+
+def _encode(kind: int, seq: int, payload: bytes = b"") -> bytes:
+	header = _RECORD_HEADER.pack(len(payload), 0, kind, seq)
+	crc = zlib.crc32(payload, zlib.crc32(header[_CRC_START:]))
+	return _RECORD_HEADER.pack(len(payload), crc, kind, seq) + payload
+
+
+def _decode(data: bytes) -> Tuple[List[Tuple[int, int, bytes]], int]:
+	"""``(kind, seq, payload)`` of each intact record, and where the intact prefix ends."""
+	records = []
+	pos = 0
+	while pos + _RECORD_HEADER.size <= len(data):
+		length, crc, kind, seq = _RECORD_HEADER.unpack_from(data, pos)
+		start = pos + _RECORD_HEADER.size
+		end = start + length
+		if end > len(data) or zlib.crc32(data[start:end], zlib.crc32(data[pos + _CRC_START:start])) != crc:
+			break
+		records.append((kind, seq, data[start:end]))
+		pos = end
+	return records, pos
+
+
+def _fsync_dir(path: str) -> None:
+	fd = os.open(path, os.O_RDONLY)
+	try:
+		os.fsync(fd)
+	finally:
+		os.close(fd)
+
+
+class WriteAheadLog:
+	"""Append-only, group-committed log of accepted readings.
+
+	``append`` assigns a reading the next sequence number, queues it for
+	the committer thread and returns once it is on disk. The committer
+	writes everything queued since its last write and fsyncs once for the
+	whole group, so concurrent writers share an fsync instead of paying one
+	each. ``ack(seq)`` marks a reading as processed (analyzed and its alert,
+	if any, delivered); acks are written with the next group without
+	waiting or fsyncing, so after a crash a reading may be replayed although
+	its alerts went out (at-least-once delivery).
+
+	Records are length/CRC32-framed and live in segment files named by the
+	lowest reading sequence number they can hold. A segment is rotated once
+	it exceeds ``segment_bytes``; every rotation writes a checkpoint (the
+	oldest unacknowledged sequence number) and deletes the segments wholly
+	below it, so replay only reads the log's tail. Opening the log reads
+	from the checkpoint on, dropping a torn tail, and keeps the
+	unacknowledged readings for ``recovered()``.
+	"""
+
+	def __init__(self, path: str, segment_bytes: int = 64 * 1024 * 1024, sync: bool = True) -> None:
+		if segment_bytes < 1:
+			raise ValueError("segment_bytes must be positive")
+		self.path = path
+		self.segment_bytes = segment_bytes
+		self.sync = sync
+		os.makedirs(path, exist_ok=True)
+		self._lock_fd = os.open(os.path.join(path, LOCK_FILE), os.O_RDWR | os.O_CREAT, 0o644)
+		try:
+			fcntl.flock(self._lock_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+		except BlockingIOError:
+			os.close(self._lock_fd)
+			raise RuntimeError(f"Write-ahead log at {path} is already open")
+
+		self._lock = threading.Lock()
+		self._queued = threading.Condition(self._lock)
+		self._committed = threading.Condition(self._lock)
+		self._queue: List[bytes] = []
+		self._queue_seq = -1  # highest reading seq queued so far
+		self._durable_seq = -1  # highest reading seq on disk
+		self._segments: List[int] = []
+		self._error: Optional[BaseException] = None
+		self._closing = False
+		# Unacknowledged reading seqs, oldest first
+		self._unacked: "OrderedDict[int, None]" = OrderedDict()
+		# Guards the segment list and checkpoint file (committer and callers)
+		self._files_lock = threading.Lock()
+
+		self._checkpoint = self._read_checkpoint()
+		self._recovered, next_seq = self._replay()
+		for seq, _ in self._recovered:
+			self._unacked[seq] = None
+		self._next_seq = next_seq
+		self._queue_seq = self._durable_seq = next_seq - 1
+		self._segments = self._segment_starts()
+		self._file: BinaryIO = self._open_segment(next_seq)
+		self._thread = threading.Thread(target=self._run, name="wal-committer", daemon=True)
+		self._thread.start()
+
+	# -- writers (any thread) -----------------------------------------------
+
+	def append(self, event: Dict[str, Any]) -> int:
+		"""Log a reading and wait until it is durable; returns its sequence number."""
+		return self.append_many([event])[0]
+
+	def append_many(self, events: Sequence[Dict[str, Any]]) -> List[int]:
+		"""Log readings as one group and wait until they are durable."""
+		payloads = [orjson.dumps(event, default=str) for event in events]
+		with self._lock:
+			if self._closing:
+				raise RuntimeError("Write-ahead log is closed")
+			seqs = list(range(self._next_seq, self._next_seq + len(payloads)))
+			self._next_seq += len(payloads)
+			for seq, payload in zip(seqs, payloads):
+				self._queue.append(_encode(READING, seq, payload))
+				self._unacked[seq] = None
+			if seqs:
+				self._queue_seq = seqs[-1]
+			self._queued.notify()
+			while seqs and self._durable_seq < seqs[-1]:
+				if self._error is not None:
+					raise RuntimeError("Write-ahead log failed") from self._error
+				self._committed.wait()
+		return seqs
+
+	def ack(self, seq: int) -> None:
+		"""Mark a reading as processed; it will not be replayed once this is written."""
+		self.ack_many([seq])
+
+	def ack_many(self, seqs: Sequence[int]) -> None:
+		with self._lock:
+			for seq in seqs:
+				if seq in self._unacked:
+					del self._unacked[seq]
+					self._queue.append(_encode(ACK, seq))
+			self._queued.notify()
+
+	def recovered(self) -> List[Tuple[int, Dict[str, Any]]]:
+		"""``(seq, event)`` of the readings found unacknowledged when the log was opened, or adopted."""
+		return list(self._recovered)
+
+	def adopt(self, other: "WriteAheadLog") -> int:
+		"""Take over another log's unacknowledged readings, then close and delete it.
+
+		The readings are logged here first, so a crash midway replays them
+		at least once. Returns how many were adopted.
+		"""
+		events = [event for _, event in other.recovered()]
+		seqs = self.append_many(events) if events else []
+		self._recovered.extend(zip(seqs, events))
+		other.close()
+		shutil.rmtree(other.path)
+		return len(events)
+
+	def unacknowledged(self) -> int:
+		with self._lock:
+			return len(self._unacked)
+
+	def checkpoint(self) -> None:
+		"""Record the oldest unacknowledged reading and delete segments wholly below it."""
+		with self._lock:
+			oldest = next(iter(self._unacked), self._next_seq)
+		self._write_checkpoint(oldest)
+
+	def close(self) -> None:
+		"""Write what is queued, checkpoint, stop the committer and release the lock."""
+		with self._lock:
+			if self._closing:
+				return
+			self._closing = True
+			self._queued.notify()
+		self._thread.join()
+		self._file.close()
+		if self._error is None:
+			self.checkpoint()
+		os.close(self._lock_fd)
+
+	# -- committer thread ---------------------------------------------------
+
+	def _run(self) -> None:
+		try:
+			self._commit_groups()
+		except BaseException as exc:
+			# Fail waiting and later writers instead of leaving them blocked
+			with self._lock:
+				self._error = exc
+				self._committed.notify_all()
+			raise
+
+	def _commit_groups(self) -> None:
+		while True:
+			with self._lock:
+				while not self._queue and not self._closing:
+					self._queued.wait()
+				if not self._queue:
+					return
+				batch, self._queue = self._queue, []
+				batch_seq = self._queue_seq
+			self._file.write(b"".join(batch))
+			self._file.flush()
+			if self.sync and batch_seq > self._durable_seq:
+				os.fsync(self._file.fileno())
+			with self._lock:
+				self._durable_seq = max(self._durable_seq, batch_seq)
+				self._committed.notify_all()
+			if self._file.tell() >= self.segment_bytes:
+				# Every reading queued later has a higher seq than this batch's
+				self._file.close()
+				self._file = self._open_segment(batch_seq + 1)
+				self.checkpoint()
+
+	# -- files --------------------------------------------------------------
+
+	def _segment_path(self, start: int) -> str:
+		return os.path.join(self.path, f"{_SEGMENT_PREFIX}{start:020d}{_SEGMENT_SUFFIX}")
+
+	def _segment_starts(self) -> List[int]:
+		starts = []
+		for name in os.listdir(self.path):
+			if name.startswith(_SEGMENT_PREFIX) and name.endswith(_SEGMENT_SUFFIX):
+				starts.append(int(name[len(_SEGMENT_PREFIX):-len(_SEGMENT_SUFFIX)]))
+		return sorted(starts)
+
+	def _open_segment(self, start: int) -> BinaryIO:
+		"""Open a segment for appending. The log owns the handle until rotation or ``close()``."""
+		f = open(self._segment_path(start), "ab")  # noqa: SIM115 - owned by the log, see docstring
+		with self._files_lock:
+			if start not in self._segments:
+				self._segments.append(start)
+				self._segments.sort()
+				_fsync_dir(self.path)
+		return f
+
+	def _read_checkpoint(self) -> int:
+		try:
+			with open(os.path.join(self.path, CHECKPOINT_FILE), "rb") as f:
+				return int(json.loads(f.read())["seq"])
+		except FileNotFoundError:
+			return 0
+
+	def _write_checkpoint(self, seq: int) -> None:
+		with self._files_lock:
+			if seq < self._checkpoint:
+				return
+			if seq > self._checkpoint:
+				path = os.path.join(self.path, CHECKPOINT_FILE)
+				with open(path + ".tmp", "wb") as f:
+					f.write(json.dumps({"seq": seq}).encode())
+					f.flush()
+					os.fsync(f.fileno())
+				os.replace(path + ".tmp", path)
+				_fsync_dir(self.path)
+				self._checkpoint = seq
+			# A segment only holds readings below the next one's start
+			while len(self._segments) > 1 and self._segments[1] <= seq:
+				try:
+					os.remove(self._segment_path(self._segments[0]))
+				except FileNotFoundError:
+					pass
+				del self._segments[0]
+
+	def _replay(self) -> Tuple[List[Tuple[int, Dict[str, Any]]], int]:
+		"""Unacknowledged readings from the checkpoint on, and the next sequence number."""
+		pending: "OrderedDict[int, Dict[str, Any]]" = OrderedDict()
+		next_seq = self._checkpoint
+		starts = self._segment_starts()
+		for i, start in enumerate(starts):
+			if i + 1 < len(starts) and starts[i + 1] <= self._checkpoint:
+				continue
+			path = self._segment_path(start)
+			with open(path, "rb") as f:
+				data = f.read()
+			records, end = _decode(data)
+			if end < len(data):
+				# Torn or corrupt tail from a crash mid-write
+				with open(path, "r+b") as f:
+					f.truncate(end)
+			for kind, seq, payload in records:
+				if seq < self._checkpoint:
+					continue
+				if kind == READING:
+					pending[seq] = orjson.loads(payload)
+					next_seq = max(next_seq, seq + 1)
+				elif kind == ACK:
+					pending.pop(seq, None)
+		return list(pending.items()), next_seq
+
+
+def open_worker_log(root: str, **options: Any) -> WriteAheadLog:
+	"""Open a write-ahead log of this process's own under ``root``.
+
+	Worker processes (e.g. ``uvicorn --workers 4``) share ``root``: each
+	takes a subdirectory no live process holds (one left by a worker that
+	died, whose readings it then replays) or creates one, and adopts the
+	unacknowledged readings of every other unheld log. Claims are
+	serialized with an ``flock`` on ``<root>/claim.lock``. ``options`` go
+	to ``WriteAheadLog``.
+	"""
+	os.makedirs(root, exist_ok=True)
+	fd = os.open(os.path.join(root, CLAIM_LOCK_FILE), os.O_RDWR | os.O_CREAT, 0o644)
+	try:
+		fcntl.flock(fd, fcntl.LOCK_EX)
+		free: List[WriteAheadLog] = []
+		for name in sorted(os.listdir(root)):
+			path = os.path.join(root, name)
+			if not os.path.isdir(path):
+				continue
+			try:
+				free.append(WriteAheadLog(path, **options))
+			except RuntimeError:
+				continue  # held by a running worker
+		if free:
+			own = free.pop(0)
+		else:
+			own = WriteAheadLog(os.path.join(root, f"worker-{os.getpid()}-{time.time_ns()}"), **options)
+		for orphan in free:
+			own.adopt(orphan)
+		return own
+	finally:
+		os.close(fd)
@@ -1,3 +1,5 @@
+import pytest
+
 from agent_project.core.agent import HealthAgent
 
 
@@ -11,3 +13,243 @@ def test_alert_trigger_on_fall():
 	})
 	assert res["assessment"]["should_alert"] is True
 	assert res["assessment"]["severity"] == "critical"
+
+
+def test_analyze_many_matches_analyze():
+	agent = HealthAgent()
+	events = [
+		{"heart_rate": 70, "spo2": 98, "temperature_c": 36.7},
+		{"heart_rate": 130, "spo2": 89, "temperature_c": 39.1},
+		{"heart_rate": 60, "spo2": 97, "temperature_c": 36.5, "fall_detected": True},
+	]
+	assert agent.analyze_many(events) == [agent.analyze(e) for e in events]
+
+
+def test_window_aggregates_feed_rules():
+	from agent_project.application.rule_engine import (
+		Condition,
+		ConditionOperator,
+		Rule,
+		RuleCondition,
+		RuleEngine,
+		TagAction,
+	)
+	from agent_project.core.tools.windows import WindowStore
+
+	def make_agent():
+		engine = RuleEngine()
+		engine.add_rule(Rule(
+			id="hr_rising",
+			name="Heart rate rising",
+			condition=RuleCondition(conditions=[
+				Condition(field="window.5m.heart_rate.slope", operator=ConditionOperator.GT, value=2),
+			]),
+			action=TagAction(labels=["hr_rising"]),
+		))
+		return HealthAgent(rule_engine=engine, window_store=WindowStore())
+
+	events = [
+		{"heart_rate": 70 + 4 * i, "spo2": 98, "temperature_c": 36.7, "meta": {"patient_id": "p1", "timestamp": 60.0 * i}}
+		for i in range(4)
+	]
+	agent = make_agent()
+	decisions = [agent.analyze(e) for e in events]
+	assert decisions[0]["window"]["5m"]["heart_rate"]["count"] == 1
+	assert "hr_rising" not in decisions[0]["tags"].get("labels", [])
+	assert decisions[-1]["window"]["5m"]["heart_rate"]["slope"] == pytest.approx(4.0)
+	assert "hr_rising" in decisions[-1]["tags"]["labels"]
+	assert make_agent().analyze_many(events) == decisions
+	owned_agent = make_agent()
+	assert [owned_agent.analyze(dict(e), owned=True) for e in events] == decisions
+
+
+def test_owned_analyze_matches_analyze():
+	from agent_project.application.rule_engine import (
+		Condition,
+		ConditionOperator,
+		Rule,
+		RuleCondition,
+		RuleEngine,
+		TagAction,
+	)
+	from agent_project.core.tools.alerts import AlertDispatcher
+
+	class Recorder(AlertDispatcher):
+		def __init__(self):
+			self.alerts = []
+
+		def dispatch(self, alert):
+			self.alerts.append(alert)
+
+	engine = RuleEngine()
+	engine.add_rule(Rule(
+		id="fever",
+		name="Fever",
+		condition=RuleCondition(conditions=[
+			Condition(field="temperature_c", operator=ConditionOperator.GTE, value=38),
+		]),
+		action=TagAction(labels=["fever"], features=["temp_high"]),
+	))
+	events = [
+		{"heart_rate": 70, "spo2": 98, "temperature_c": 36.7},
+		{"heart_rate": 130, "spo2": 89, "temperature_c": 39.1},
+	]
+	copying, owning = Recorder(), Recorder()
+	expected = [HealthAgent(copying, engine).analyze(e) for e in events]
+	owned = [HealthAgent(owning, engine).analyze(dict(e), owned=True) for e in events]
+	assert owned == expected
+	assert owning.alerts == copying.alerts
+	assert owning.alerts[0]["data"]["tags"]["labels"] == ["fever"]
+	assert engine.tag(events[1]) == engine.process(events[1])["tags"]
+
+
+def test_async_analysis_in_process_pool():
+	import asyncio
+
+	from agent_project.application.rule_engine import (
+		Condition,
+		ConditionOperator,
+		Rule,
+		RuleCondition,
+		RuleEngine,
+		TagAction,
+	)
+	from agent_project.core.agent import AnalysisPool
+
+	def rule(rule_id, threshold):
+		return Rule(
+			id=rule_id,
+			name=rule_id,
+			condition=RuleCondition(conditions=[
+				Condition(field="heart_rate", operator=ConditionOperator.GT, value=threshold),
+			]),
+			action=TagAction(labels=[rule_id]),
+		)
+
+	engine = RuleEngine()
+	engine.add_rule(rule("tachy", 100))
+	local = HealthAgent(rule_engine=engine)
+	events = [
+		{"heart_rate": 70 + 10 * i, "spo2": 98, "temperature_c": 36.7, "fall_detected": i == 3}
+		for i in range(8)
+	]
+
+	async def run(agent):
+		single = await agent.analyze_async(events[5])
+		engine.add_rule(rule("very_tachy", 130))  # workers must pick up the new version
+		return single, await agent.analyze_many_async(events)
+
+	pool = AnalysisPool(engine, max_workers=2)
+	try:
+		single, many = asyncio.run(run(HealthAgent(rule_engine=engine, pool=pool)))
+	finally:
+		pool.close()
+	assert single == local.analyze(events[5])
+	assert many == local.analyze_many(events)
+	assert "very_tachy" in many[-1]["tags"]["labels"]
+
+
+def test_cache_reuses_results_for_identical_readings():
+	from agent_project.application.rule_engine import (
+		Condition,
+		ConditionOperator,
+		Rule,
+		RuleCondition,
+		RuleEngine,
+		TagAction,
+	)
+	from agent_project.core.agent import AnalysisCache
+	from agent_project.core.tools.alerts import AlertDispatcher
+
+	class Recorder(AlertDispatcher):
+		def __init__(self):
+			self.alerts = []
+
+		def dispatch(self, alert):
+			self.alerts.append(alert)
+
+	def fever_rule(rule_id, threshold):
+		return Rule(
+			id=rule_id,
+			name="Fever",
+			condition=RuleCondition(conditions=[
+				Condition(field="temperature_c", operator=ConditionOperator.GTE, value=threshold),
+				Condition(field="meta.ward", operator=ConditionOperator.EQ, value="A"),
+			]),
+			action=TagAction(labels=[rule_id]),
+		)
+
+	engine = RuleEngine()
+	engine.add_rule(fever_rule("fever", 38))
+	now = [0.0]
+	cache = AnalysisCache(max_entries=2, ttl_seconds=30, clock=lambda: now[0])
+	cached, plain = Recorder(), Recorder()
+	agent = HealthAgent(cached, engine, cache=cache)
+	reference = HealthAgent(plain, engine)
+	events = [
+		{"heart_rate": 70, "spo2": 98, "temperature_c": 39.0, "meta": {"ward": "A", "timestamp": float(i)}}
+		for i in range(5)
+	]
+
+	assert [agent.analyze(e) for e in events] == [reference.analyze(e) for e in events]
+	assert (cache.hits, cache.misses) == (4, 1)
+	# Every reading still alerts, with its own event data
+	assert cached.alerts == plain.alerts
+	assert len(cached.alerts) == 5
+	# Decisions are independent copies
+	agent.analyze(events[0])["tags"]["labels"].append("mutated")
+	assert agent.analyze(events[0])["tags"]["labels"] == ["fever"]
+
+	# An integer reading renders differently in the message
+	assert agent.analyze({**events[0], "temperature_c": 39})["assessment"]["message"] == "temperature_c high: 39"
+
+	now[0] = 31.0
+	hits = cache.hits
+	agent.analyze(events[0])
+	assert cache.hits == hits
+
+	engine.add_rule(fever_rule("fever_high", 38.5))
+	assert agent.analyze(events[0])["tags"]["labels"] == ["fever", "fever_high"]
+	assert len(cache) == 1
+
+	batch = events + [{**events[0], "meta": {"ward": "B"}}] * 2
+	assert HealthAgent(Recorder(), engine, cache=AnalysisCache()).analyze_many(batch) == reference.analyze_many(batch)
+	size = len(cache)
+	assert agent.analyze({**events[0], "meta": {"ward": {"A"}}})["tags"]["labels"] == []
+	assert len(cache) == size
+
+
+def test_cache_never_serves_results_from_older_rules():
+	from agent_project.application.rule_engine import (
+		Condition,
+		ConditionOperator,
+		Rule,
+		RuleCondition,
+		RuleEngine,
+		TagAction,
+	)
+	from agent_project.core.agent import AnalysisCache
+
+	def rule(threshold):
+		return Rule(
+			id="tachy",
+			name="Tachycardia",
+			condition=RuleCondition(conditions=[
+				Condition(field="heart_rate", operator=ConditionOperator.GT, value=threshold),
+			]),
+			action=TagAction(labels=["tachy"]),
+		)
+
+	engine = RuleEngine()
+	engine.add_rule(rule(100))
+	cache = AnalysisCache()
+	event = {"heart_rate": 110, "spo2": 97, "temperature_c": 36.8}
+	stale_key = cache.key(event, engine)
+	stale = (engine.process(event)["tags"], {"should_alert": False})
+	# The rule changes while that result is being computed
+	engine.add_rule(rule(120))
+	key = cache.key(event, engine)
+	cache.put(stale_key, stale)
+	assert key != stale_key
+	assert cache.get(key) is None
+	assert len(cache) == 0
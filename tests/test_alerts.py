@@ -0,0 +1,178 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from agent_project.core.tools.alerts import AlertCoalescer, AlertDispatcher, AsyncAlertDispatcher
+
+
+class _Webhook:
+	"""Local stand-in for an alert webhook receiver."""
+
+	def __init__(self, fail_first: int = 0, delay: float = 0.0) -> None:
+		self.received = []
+		self.attempts = 0
+		self.fail_first = fail_first
+		self.delay = delay
+		webhook = self
+
+		class Handler(BaseHTTPRequestHandler):
+			def do_POST(self):
+				body = self.rfile.read(int(self.headers["Content-Length"]))
+				webhook.attempts += 1
+				if webhook.delay:
+					time.sleep(webhook.delay)
+				if webhook.attempts <= webhook.fail_first:
+					self.send_response(503)
+				else:
+					webhook.received.append(json.loads(body))
+					self.send_response(200)
+				self.end_headers()
+
+			def log_message(self, *args):
+				pass
+
+		self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+		self.url = f"http://127.0.0.1:{self.server.server_port}/alerts"
+		threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+	def stop(self) -> None:
+		self.server.shutdown()
+		self.server.server_close()
+
+
+@pytest.fixture
+def webhook():
+	server = _Webhook()
+	yield server
+	server.stop()
+
+
+def _alert(i: int) -> dict:
+	return {"type": "high", "message": f"alert {i}", "data": {"heart_rate": 130}}
+
+
+def test_async_dispatch_delivers_and_drains_on_close(webhook):
+	dispatcher = AsyncAlertDispatcher(webhook_url=webhook.url, workers=3)
+	delivered = []
+	for i in range(20):
+		dispatcher.dispatch_tracked(_alert(i), lambda i=i: delivered.append(i))
+	dispatcher.close()
+	assert sorted(a["message"] for a in webhook.received) == sorted(f"alert {i}" for i in range(20))
+	assert dispatcher.sent == 20
+	assert sorted(delivered) == list(range(20))
+	assert dispatcher.pending() == 0
+	# Alerts after shutdown are dropped rather than raising
+	dispatcher.dispatch(_alert(99))
+	assert dispatcher.dropped == 1
+
+
+def test_async_dispatch_retries_server_errors():
+	server = _Webhook(fail_first=2)
+	try:
+		dispatcher = AsyncAlertDispatcher(webhook_url=server.url, workers=1, backoff_base=0.01)
+		dispatcher.dispatch(_alert(1))
+		dispatcher.close()
+		assert server.attempts == 3
+		assert [a["message"] for a in server.received] == ["alert 1"]
+		assert dispatcher.sent == 1 and dispatcher.failed == 0
+	finally:
+		server.stop()
+
+
+def test_async_dispatch_overflow_drops_oldest():
+	server = _Webhook(delay=0.2)
+	try:
+		dispatcher = AsyncAlertDispatcher(webhook_url=server.url, workers=1, max_queue_size=2)
+		delivered = []
+		for i in range(6):
+			dispatcher.dispatch_tracked(_alert(i), lambda i=i: delivered.append(f"alert {i}"))
+		dispatcher.close()
+		messages = [a["message"] for a in server.received]
+		# The first alert was already in flight; only the newest two queued survive
+		assert messages[-2:] == ["alert 4", "alert 5"]
+		assert dispatcher.dropped == 6 - len(messages)
+		# Dropped alerts are never reported delivered
+		assert sorted(delivered) == sorted(messages)
+	finally:
+		server.stop()
+
+
+def test_async_dispatch_survives_unexpected_errors(webhook):
+	dispatcher = AsyncAlertDispatcher(webhook_url=webhook.url, workers=1)
+	# Not JSON-serializable: fails before any request is made
+	dispatcher.dispatch({"type": "high", "message": "odd", "data": {"value": object()}})
+	for i in range(3):
+		dispatcher.dispatch(_alert(i))
+	dispatcher.close()
+	assert dispatcher.failed == 1
+	assert dispatcher.sent == 3
+	assert [a["message"] for a in webhook.received] == ["alert 0", "alert 1", "alert 2"]
+
+
+def _produce(dispatcher, errors):
+	try:
+		for i in range(200):
+			dispatcher.dispatch(_alert(i))
+	except RuntimeError as exc:
+		errors.append(exc)
+
+
+def test_async_dispatch_racing_close_never_raises(webhook):
+	for _ in range(20):
+		dispatcher = AsyncAlertDispatcher(webhook_url=webhook.url, workers=1)
+		dispatcher.start()
+		errors = []
+		producer = threading.Thread(target=_produce, args=(dispatcher, errors))
+		producer.start()
+		dispatcher.close(timeout=0)
+		producer.join()
+		assert errors == []
+		assert dispatcher.sent + dispatcher.failed + dispatcher.dropped == 200
+
+
+def test_invalid_overflow_policy():
+	with pytest.raises(ValueError):
+		AsyncAlertDispatcher(webhook_url="http://127.0.0.1:9", overflow="explode")
+
+
+class _Recorder(AlertDispatcher):
+	def __init__(self) -> None:
+		super().__init__()
+		self.alerts = []
+
+	def dispatch(self, alert: dict) -> None:
+		self.alerts.append(alert)
+
+
+def test_coalescer_groups_alerts_and_passes_critical_through():
+	clock = [1000.0]
+	sink = _Recorder()
+	coalescer = AlertCoalescer(sink, window_seconds=60, autoflush=False, clock=lambda: clock[0])
+
+	for i in range(50):
+		clock[0] += 0.5
+		coalescer.dispatch({"type": "high", "message": "heart_rate high: 130", "data": {"meta": {"patient_id": "p1"}, "i": i}})
+		coalescer.dispatch({"type": "high", "message": "heart_rate high: 130", "data": {"meta": {"patient_id": "p2"}}})
+	coalescer.dispatch({"type": "critical", "message": "Fall detected", "data": {"meta": {"patient_id": "p1"}}})
+
+	# Only the fall went out so far
+	assert [a["message"] for a in sink.alerts] == ["Fall detected"]
+
+	coalescer.flush()
+	batch = sink.alerts[-1]
+	assert batch["type"] == "batch"
+	groups = {g["subject"]: g for g in batch["alerts"]}
+	assert groups["p1"]["count"] == 50 and groups["p2"]["count"] == 50
+	assert groups["p1"]["data"]["i"] == 49
+	assert groups["p1"]["first_seen"] == 1000.5 and groups["p1"]["last_seen"] == 1025.0
+
+	# A new window starts after a flush and closes lazily once expired
+	coalescer.dispatch({"type": "high", "message": "spo2 low: 88", "data": {}})
+	clock[0] += 61
+	coalescer.dispatch({"type": "high", "message": "spo2 low: 88", "data": {}})
+	assert sink.alerts[-1]["alerts"][0]["count"] == 1
+	coalescer.close()
+	assert len(sink.alerts) == 4
@@ -0,0 +1,114 @@
+import json
+
+from fastapi.testclient import TestClient
+
+from agent_project.infrastructure.api.app import app
+
+client = TestClient(app)
+
+
+def test_analyze_batch_matches_single_requests():
+	events = [
+		{"heart_rate": 70, "spo2": 98, "temperature_c": 36.7},
+		{"heart_rate": 130, "spo2": 89, "temperature_c": 39.1},
+		{"heart_rate": 60, "spo2": 97, "temperature_c": 36.5, "fall_detected": True},
+	]
+	res = client.post("/v1/analyze/batch", json=events)
+	assert res.status_code == 200
+	assert res.json() == [client.post("/v1/analyze", json=e).json() for e in events]
+
+
+def test_analyze_batch_rejects_invalid_event():
+	res = client.post("/v1/analyze/batch", json=[{"heart_rate": 70, "spo2": 98}])
+	assert res.status_code == 422
+
+
+def test_analyze_reports_invalid_fields():
+	res = client.post("/v1/analyze", json={"heart_rate": -1, "spo2": 98})
+	assert res.status_code == 422
+	locs = [error["loc"] for error in res.json()["detail"]]
+	assert locs == [["body", "heart_rate"], ["body", "temperature_c"]]
+	assert client.post("/v1/analyze", content=b"{not json").status_code == 422
+
+
+def test_analyze_stream_ndjson():
+	lines = [
+		json.dumps({"heart_rate": 70, "spo2": 98, "temperature_c": 36.7}),
+		"",
+		"{not json",
+		json.dumps({"heart_rate": 130, "spo2": 89, "temperature_c": 39.1}),
+	]
+	body = ("\n".join(lines)).encode()
+	# Split mid-line to exercise chunk reassembly
+	chunks = [body[:25], body[25:90], body[90:]]
+	res = client.post("/v1/analyze/stream", content=iter(chunks))
+	assert res.status_code == 200
+	results = [json.loads(line) for line in res.text.splitlines()]
+	assert [r["line"] for r in results] == [1, 3, 4]
+	assert results[0]["assessment"]["should_alert"] is False
+	assert "error" in results[1]
+	assert results[2]["assessment"]["severity"] == "high"
+
+
+def test_websocket_stream():
+	with client.websocket_connect("/v1/stream") as ws:
+		ws.send_text(json.dumps({"heart_rate": 60, "spo2": 97, "temperature_c": 36.5, "fall_detected": True}))
+		first = json.loads(ws.receive_text())
+		assert first["assessment"]["severity"] == "critical"
+
+		ws.send_text(json.dumps({"heart_rate": 70, "spo2": 98, "temperature_c": 36.7}) + "\n" + json.dumps({"heart_rate": 70}))
+		ok, bad = json.loads(ws.receive_text()), json.loads(ws.receive_text())
+		assert ok["line"] == 2 and ok["assessment"]["should_alert"] is False
+		assert bad["line"] == 3 and "error" in bad
+
+
+def test_metrics_endpoint(monkeypatch):
+	from agent_project.infrastructure.api import app as app_module
+	from agent_project.infrastructure.monitoring.metrics import MetricsRegistry
+
+	# Off by default
+	assert client.get("/metrics").status_code == 404
+	metrics = MetricsRegistry()
+	monkeypatch.setattr(app_module, "metrics", metrics)
+	monkeypatch.setattr(app_module.agent, "metrics", metrics)
+	monkeypatch.setattr(app_module.rule_engine, "metrics", metrics)
+	client.post("/v1/analyze", json={"heart_rate": 130, "spo2": 89, "temperature_c": 39.1})
+	res = client.get("/metrics")
+	assert res.status_code == 200
+	assert res.headers["content-type"].startswith("text/plain")
+	assert 'health_agent_stage_seconds_count{stage="rules"}' in res.text
+
+
+def test_threshold_profiles_endpoint():
+	reading = {"heart_rate": 65, "spo2": 97, "temperature_c": 36.8, "meta": {"cohort": "pediatric"}}
+	assert client.post("/v1/analyze", json=reading).json()["assessment"]["should_alert"] is False
+
+	profiles = [{"id": "pediatric", "match": {"cohort": "pediatric"}, "thresholds": {"heart_rate": {"low": 70}}}]
+	res = client.put("/v1/threshold-profiles", json=profiles)
+	assert res.status_code == 200
+	try:
+		assert client.get("/v1/threshold-profiles").json()[0]["id"] == "pediatric"
+		assert client.post("/v1/analyze", json=reading).json()["assessment"]["message"] == "heart_rate low: 65.0"
+		assert client.put("/v1/threshold-profiles", json=[{"id": "bad", "priority": "x"}]).status_code == 400
+		assert client.get("/v1/threshold-profiles").json()[0]["id"] == "pediatric"
+	finally:
+		client.put("/v1/threshold-profiles", json=[])
+
+
+def test_patient_history_endpoint(tmp_path, monkeypatch):
+	from agent_project.infrastructure.api import app as app_module
+	from agent_project.infrastructure.timeseries.store import TimeSeriesStore
+
+	assert client.get("/v1/patients/p1/history").status_code == 404
+	monkeypatch.setattr(app_module.agent, "history", TimeSeriesStore(str(tmp_path)))
+	for i, heart_rate in enumerate([70, 130, 72]):
+		event = {"heart_rate": heart_rate, "spo2": 98, "temperature_c": 36.7, "meta": {"patient_id": "p1", "timestamp": 100.0 + i}}
+		client.post("/v1/analyze", json=event)
+	res = client.get("/v1/patients/p1/history", params={"start": 101, "columns": "heart_rate,severity"})
+	assert res.status_code == 200
+	assert res.json() == {
+		"patient_id": "p1",
+		"count": 2,
+		"columns": {"timestamp": [101.0, 102.0], "heart_rate": [130.0, 72.0], "severity": ["high", "info"]},
+	}
+	assert client.get("/v1/patients/p1/history", params={"columns": "nope"}).status_code == 400
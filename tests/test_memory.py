@@ -1,4 +1,9 @@
+import numpy as np
+import pytest
+
+from agent_project.infrastructure.vector_database.ivf import IVFIndex
 from agent_project.infrastructure.vector_database.memory import SimpleLongTermMemory
+from agent_project.infrastructure.vector_database.persistent import PersistentLongTermMemory
 
 
 def test_memory_retains_max_items():
@@ -8,3 +13,121 @@ def test_memory_retains_max_items():
 	mem.add({"id": 3})
 	items = list(mem.all())
 	assert len(items) == 2
+
+
+def test_memory_keeps_newest_items_in_order():
+	mem = SimpleLongTermMemory(max_items=3)
+	for i in range(7):
+		mem.add({"id": i})
+	assert [item["id"] for item in mem.all()] == [4, 5, 6]
+	mem.add_many([{"id": i} for i in range(7, 12)])
+	assert [item["id"] for item in mem.all()] == [9, 10, 11]
+
+
+def test_exact_top_k_search():
+	rng = np.random.default_rng(0)
+	vectors = rng.normal(size=(500, 16)).astype(np.float32)
+	mem = SimpleLongTermMemory(max_items=400, metric="cosine")
+	mem.add_many([{"id": i} for i in range(500)], vectors)
+	mem.add({"id": "no-embedding"})
+
+	# Only the newest 400 items remain searchable (ids 101..499)
+	query = vectors[250] + 0.01
+	hits = mem.search(query, k=3)
+	assert hits[0][1]["id"] == 250
+	assert hits[0][0] >= hits[1][0] >= hits[2][0]
+	live = vectors[101:]
+	cos = live @ query / (np.linalg.norm(live, axis=1) * np.linalg.norm(query))
+	assert [h[1]["id"] for h in hits] == [int(i) + 101 for i in np.argsort(-cos)[:3]]
+	assert all(h[1]["id"] != 0 for h in mem.search(vectors[0], k=400))
+
+	l2 = SimpleLongTermMemory(max_items=10, metric="l2")
+	l2.add_many([{"id": i} for i in range(10)], vectors[:10])
+	batch = l2.search_batch(vectors[[3, 7]], k=2)
+	assert [hits[0][1]["id"] for hits in batch] == [3, 7]
+	assert batch[0][0][0] < 1e-2
+
+
+def test_ivf_index_recall():
+	rng = np.random.default_rng(1)
+	centers = rng.normal(size=(20, 8)) * 10
+	vectors = (centers[rng.integers(0, 20, size=5000)] + rng.normal(size=(5000, 8))).astype(np.float32)
+	exact = SimpleLongTermMemory(max_items=5000, metric="l2")
+	approx = SimpleLongTermMemory(max_items=5000, metric="l2", index=IVFIndex(nlist=32, nprobe=4))
+	items = [{"id": i} for i in range(5000)]
+	exact.add_many(items, vectors)
+	approx.add_many(items, vectors)
+
+	queries = vectors[:50] + 0.1
+	found = 0
+	for want, got in zip(exact.search_batch(queries, k=5), approx.search_batch(queries, k=5)):
+		found += len({h[1]["id"] for h in want} & {h[1]["id"] for h in got})
+	assert found / 250 > 0.9
+
+	# Overwritten slots are reassigned, so evicted items never come back
+	approx.add_many([{"id": f"new{i}"} for i in range(100)], vectors[:100] + 1000)
+	ids = {h[1]["id"] for h in approx.search(vectors[0] + 1000, k=10)}
+	assert ids and all(str(i).startswith("new") for i in ids)
+
+
+def test_persistent_memory_reopens_from_disk(tmp_path):
+	rng = np.random.default_rng(2)
+	vectors = rng.normal(size=(12, 4)).astype(np.float32)
+	mem = PersistentLongTermMemory(str(tmp_path), max_items=8, dim=4)
+	mem.add_many([{"id": i} for i in range(10)], vectors[:10])
+	mem.add({"id": 10})
+	mem.close()
+
+	mem = PersistentLongTermMemory(str(tmp_path))
+	assert [item["id"] for item in mem.all()] == [3, 4, 5, 6, 7, 8, 9, 10]
+	assert mem.search(vectors[5], k=1)[0][1] == {"id": 5}
+	mem.add({"id": 11}, vectors[11])
+	mem.compact()
+	mem.close()
+
+	# A torn record at the end of the log is ignored and truncated
+	with open(tmp_path / "meta.log", "ab") as log:
+		log.write(b"\x40\x00\x00\x00garbage")
+	mem = PersistentLongTermMemory(str(tmp_path))
+	assert [item["id"] for item in mem.all()] == [4, 5, 6, 7, 8, 9, 10, 11]
+	assert mem.search(vectors[11], k=1)[0][1] == {"id": 11}
+	mem.clear()
+	mem.close()
+	assert list(PersistentLongTermMemory(str(tmp_path)).all()) == []
+
+
+def test_persistent_memory_recovers_interrupted_write(tmp_path):
+	rng = np.random.default_rng(3)
+	vectors = rng.normal(size=(4, 4)).astype(np.float32)
+	mem = PersistentLongTermMemory(str(tmp_path), max_items=4, dim=4)
+	mem.add_many([{"id": i} for i in range(4)], vectors)
+	# Crash after reserving slots 0-1 and overwriting slot 0's row, before commit
+	mem._append([{"op": "reserve", "seq": 4, "count": 2}])
+	mem._vectors[0] = 0.0
+	mem._vectors.flush()
+	mem.close()
+
+	mem = PersistentLongTermMemory(str(tmp_path))
+	assert [item["id"] for item in mem.all()] == [0, 1, 2, 3]
+	assert mem.search(vectors[1], k=1)[0][1] == {"id": 1}
+	assert all(hit[1]["id"] != 0 for hit in mem.search(vectors[0], k=4))
+
+
+def test_persistent_memory_readers_follow_writer(tmp_path):
+	vectors = np.eye(4, dtype=np.float32)
+	writer = PersistentLongTermMemory(str(tmp_path), max_items=2, dim=4)
+	with pytest.raises(RuntimeError):
+		PersistentLongTermMemory(str(tmp_path))
+	reader = PersistentLongTermMemory(str(tmp_path), readonly=True)
+	assert reader.search(vectors[0]) == []
+
+	writer.add({"id": 0}, vectors[0])
+	assert reader.search(vectors[0], k=1)[0][1] == {"id": 0}
+	with pytest.raises(ValueError):
+		reader.add({"id": 1}, vectors[1])
+
+	for i in range(1, 4):
+		writer.add({"id": i}, vectors[i])
+	writer.compact()
+	assert [hit[1]["id"] for hit in reader.search(vectors[3], k=2)] == [3, 2]
+	writer.close()
@@ -0,0 +1,63 @@
+from agent_project.application.rule_engine import (
+	Condition,
+	ConditionOperator,
+	Rule,
+	RuleCondition,
+	RuleEngine,
+	TagAction,
+)
+from agent_project.core.agent import HealthAgent
+from agent_project.infrastructure.monitoring.metrics import MetricsRegistry
+
+
+def _rule(rule_id, threshold):
+	return Rule(
+		id=rule_id,
+		name=rule_id,
+		condition=RuleCondition(conditions=[
+			Condition(field="heart_rate", operator=ConditionOperator.GT, value=threshold),
+		]),
+		action=TagAction(labels=[rule_id]),
+	)
+
+
+def test_rule_counters_for_process_and_batch():
+	metrics = MetricsRegistry()
+	engine = RuleEngine(metrics=metrics)
+	engine.add_rule(_rule("tachy", 100))
+	engine.add_rule(_rule("elevated", 90))
+	events = [{"heart_rate": 120}, {"heart_rate": 95}, {"heart_rate": 60}]
+
+	for event in events:
+		engine.process(event)
+	single = metrics.rule_stats()
+	# The range index only evaluates rules whose threshold the value passes
+	assert single["tachy"]["matches"] == 1
+	assert single["elevated"]["matches"] == 2
+
+	metrics.reset()
+	engine.process_batch(events)
+	engine.process_batch(events)
+	stats = metrics.rule_stats()
+	assert stats["tachy"]["evaluations"] == 6 and stats["tachy"]["matches"] == 2
+	assert stats["elevated"]["matches"] == 4
+	assert all(s["nanoseconds"] > 0 for s in stats.values())
+
+
+def test_agent_stage_histograms_and_render():
+	metrics = MetricsRegistry()
+	engine = RuleEngine(metrics=metrics)
+	engine.add_rule(_rule("tachy", 100))
+	agent = HealthAgent(rule_engine=engine, metrics=metrics)
+	plain = HealthAgent(rule_engine=engine)
+	event = {"heart_rate": 130, "spo2": 89, "temperature_c": 39.1}
+
+	assert agent.analyze(event) == plain.analyze(event)
+	for stage in ("windows", "rules", "thresholds", "decide"):
+		assert metrics.histogram("stage_seconds", stage=stage).count == 1
+	assert metrics.histogram("alert_dispatch_seconds", type="high").count == 1
+
+	text = metrics.render()
+	assert 'health_agent_rule_matches_total{rule="tachy"} 2' in text
+	assert 'health_agent_stage_seconds_bucket{stage="rules",le="+Inf"} 1' in text
+	assert "health_agent_analyze_seconds_count 1" in text
@@ -0,0 +1,125 @@
+import os
+import random
+
+from agent_project.application.rule_engine import (
+	Condition,
+	ConditionOperator,
+	LogicalOperator,
+	Retagger,
+	Rule,
+	RuleCondition,
+	RuleEngine,
+	TagAction,
+	TaggedEventStore,
+)
+from agent_project.core.agent import HealthAgent
+
+
+def _event(rng):
+	return {
+		"heart_rate": rng.randint(40, 150),
+		"spo2": rng.randint(85, 100),
+		"temperature_c": 36.8,
+		"meta": {"patient_type": rng.choice(["alzheimer", "post_op", "other"]), "age": rng.randint(60, 95)},
+	}
+
+
+def _rule(rule_id, conditions, operator=LogicalOperator.AND):
+	return Rule(
+		id=rule_id,
+		name=rule_id,
+		condition=RuleCondition(operator=operator, conditions=conditions),
+		action=TagAction(labels=[rule_id], features=["flagged"]),
+	)
+
+
+def _assert_store_matches_engine(engine, store):
+	for event_id in store.ids():
+		stored = store.get(event_id)
+		event = {k: v for k, v in stored.items() if k != "tags"}
+		assert stored["tags"] == engine.process(event)["tags"]
+
+
+def test_rule_changes_retag_only_affected_events():
+	rng = random.Random(3)
+	engine = RuleEngine()
+	engine.add_rule(_rule("tachy", [Condition(field="heart_rate", operator=ConditionOperator.GT, value=120)]))
+	store = TaggedEventStore()
+	agent = HealthAgent(rule_engine=engine, event_store=store)
+	ids = [agent.analyze(_event(rng))["event_id"] for _ in range(500)]
+	assert ids == [f"{os.getpid()}-{i}" for i in range(500)]
+	retagger = Retagger(engine, store, batch_size=64)
+
+	elderly_dementia = _rule("elderly_dementia", [
+		Condition(field="meta.patient_type", operator=ConditionOperator.EQ, value="alzheimer"),
+		Condition(field="meta.age", operator=ConditionOperator.GTE, value=85),
+	])
+	engine.add_rule(elderly_dementia)
+	stats = retagger.rule_changed("elderly_dementia", elderly_dementia)
+	assert 0 < stats["updated"] == stats["evaluated"] < 100
+	_assert_store_matches_engine(engine, store)
+
+	# An edit re-evaluates what the old version matched and what the new one may match
+	edited = _rule("elderly_dementia", [
+		Condition(field="meta.patient_type", operator=ConditionOperator.IN, value=["alzheimer", "post_op"]),
+		Condition(field="meta.age", operator=ConditionOperator.GTE, value=90),
+	])
+	engine.add_rule(edited)
+	retagger.rule_changed("elderly_dementia", edited)
+	_assert_store_matches_engine(engine, store)
+
+	engine.delete_rule("tachy")
+	stats = retagger.rule_changed("tachy")
+	assert stats["evaluated"] == stats["updated"] > 0
+	assert not store.matched_by("tachy")
+	_assert_store_matches_engine(engine, store)
+
+	# Conditions the index can't narrow fall back to every stored event
+	any_spo2 = _rule("any_spo2", [Condition(field="spo2", operator=ConditionOperator.NE, value=100)])
+	engine.add_rule(any_spo2)
+	assert retagger.rule_changed("any_spo2", any_spo2)["evaluated"] == 500
+	_assert_store_matches_engine(engine, store)
+
+
+def test_store_eviction_keeps_indexes_consistent():
+	store = TaggedEventStore(max_events=3, origin="w1")
+	condition = RuleCondition(conditions=[Condition(field="heart_rate", operator=ConditionOperator.GTE, value=100)])
+	assert store.candidates(condition) == set()
+	for i, rate in enumerate([90, 100, 110, 120, 130]):
+		store.add({"heart_rate": rate, "tags": {"matched_rules": ["r"] if rate >= 100 else []}})
+	assert store.ids() == {"w1-2", "w1-3", "w1-4"}
+	assert store.get("w1-0") is None
+	# Ids issued by another worker never resolve here
+	assert store.get("w2-3") is None and store.get(3) is None
+	assert store.matched_by("r") == {"w1-2", "w1-3", "w1-4"}
+	assert store.candidates(condition) == {"w1-2", "w1-3", "w1-4"}
+	or_group = RuleCondition(operator=LogicalOperator.OR, conditions=[
+		Condition(field="heart_rate", operator=ConditionOperator.EQ, value=110),
+		Condition(field="heart_rate", operator=ConditionOperator.LT, value=125),
+	])
+	assert store.candidates(or_group) == {"w1-2", "w1-3"}
+
+
+def test_sync_retags_for_rules_published_by_another_worker(tmp_path):
+	from agent_project.application.rule_engine import PublishedRuleStorage
+
+	path = str(tmp_path / "rules.json")
+	engine = RuleEngine(storage=PublishedRuleStorage(path, poll_interval=0))
+	other = RuleEngine(storage=PublishedRuleStorage(path, poll_interval=0))
+	store = TaggedEventStore()
+	agent = HealthAgent(rule_engine=engine, event_store=store)
+	rng = random.Random(5)
+	for _ in range(200):
+		agent.analyze(_event(rng))
+	retagger = Retagger(engine, store)
+	assert retagger.sync()["evaluated"] == 0
+
+	other.add_rule(_rule("tachy", [Condition(field="heart_rate", operator=ConditionOperator.GT, value=120)]))
+	stats = retagger.sync()
+	assert 0 < stats["updated"] == stats["evaluated"] < 200
+	_assert_store_matches_engine(engine, store)
+
+	other.delete_rule("tachy")
+	assert retagger.sync()["updated"] == stats["updated"]
+	assert not store.matched_by("tachy")
+	_assert_store_matches_engine(engine, store)
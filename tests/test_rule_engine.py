@@ -327,3 +327,504 @@ def test_condition_operators():
 	)
 	assert evaluator.evaluate(cond4, data) is True
 
+
+
+def test_compiled_conditions_match_evaluator():
+	"""Compiled predicates agree with the interpreting evaluator."""
+	from agent_project.application.rule_engine.compiler import compile_rule_condition
+	from agent_project.application.rule_engine.evaluator import RuleEvaluator
+
+	events = [
+		{"heart_rate": 130, "status": "active", "tags": ["urgent"], "meta": {"age": 80, "ward": {"id": "b2"}}},
+		{"heart_rate": 60, "status": "idle", "tags": "urgent-care", "meta": {"age": 70}},
+		{"heart_rate": None, "meta": "not-a-dict"},
+		{},
+	]
+	values = {
+		ConditionOperator.EQ: "active",
+		ConditionOperator.NE: "active",
+		ConditionOperator.GT: 100,
+		ConditionOperator.GTE: 130,
+		ConditionOperator.LT: 100,
+		ConditionOperator.LTE: 60,
+		ConditionOperator.IN: ["active", "idle"],
+		ConditionOperator.NOT_IN: ["idle"],
+		ConditionOperator.CONTAINS: "urgent",
+		ConditionOperator.EXISTS: None,
+		ConditionOperator.NOT_EXISTS: None,
+	}
+	fields = {
+		ConditionOperator.GT: "heart_rate",
+		ConditionOperator.GTE: "heart_rate",
+		ConditionOperator.LT: "heart_rate",
+		ConditionOperator.LTE: "meta.age",
+		ConditionOperator.CONTAINS: "tags",
+		ConditionOperator.EXISTS: "meta.ward.id",
+		ConditionOperator.NOT_EXISTS: "meta.ward.id",
+	}
+	for op, value in values.items():
+		for negate in (False, True):
+			cond = Condition(field=fields.get(op, "status"), operator=op, value=value, negate=negate)
+			for logical in (LogicalOperator.AND, LogicalOperator.OR, LogicalOperator.NOT):
+				group = RuleCondition(conditions=[cond], operator=logical)
+				predicate = compile_rule_condition(group)
+				for event in events:
+					assert predicate(event) == RuleEvaluator.evaluate(group, event), (op, negate, logical, event)
+
+	# Non-list operands for IN never match, matching the evaluator
+	group = RuleCondition(conditions=[Condition(field="status", operator=ConditionOperator.IN, value="active", negate=True)])
+	assert compile_rule_condition(group)(events[0]) is RuleEvaluator.evaluate(group, events[0])
+
+	not_group = RuleCondition(conditions=[], operator=LogicalOperator.NOT)
+	assert compile_rule_condition(not_group)({}) is True
+	bad_not = RuleCondition(conditions=[Condition(field="a", operator=ConditionOperator.EXISTS)] * 2, operator=LogicalOperator.NOT)
+	with pytest.raises(ValueError):
+		compile_rule_condition(bad_not)({})
+
+
+def test_storage_snapshot_versioning():
+	"""Enabled-rule snapshots are rebuilt only when the store is mutated."""
+	from agent_project.application.rule_engine import RuleStorage
+
+	storage = RuleStorage()
+	empty = storage.snapshot()
+	assert empty.rules == ()
+
+	def make(rule_id: str, priority: int, enabled: bool = True) -> Rule:
+		return Rule(
+			id=rule_id,
+			name=rule_id,
+			priority=priority,
+			enabled=enabled,
+			condition=RuleCondition(conditions=[]),
+			action=TagAction(labels=[rule_id]),
+		)
+
+	storage.add(make("b", 1))
+	storage.add(make("a", 1))
+	storage.add(make("off", 9, enabled=False))
+	storage.add(make("top", 5))
+	snap = storage.snapshot()
+	assert snap.version > empty.version
+	assert [r.id for r in snap.rules] == ["top", "a", "b"]
+	# Reads do not rebuild the snapshot
+	assert storage.snapshot() is snap
+	assert [r.id for r in storage.get_all(enabled_only=True)] == ["top", "a", "b"]
+	assert [r.id for r in storage.get_all()] == ["off", "top", "a", "b"]
+
+	assert storage.delete("missing") is False
+	assert storage.snapshot() is snap
+	assert storage.delete("top") is True
+	assert [r.id for r in storage.snapshot().rules] == ["a", "b"]
+	# Earlier snapshots are unaffected by later writes
+	assert [r.id for r in snap.rules] == ["top", "a", "b"]
+
+	engine = RuleEngine(storage=storage)
+	assert engine.process({})["tags"]["matched_rules"] == ["a", "b"]
+	engine.add_rule(make("c", 0))
+	assert engine.process({})["tags"]["matched_rules"] == ["a", "b", "c"]
+
+
+def test_sqlite_storage_shares_rules_between_workers(tmp_path):
+	from agent_project.application.rule_engine import SQLiteRuleStorage
+
+	def make(rule_id: str, priority: int, enabled: bool = True) -> Rule:
+		return Rule(
+			id=rule_id,
+			name=rule_id,
+			priority=priority,
+			enabled=enabled,
+			condition=RuleCondition(conditions=[
+				Condition(field="meta.ward", operator=ConditionOperator.IN, value=["a", "b"]),
+			]),
+			action=TagAction(labels=[rule_id], metadata={"ward": True}),
+		)
+
+	path = str(tmp_path / "rules.db")
+	writer = SQLiteRuleStorage(path)
+	reader = SQLiteRuleStorage(path, poll_interval=3600)
+	writer.add(make("b", 1))
+	writer.add(make("a", 1))
+	writer.add(make("off", 9, enabled=False))
+	assert reader.get("a") == make("a", 1)
+
+	# Snapshots poll only once the interval has passed
+	snap = reader.snapshot()
+	writer.add(make("top", 5))
+	assert reader.snapshot() is snap
+	reader.refresh()
+	assert [r.id for r in reader.snapshot().rules] == ["top", "a", "b"]
+	assert reader.snapshot().version == writer.snapshot().version
+
+	# Only changed rows are reloaded; unchanged rules keep their objects
+	rule_a = reader.get("a")
+	assert writer.delete("top") is True
+	assert writer.delete("top") is False
+	reader.refresh()
+	assert [r.id for r in reader.snapshot().rules] == ["a", "b"]
+	assert reader.get("a") is rule_a
+
+	engine = RuleEngine(storage=reader)
+	assert engine.process({"meta": {"ward": "a"}})["tags"]["matched_rules"] == ["a", "b"]
+
+	# Purged tombstones force readers that missed them to reload
+	writer.delete("b")
+	assert writer.purge_tombstones() == 2
+	reader.refresh()
+	assert [r.id for r in reader.get_all()] == ["off", "a"]
+	writer.close()
+
+	assert [r.id for r in SQLiteRuleStorage(path).get_all()] == ["off", "a"]
+
+def test_published_storage_hot_swaps_between_processes(tmp_path):
+	import subprocess
+	import sys
+
+	from agent_project.application.rule_engine import PublishedRuleStorage
+
+	def make(rule_id: str, priority: int = 0) -> Rule:
+		return Rule(
+			id=rule_id,
+			name=rule_id,
+			priority=priority,
+			condition=RuleCondition(conditions=[]),
+			action=TagAction(labels=[rule_id]),
+		)
+
+	path = str(tmp_path / "rules.json")
+	coordinator = PublishedRuleStorage(path)
+	worker = PublishedRuleStorage(path, poll_interval=3600)
+	engine = RuleEngine(storage=worker)
+	coordinator.add(make("a"))
+	coordinator.add(make("b", 5))
+	assert engine.process({})["tags"]["matched_rules"] == []
+	worker.refresh()
+	assert engine.process({})["tags"]["matched_rules"] == ["b", "a"]
+	rule_a = worker.get("a")
+
+	# Another process publishes through the same file
+	script = (
+		"import sys\n"
+		"from agent_project.application.rule_engine import PublishedRuleStorage, Rule\n"
+		"storage = PublishedRuleStorage(sys.argv[1])\n"
+		"assert storage.delete('b')\n"
+		"storage.add(Rule.model_validate({'id': 'c', 'name': 'c', 'priority': 9,"
+		" 'condition': {'conditions': []}, 'action': {'labels': ['c']}}))\n"
+	)
+	subprocess.run([sys.executable, "-c", script, path], check=True)
+	worker.refresh()
+	assert engine.process({})["tags"]["matched_rules"] == ["c", "a"]
+	assert worker.get("a") is rule_a
+	assert worker.snapshot().version == 4
+
+	assert worker.delete("missing") is False
+	coordinator.replace_all([make("z")])
+	assert [r.id for r in worker.get_all()] == ["z"]
+
+def _brute_force_matches(rules, event):
+	from agent_project.application.rule_engine.evaluator import RuleEvaluator
+
+	return [r.id for r in rules if RuleEvaluator.evaluate(r.condition, event)]
+
+
+def _random_engine(rng):
+	"""Build an engine with a few hundred randomly generated rules."""
+	ops = [
+		ConditionOperator.EQ,
+		ConditionOperator.IN,
+		ConditionOperator.GT,
+		ConditionOperator.GTE,
+		ConditionOperator.LT,
+		ConditionOperator.LTE,
+		ConditionOperator.NE,
+		ConditionOperator.EXISTS,
+	]
+	types = ["alzheimer", "post_op", "pediatric"]
+	engine = RuleEngine()
+	for i in range(200):
+		conditions = []
+		for _ in range(rng.randint(1, 3)):
+			op = rng.choice(ops)
+			if op in (ConditionOperator.EQ, ConditionOperator.NE):
+				cond = Condition(field="meta.patient_type", operator=op, value=rng.choice(types))
+			elif op == ConditionOperator.IN:
+				cond = Condition(field="meta.patient_type", operator=op, value=rng.sample(types, 2))
+			elif op == ConditionOperator.EXISTS:
+				cond = Condition(field="meta.age", operator=op)
+			else:
+				field = rng.choice(["heart_rate", "spo2", "meta.age"])
+				cond = Condition(field=field, operator=op, value=rng.choice([rng.randint(40, 130), rng.uniform(40, 130)]))
+			cond.negate = rng.random() < 0.1
+			conditions.append(cond)
+		logical = rng.choice([LogicalOperator.AND, LogicalOperator.AND, LogicalOperator.OR])
+		engine.add_rule(Rule(
+			id=f"r{i:03d}",
+			name=f"rule {i}",
+			priority=rng.randint(0, 5),
+			condition=RuleCondition(conditions=conditions, operator=logical),
+			action=TagAction(labels=[f"l{i}"], metadata={"last": i}),
+		))
+	return engine
+
+
+def _random_event(rng):
+	types = ["alzheimer", "post_op", "pediatric", "other"]
+	event = {"heart_rate": rng.choice([rng.randint(30, 150), 120, 92.0, None])}
+	if rng.random() < 0.8:
+		event["spo2"] = rng.randint(85, 100)
+	if rng.random() < 0.8:
+		event["meta"] = {"patient_type": rng.choice(types), "age": rng.randint(60, 95)}
+	return event
+
+
+def test_rule_index_preserves_matches_and_order():
+	"""Index-selected candidates yield the same matches as evaluating every rule."""
+	import random
+
+	rng = random.Random(7)
+	engine = _random_engine(rng)
+	rules = engine.list_rules(enabled_only=True)
+	for _ in range(300):
+		event = _random_event(rng)
+		assert engine.process(event)["tags"]["matched_rules"] == _brute_force_matches(rules, event)
+
+	# Non-numeric values still reach range rules, so type errors surface as before
+	with pytest.raises(TypeError):
+		_brute_force_matches(rules, {"heart_rate": "fast"})
+	with pytest.raises(TypeError):
+		engine.process({"heart_rate": "fast"})
+
+
+def test_rule_index_keeps_errors_of_earlier_conditions():
+	"""A rule isn't indexed on a condition that follows one that can raise."""
+	from agent_project.application.rule_engine.compiler import CompiledRule
+	from agent_project.application.rule_engine.index import RuleIndex
+
+	engine = RuleEngine()
+	engine.add_rule(Rule(
+		id="typed",
+		name="typed",
+		condition=RuleCondition(
+			conditions=[
+				Condition(field="heart_rate", operator=ConditionOperator.GT, value=120),
+				Condition(field="meta.patient_type", operator=ConditionOperator.EQ, value="alzheimer"),
+			],
+			operator=LogicalOperator.AND,
+		),
+		action=TagAction(labels=["typed"]),
+	))
+	event = {"heart_rate": "fast", "meta": {"patient_type": "post_op"}}
+	rules = engine.list_rules(enabled_only=True)
+	with pytest.raises(TypeError):
+		_brute_force_matches(rules, event)
+	with pytest.raises(TypeError):
+		engine.process(event)
+	# The earlier range condition is used instead
+	index = RuleIndex([CompiledRule(r) for r in rules])
+	assert list(index.candidates({"heart_rate": 100, "meta": {"patient_type": "alzheimer"}})) == []
+
+
+def test_process_batch_matches_process():
+	"""Columnar batch evaluation tags every event exactly like process()."""
+	import random
+
+	rng = random.Random(11)
+	engine = _random_engine(rng)
+	events = [_random_event(rng) for _ in range(400)]
+	events.append({"meta": "not-a-dict", "heart_rate": 10 ** 20})
+	assert engine.process_batch(events) == [engine.process(e) for e in events]
+	assert engine.process_batch([]) == []
+
+	# Errors surface the same way as with per-event processing
+	with pytest.raises(TypeError):
+		engine.process_batch(events + [{"heart_rate": "fast"}])
+
+
+def test_adaptive_reordering_keeps_matches():
+	"""Conditions are reordered most-selective first without changing results."""
+	from agent_project.application.rule_engine.compiler import CompiledRule
+
+	rule = Rule(
+		id="icu_score",
+		name="ICU score",
+		condition=RuleCondition(
+			operator=LogicalOperator.AND,
+			conditions=[
+				Condition(field="heart_rate", operator=ConditionOperator.GT, value=40),
+				Condition(field="meta.ward", operator=ConditionOperator.EQ, value="icu"),
+			],
+		),
+		action=TagAction(labels=["icu"]),
+	)
+	compiled = CompiledRule(rule, adaptive=True)
+	evaluator = RuleEngine().evaluator
+	events = [{"heart_rate": 60 + i % 50, "meta": {"ward": "icu" if i % 20 == 0 else "general"}} for i in range(5000)]
+	for event in events:
+		assert compiled.predicate(event) == evaluator.evaluate(rule.condition, event)
+	# The rarely-true ward check now runs first
+	assert compiled.stats.order == (1, 0)
+
+
+def test_adaptive_reordering_falls_back_on_errors():
+	"""An error in the reordered sequence is replayed in declaration order."""
+	from agent_project.application.rule_engine.compiler import compile_adaptive_condition
+
+	condition = RuleCondition(
+		operator=LogicalOperator.AND,
+		conditions=[
+			Condition(field="ward", operator=ConditionOperator.EQ, value="icu"),
+			Condition(field="score", operator=ConditionOperator.GT, value=5),
+		],
+	)
+	predicate, stats = compile_adaptive_condition(condition, sample_every=2, reorder_after=10)
+	for i in range(50):
+		predicate({"ward": "icu", "score": i % 3})
+	assert stats.order == (1, 0)
+
+	# Not a sampled call: the reordered score check raises first, but
+	# declaration order settles on the ward before comparing a string score
+	assert predicate({"ward": "general", "score": "high"}) is False
+	with pytest.raises(TypeError):
+		predicate({"ward": "icu", "score": "high"})
+
+
+def test_shared_conditions_evaluated_once_per_event():
+	"""Identical conditions across rules share one predicate evaluation."""
+	class CountingEvent(dict):
+		def __init__(self, **fields):
+			super().__init__(**fields)
+			self.reads = {}
+
+		def get(self, key, default=None):
+			self.reads[key] = self.reads.get(key, 0) + 1
+			return super().get(key, default)
+
+	engine = RuleEngine()
+	low_spo2 = Condition(field="spo2", operator=ConditionOperator.LT, value=92)
+	for i, extra in enumerate([
+		Condition(field="heart_rate", operator=ConditionOperator.GT, value=100),
+		Condition(field="temperature_c", operator=ConditionOperator.GT, value=38),
+		Condition(field="fall_detected", operator=ConditionOperator.EQ, value=True),
+	]):
+		engine.add_rule(Rule(
+			id=f"r{i}",
+			name=f"r{i}",
+			condition=RuleCondition(operator=LogicalOperator.OR, conditions=[low_spo2, extra]),
+			action=TagAction(labels=[f"r{i}"]),
+		))
+	# Equal but differently typed operands are not merged
+	engine.add_rule(Rule(
+		id="r3",
+		name="r3",
+		condition=RuleCondition(conditions=[Condition(field="spo2", operator=ConditionOperator.LT, value=92.0)]),
+		action=TagAction(labels=["r3"]),
+	))
+
+	event = CountingEvent(spo2=95, heart_rate=120, temperature_c=36.5, fall_detected=False)
+	assert engine.process(event)["tags"]["matched_rules"] == ["r0"]
+	assert event.reads == {"spo2": 2, "heart_rate": 1, "temperature_c": 1, "fall_detected": 1}
+	_, shared, _ = engine._active_rules()
+	assert shared.size == 5
+
+
+def _random_tree(rng, depth):
+	"""A random condition group drawing leaves from a small pool, so subtrees repeat."""
+	leaves = [
+		Condition(field="heart_rate", operator=ConditionOperator.GT, value=100),
+		Condition(field="spo2", operator=ConditionOperator.LT, value=92),
+		Condition(field="meta.patient_type", operator=ConditionOperator.EQ, value="alzheimer"),
+		Condition(field="meta.age", operator=ConditionOperator.GTE, value=75),
+		Condition(field="meta.age", operator=ConditionOperator.EXISTS, negate=True),
+	]
+	operator = rng.choice([LogicalOperator.AND, LogicalOperator.OR, LogicalOperator.NOT])
+	size = 1 if operator == LogicalOperator.NOT else rng.randint(0 if depth > 2 else 1, 3)
+	conditions = [
+		_random_tree(rng, depth - 1) if depth > 1 and rng.random() < 0.5 else rng.choice(leaves)
+		for _ in range(size)
+	]
+	return RuleCondition(operator=operator, conditions=conditions)
+
+
+def test_nested_conditions_match_evaluator():
+	"""Nested groups compile to a DAG that agrees with the reference evaluator."""
+	import random
+
+	from agent_project.application.rule_engine.compiler import CompiledRule
+	from agent_project.application.rule_engine.evaluator import RuleEvaluator
+
+	rng = random.Random(19)
+	engine = RuleEngine()
+	rules = []
+	for i in range(150):
+		rule = Rule(
+			id=f"n{i:03d}",
+			name=f"nested {i}",
+			condition=_random_tree(rng, 4),
+			action=TagAction(labels=[f"n{i}"]),
+		)
+		engine.add_rule(rule)
+		rules.append(rule)
+	events = [_random_event(rng) for _ in range(300)]
+	for event in events:
+		expected = [r.id for r in rules if RuleEvaluator.evaluate(r.condition, event)]
+		assert [r.id for r in rules if CompiledRule(r).predicate(event)] == expected
+		assert engine.process(event)["tags"]["matched_rules"] == expected
+	assert engine.process_batch(events) == [engine.process(e) for e in events]
+
+	# A malformed NOT raises only when evaluation reaches it
+	has_x = Condition(field="x", operator=ConditionOperator.EXISTS)
+	bad = RuleCondition(operator=LogicalOperator.NOT, conditions=[has_x, has_x])
+	group = RuleCondition(operator=LogicalOperator.OR, conditions=[has_x, bad])
+	compiled = CompiledRule(Rule(id="bad", name="bad", condition=group, action=TagAction()))
+	assert compiled.predicate({"x": 1}) is True and RuleEvaluator.evaluate(group, {"x": 1}) is True
+	with pytest.raises(ValueError):
+		compiled.predicate({})
+	with pytest.raises(ValueError):
+		RuleEvaluator.evaluate(group, {})
+
+
+def test_deep_condition_trees_do_not_recurse():
+	from agent_project.application.rule_engine.batch import BatchEvaluator
+	from agent_project.application.rule_engine.compiler import CompiledRule
+	from agent_project.application.rule_engine.evaluator import RuleEvaluator
+	from agent_project.application.rule_engine.models import MAX_CONDITION_DEPTH
+
+	def chain(depth):
+		group = RuleCondition(conditions=[Condition(field="level", operator=ConditionOperator.EQ, value=0)])
+		for i in range(1, depth):
+			operator = LogicalOperator.AND if i % 2 else LogicalOperator.OR
+			leaf = Condition(field="level", operator=ConditionOperator.GTE if i % 2 else ConditionOperator.EQ, value=i)
+			# model_construct skips validation, which caps the depth
+			group = RuleCondition.model_construct(operator=operator, conditions=[group, leaf])
+		return group
+
+	deep = chain(5001)
+	assert deep.depth() == 5001
+	compiled = CompiledRule(Rule.model_construct(id="deep", name="deep", condition=deep, action=TagAction()))
+	events = [{"level": 0}, {"level": 5000}, {"level": 2}, {}]
+	expected = [RuleEvaluator.evaluate(deep, e) for e in events]
+	assert expected == [False, True, False, False]
+	assert [compiled.predicate(e) for e in events] == expected
+	assert BatchEvaluator(events).group_mask(deep).tolist() == expected
+
+	# Stored rules are limited to a depth that serializes
+	action = TagAction(labels=["deep"])
+	rule = Rule(id="limit", name="limit", condition=chain(MAX_CONDITION_DEPTH), action=action)
+	assert Rule.model_validate_json(rule.model_dump_json()) == rule
+	with pytest.raises(ValueError):
+		Rule(id="too_deep", name="too deep", condition=chain(MAX_CONDITION_DEPTH + 1), action=action)
+
+
+def test_flat_rules_load_unchanged():
+	data = {
+		"id": "flat",
+		"name": "flat",
+		"condition": {"operator": "OR", "conditions": [{"field": "spo2", "operator": "lt", "value": 92}]},
+		"action": {"labels": ["hypoxia"]},
+	}
+	rule = Rule.model_validate(data)
+	assert isinstance(rule.condition.conditions[0], Condition)
+	assert rule.model_dump(mode="json")["condition"] == {
+		"conditions": [{"field": "spo2", "operator": "lt", "value": 92, "negate": False}],
+		"operator": "OR",
+	}
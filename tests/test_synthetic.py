@@ -0,0 +1,22 @@
+from agent_project.application.evaluation_service.synthetic import generate_events, generate_rules
+from agent_project.application.rule_engine import RuleEngine
+from agent_project.infrastructure.api.schemas import VitalsEvent
+
+
+def test_synthetic_data_is_deterministic_and_valid():
+	events = list(generate_events(500, patients=50, seed=7))
+	assert events == list(generate_events(500, patients=50, seed=7))
+	assert events != list(generate_events(500, patients=50, seed=8))
+	for event in events:
+		VitalsEvent.model_validate(event)
+	# A few patients dominate, as in real deployments
+	patients = [e["meta"]["patient_id"] for e in events]
+	assert patients.count("p000000") > patients.count("p000049")
+
+	rules = generate_rules(200, seed=7)
+	assert [r.model_dump() for r in rules] == [r.model_dump() for r in generate_rules(200, seed=7)]
+	engine = RuleEngine()
+	for rule in rules:
+		engine.add_rule(rule)
+	matched = [len(engine.process(e)["tags"]["matched_rules"]) for e in events]
+	assert 0 < sum(matched) < len(rules) * len(events)
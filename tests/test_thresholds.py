@@ -0,0 +1,121 @@
+import json
+import random
+
+import pytest
+
+from agent_project.core.agent import AnalysisCache, HealthAgent
+from agent_project.core.tools.thresholds import PublishedThresholdProfiles, ThresholdProfiles
+from agent_project.core.tools.vitals import DEFAULT_BOUNDS, evaluate_vitals_against_thresholds, evaluate_vitals_batch
+
+PROFILES = [
+	{"id": "pediatric", "match": {"cohort": "pediatric"}, "thresholds": {"heart_rate": {"low": 70, "high": 160}}},
+	{"id": "post_op", "match": {"cohort": "post_op"}, "thresholds": {"temperature_c": {"high": 38.5}}},
+	{
+		"id": "p7",
+		"match": {"patient_id": "p7"},
+		"thresholds": {"spo2": {"low": 88}, "respiratory_rate": {"low": 8, "high": 25}},
+	},
+	{
+		"id": "post_op_icu",
+		"match": {"cohort": "post_op", "ward": "icu"},
+		"thresholds": {"temperature_c": {"high": None}},
+	},
+]
+
+
+def test_profiles_resolve_from_meta():
+	profiles = ThresholdProfiles(PROFILES)
+	assert profiles.resolve({"heart_rate": 70}) is DEFAULT_BOUNDS
+	assert profiles.resolve({"meta": {"cohort": "other"}}) is DEFAULT_BOUNDS
+
+	pediatric = profiles.resolve({"meta": {"cohort": "pediatric", "patient_id": "p1"}})
+	assert pediatric.profiles == ("pediatric",)
+	assert profiles.resolve({"meta": {"cohort": "pediatric", "patient_id": "p2"}}) is pediatric
+	assert ("heart_rate", 70, 160) in pediatric.checks
+
+	# The more specific profile applies last; the patient's adds a vital
+	layered = profiles.resolve({"meta": {"cohort": "post_op", "ward": "icu", "patient_id": "p7"}})
+	assert layered.profiles == ("post_op", "p7", "post_op_icu")
+	checks = {key: (low, high) for key, low, high in layered.checks}
+	assert checks["temperature_c"] == (35.5, float("inf"))
+	assert checks["spo2"] == (88, 100)
+	assert checks["respiratory_rate"] == (8, 25)
+
+	reading = {"heart_rate": 150, "spo2": 90, "temperature_c": 39.0, "respiratory_rate": 30}
+	assert evaluate_vitals_against_thresholds(reading, layered)["message"] == (
+		"heart_rate high: 150, respiratory_rate high: 30"
+	)
+	assert evaluate_vitals_against_thresholds(reading)["message"] == (
+		"heart_rate high: 150, spo2 low: 90, temperature_c high: 39.0"
+	)
+
+
+def test_batch_matches_scalar_with_profiles():
+	profiles = ThresholdProfiles(PROFILES)
+	rng = random.Random(5)
+	events = []
+	for _ in range(300):
+		meta = {"cohort": rng.choice(["pediatric", "post_op", "other"]), "patient_id": rng.choice(["p1", "p7"])}
+		if rng.random() < 0.5:
+			meta["ward"] = "icu"
+		events.append({
+			"heart_rate": rng.choice([rng.randint(40, 170), None]),
+			"spo2": rng.uniform(85, 100),
+			"temperature_c": rng.uniform(35, 40),
+			"respiratory_rate": rng.choice([rng.randint(5, 30), None]),
+			"meta": meta,
+		})
+	bounds = profiles.resolve_many(events)
+	expected = [evaluate_vitals_against_thresholds(e, b) for e, b in zip(events, bounds)]
+	assert evaluate_vitals_batch(events, bounds) == expected
+
+	agent = HealthAgent(threshold_profiles=profiles)
+	assert agent.analyze_many(events) == [agent.analyze(e) for e in events]
+	assert [d["assessment"] for d in agent.analyze_many(events)] == expected
+
+
+def test_cache_keys_include_profile():
+	agent = HealthAgent(threshold_profiles=ThresholdProfiles(PROFILES), cache=AnalysisCache())
+	reading = {"heart_rate": 65, "spo2": 97, "temperature_c": 36.8}
+	assert agent.analyze({**reading, "meta": {"cohort": "other"}})["assessment"]["should_alert"] is False
+	assert agent.analyze({**reading, "meta": {"cohort": "pediatric"}})["assessment"]["message"] == "heart_rate low: 65"
+
+
+@pytest.mark.parametrize("profile", [
+	{"match": {"cohort": "x"}},
+	{"id": "a", "match": {"cohort": ["x"]}},
+	{"id": "a", "thresholds": {"spo2": {"low": 95, "high": 90}}},
+	{"id": "a", "thresholds": {"spo2": {"min": 90}}},
+	{"id": "a", "thresholds": {"spo2": {"low": "90"}}},
+	{"id": "a", "priority": "high"},
+	{"id": "a", "cohort": "x"},
+])
+def test_invalid_profiles_are_rejected(profile):
+	profiles = ThresholdProfiles(PROFILES)
+	with pytest.raises(ValueError):
+		profiles.replace_all([profile])
+	assert len(profiles) == len(PROFILES)
+	with pytest.raises(ValueError):
+		ThresholdProfiles([{"id": "a"}, {"id": "a"}])
+
+
+def test_published_profiles_are_shared_between_workers(tmp_path):
+	path = tmp_path / "profiles.json"
+	path.write_text(json.dumps(PROFILES[:1]))  # hand-written plain list
+	worker_a = PublishedThresholdProfiles(str(path), poll_interval=0)
+	worker_b = PublishedThresholdProfiles(str(path), poll_interval=0)
+	post_op = {"meta": {"cohort": "post_op"}}
+	assert worker_b.resolve(post_op) is DEFAULT_BOUNDS
+
+	worker_a.replace_all(PROFILES)
+	assert worker_b.resolve(post_op).profiles == ("post_op",)
+	assert len(worker_b) == len(PROFILES)
+	# Survives a restart
+	assert [p["id"] for p in PublishedThresholdProfiles(str(path)).list_profiles()] == [
+		p["id"] for p in worker_a.list_profiles()
+	]
+
+	# An invalid set is published nowhere
+	with pytest.raises(ValueError):
+		worker_b.replace_all([{"id": "bad", "thresholds": {"spo2": {"low": "x"}}}])
+	assert len(worker_a) == len(worker_b) == len(PROFILES)
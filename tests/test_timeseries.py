@@ -0,0 +1,164 @@
+import os
+import threading
+
+import numpy as np
+import pytest
+
+from agent_project.core.agent import HealthAgent
+from agent_project.infrastructure.timeseries import segment
+from agent_project.infrastructure.timeseries.store import TimeSeriesStore
+
+DAY = 86400.0
+T0 = 1714521600.0  # 2024-05-01T00:00:00Z
+
+
+def reading(patient, t, heart_rate=70.0, **extra):
+	meta = {"patient_id": patient, "timestamp": t}
+	return {"heart_rate": heart_rate, "spo2": 97.0, "temperature_c": 36.8, "meta": meta, **extra}
+
+
+def test_append_flush_and_range_query(tmp_path):
+	store = TimeSeriesStore(str(tmp_path), segment_rows=50)
+	times = [T0 + DAY - 500 + 10 * i for i in range(100)]  # spans two UTC days
+	# Out of order, interleaved with another patient
+	for i in reversed(range(100)):
+		alert = i % 7 == 0
+		store.append(reading("p/1", times[i], heart_rate=60.0 + i), {"severity": "high" if alert else "info", "should_alert": alert})
+		store.append(reading("p2", times[i]))
+	store.append(reading("p/1", T0 + 5 * DAY, heart_rate=None, fall_detected=True), {"severity": "critical", "should_alert": True})
+
+	segments = sorted(os.path.relpath(os.path.join(d, f), tmp_path) for d, _, fs in os.walk(tmp_path) for f in fs)
+	assert segments and all(s.startswith(("patient=p%2F1", "patient=p2")) for s in segments)
+	assert any("date=2024-05-02" in s for s in segments)
+	assert store.patients() == ["p/1", "p2"]
+
+	result = store.query("p/1", start=times[10], end=times[90])
+	assert list(result["timestamp"]) == times[10:90]
+	assert list(result["heart_rate"]) == [60.0 + i for i in range(10, 90)]
+	assert list(result["should_alert"]) == [i % 7 == 0 for i in range(10, 90)]
+	assert result["severity"][4] == "high"  # i = 14
+
+	# Buffered rows are merged in; missing vitals are NaN
+	latest = store.query("p/1", start=T0 + 4 * DAY, columns=["heart_rate", "severity"])
+	assert set(latest) == {"timestamp", "heart_rate", "severity"}
+	assert np.isnan(latest["heart_rate"][0]) and latest["severity"][0] == "critical"
+
+	store.close()
+	reopened = TimeSeriesStore(str(tmp_path))
+	everything = reopened.query("p/1")
+	assert len(everything["timestamp"]) == 101
+	assert bool(everything["fall_detected"][-1]) is True
+	assert reopened.query("nobody")["timestamp"].size == 0
+	with pytest.raises(ValueError):
+		reopened.query("p/1", columns=["blood_pressure"])
+
+
+def test_segment_reads_only_requested_columns(tmp_path, monkeypatch):
+	timestamps = np.arange(1000, dtype=np.int64) * 1000 + 1_700_000_000_000
+	values = 60 + np.round(np.sin(np.arange(1000) / 10) * 5, 1)
+	path = str(tmp_path / "s.seg")
+	info = segment.write_segment(path, timestamps, [
+		("heart_rate", segment.SHUFFLED_FLOAT64, values),
+		("spo2", segment.SHUFFLED_FLOAT64, np.full(1000, 97.0)),
+	])
+	assert os.path.getsize(path) < timestamps.nbytes + 2 * values.nbytes // 4
+	assert segment.read_info(path) == info
+
+	decoded = []
+	original = segment._decode
+	monkeypatch.setattr(segment, "_decode", lambda enc, block, rows: decoded.append(enc) or original(enc, block, rows))
+	result = segment.read_columns(info, ["heart_rate"], timestamps[100], timestamps[200])
+	assert decoded == [segment.DELTA_INT64, segment.SHUFFLED_FLOAT64]
+	assert (result["timestamp"] == timestamps[100:200]).all()
+	assert (result["heart_rate"] == values[100:200]).all()
+
+	with open(path, "r+b") as f:
+		f.seek(info.columns["heart_rate"][1])
+		f.write(b"\xff")
+	with pytest.raises(ValueError):
+		segment.read_columns(info, ["heart_rate"])
+
+
+def test_agent_records_history(tmp_path):
+	store = TimeSeriesStore(str(tmp_path))
+	agent = HealthAgent(history=store)
+	agent.analyze(reading("p1", T0, heart_rate=130.0))
+	agent.analyze_many([reading("p1", T0 + 60), {"heart_rate": 70, "spo2": 97, "temperature_c": 36.8}])
+	history = store.query("p1")
+	assert list(history["heart_rate"]) == [130.0, 70.0]
+	assert list(history["severity"]) == ["high", "info"]
+
+
+def test_out_of_range_timestamps_fall_back_to_clock(tmp_path):
+	store = TimeSeriesStore(str(tmp_path), clock=lambda: T0)
+	agent = HealthAgent(history=store)
+	for t in (1e300, float("inf"), float("nan"), -(10 ** 30)):
+		agent.analyze(reading("p1", t))
+	store.flush()
+	assert list(store.query("p1")["timestamp"]) == [T0] * 4
+
+
+def test_queries_see_segments_from_other_writers(tmp_path):
+	reader = TimeSeriesStore(str(tmp_path))
+	writer = TimeSeriesStore(str(tmp_path))
+	assert len(reader.query("p1")["timestamp"]) == 0
+	writer.append(reading("p1", T0))
+	writer.flush()
+	assert list(reader.query("p1")["timestamp"]) == [T0]
+	# A second segment landing within the same mtime tick is still found
+	writer.append(reading("p1", T0 + 1))
+	writer.flush()
+	assert list(reader.query("p1")["timestamp"]) == [T0, T0 + 1]
+
+
+def test_flush_runs_outside_the_store_lock(tmp_path, monkeypatch):
+	from agent_project.infrastructure.timeseries import store as store_module
+
+	store = TimeSeriesStore(str(tmp_path), segment_rows=2)
+	started, release = threading.Event(), threading.Event()
+	write_segment = store_module.write_segment
+
+	def slow_write(*args):
+		started.set()
+		release.wait(5)
+		return write_segment(*args)
+
+	monkeypatch.setattr(store_module, "write_segment", slow_write)
+	store.append(reading("p1", T0))
+	flusher = threading.Thread(target=store.append, args=(reading("p1", T0 + 1),))
+	flusher.start()
+	assert started.wait(5)
+	# Other patients keep ingesting, and the rows being written stay queryable
+	other = threading.Thread(target=store.append, args=(reading("p2", T0),))
+	other.start()
+	other.join(1)
+	assert not other.is_alive()
+	assert list(store.query("p1")["timestamp"]) == [T0, T0 + 1]
+	assert store.patients() == ["p1", "p2"]
+	release.set()
+	flusher.join()
+	assert list(store.query("p1")["timestamp"]) == [T0, T0 + 1]
+
+
+def test_failed_writes_are_kept_and_retried(tmp_path, monkeypatch, caplog):
+	from agent_project.infrastructure.timeseries import store as store_module
+
+	store = TimeSeriesStore(str(tmp_path), segment_rows=2)
+	write_segment = store_module.write_segment
+	failures = [OSError("disk full")]
+
+	def failing_write(*args):
+		if failures:
+			raise failures.pop()
+		return write_segment(*args)
+
+	monkeypatch.setattr(store_module, "write_segment", failing_write)
+	agent = HealthAgent(history=store)
+	agent.analyze(reading("p1", T0))
+	# The flush this triggers fails without failing the analysis
+	agent.analyze(reading("p1", T0 + 1))
+	assert "Writing history for patient p1 failed" in caplog.text
+	assert list(store.query("p1")["timestamp"]) == [T0, T0 + 1]
+	store.flush()
+	assert list(TimeSeriesStore(str(tmp_path)).query("p1")["timestamp"]) == [T0, T0 + 1]
+	assert list(store.query("p1")["timestamp"]) == [T0, T0 + 1]
@@ -0,0 +1,23 @@
+import random
+
+from agent_project.core.tools.vitals import evaluate_vitals_against_thresholds, evaluate_vitals_batch
+
+
+def test_batch_matches_scalar_evaluation():
+	rng = random.Random(3)
+	events = []
+	for _ in range(500):
+		event = {
+			"heart_rate": rng.choice([rng.randint(30, 150), rng.uniform(30, 150), 45, 120, None]),
+			"spo2": rng.choice([rng.randint(85, 100), 92.0, 100.5]),
+			"temperature_c": rng.choice([rng.uniform(34, 40), 35.5, 38.0]),
+			"fall_detected": rng.random() < 0.05,
+		}
+		if rng.random() < 0.1:
+			del event["temperature_c"]
+		events.append(event)
+	events.append({})
+	events.append({"heart_rate": True, "spo2": 10 ** 400, "fall_detected": 1})
+
+	assert evaluate_vitals_batch(events) == [evaluate_vitals_against_thresholds(e) for e in events]
+	assert evaluate_vitals_batch([]) == []
@@ -0,0 +1,202 @@
+import os
+import threading
+
+import pytest
+
+from agent_project.core.agent import HealthAgent
+from agent_project.core.tools.alerts import AlertCoalescer, AlertDispatcher, AsyncAlertDispatcher
+from agent_project.infrastructure.wal import log as wal_log
+from agent_project.infrastructure.wal.log import WriteAheadLog, open_worker_log
+
+
+class Recorder(AlertDispatcher):
+	def __init__(self):
+		self.alerts = []
+
+	def dispatch(self, alert):
+		self.alerts.append(alert)
+
+
+def reading(i, heart_rate=70):
+	return {"heart_rate": heart_rate, "spo2": 97, "temperature_c": 36.8, "meta": {"patient_id": f"p{i}"}}
+
+
+def crash(wal):
+	"""Stop a log the way a killed process would: no checkpoint, lock released."""
+	with wal._lock:
+		wal._closing = True
+		wal._queued.notify()
+	wal._thread.join()
+	wal._file.close()
+	os.close(wal._lock_fd)
+
+
+def segments(path):
+	return sorted(name for name in os.listdir(path) if name.endswith(".log"))
+
+
+def test_concurrent_appends_share_fsyncs(tmp_path, monkeypatch):
+	fsyncs = []
+	real_fsync = os.fsync
+
+	def counting_fsync(fd):
+		fsyncs.append(fd)
+		real_fsync(fd)
+
+	wal = WriteAheadLog(str(tmp_path))
+	monkeypatch.setattr(wal_log.os, "fsync", counting_fsync)
+	seqs = []
+
+	def writer(offset):
+		for i in range(50):
+			seqs.append(wal.append(reading(offset + i)))
+
+	threads = [threading.Thread(target=writer, args=(n * 50,)) for n in range(8)]
+	for t in threads:
+		t.start()
+	for t in threads:
+		t.join()
+	assert sorted(seqs) == list(range(400))
+	assert len(fsyncs) < 400
+	# Acks don't wait for (or cost) an fsync of their own
+	fsyncs.clear()
+	wal.ack_many(seqs[:399])
+	wal.append(reading(-1))
+	assert len(fsyncs) == 1
+	monkeypatch.undo()
+	with pytest.raises(RuntimeError):
+		WriteAheadLog(str(tmp_path))  # one writer at a time
+	crash(wal)
+
+	reopened = WriteAheadLog(str(tmp_path))
+	assert [seq for seq, _ in reopened.recovered()] == [seqs[399], 400]
+	assert reopened.recovered()[1][1] == reading(-1)
+	assert reopened.append(reading(0)) == 401
+	reopened.close()
+
+
+@pytest.mark.filterwarnings("ignore::pytest.PytestUnhandledThreadExceptionWarning")
+def test_failed_commit_fails_writers(tmp_path, monkeypatch):
+	wal = WriteAheadLog(str(tmp_path))
+
+	def failing_fsync(fd):
+		raise OSError("disk gone")
+
+	monkeypatch.setattr(wal_log.os, "fsync", failing_fsync)
+	with pytest.raises(RuntimeError, match="failed"):
+		wal.append(reading(0))
+	monkeypatch.undo()
+	wal._thread.join()
+	with pytest.raises(RuntimeError):
+		wal.append(reading(1))
+	wal._file.close()
+	os.close(wal._lock_fd)
+
+
+def test_torn_tail_is_dropped(tmp_path):
+	wal = WriteAheadLog(str(tmp_path))
+	wal.append_many([reading(0), reading(1)])
+	wal.ack(0)
+	wal.append(reading(2))
+	crash(wal)
+	(name,) = segments(tmp_path)
+	path = os.path.join(tmp_path, name)
+	size = os.path.getsize(path)
+	with open(path, "ab") as f:
+		f.write(b"\x40\x00\x00\x00garbage")  # header of a record cut short
+
+	reopened = WriteAheadLog(str(tmp_path))
+	assert [seq for seq, _ in reopened.recovered()] == [1, 2]
+	assert os.path.getsize(path) == size
+	reopened.close()
+
+
+def test_rotation_and_checkpoint_bound_replay(tmp_path):
+	wal = WriteAheadLog(str(tmp_path), segment_bytes=512)
+	stuck = wal.append(reading(0))
+	for i in range(1, 200):
+		wal.ack(wal.append(reading(i)))
+	wal.checkpoint()
+	# Everything from the oldest unacknowledged reading on is kept
+	assert len(segments(tmp_path)) > 1
+	wal.ack(stuck)
+	wal.append(reading(200))
+	wal.checkpoint()
+	# Only segments that can hold reading 200 (not yet acknowledged) are left
+	remaining = segments(tmp_path)
+	assert len(remaining) <= 2 and int(remaining[0][4:-4]) > 100
+	crash(wal)
+
+	reopened = WriteAheadLog(str(tmp_path), segment_bytes=512)
+	assert [seq for seq, _ in reopened.recovered()] == [200]
+	reopened.close()
+
+
+def test_agent_replays_unacknowledged_readings(tmp_path):
+	wal = WriteAheadLog(str(tmp_path))
+	agent = HealthAgent(alert_dispatcher=Recorder(), wal=wal)
+	agent.analyze(reading(0, heart_rate=150))
+	agent.analyze_many([reading(1), reading(2, heart_rate=30)])
+	assert len(agent.alert_dispatcher.alerts) == 2
+	# Crash between logging a reading and dispatching its alert
+	wal.append(reading(3, heart_rate=160))
+	crash(wal)
+
+	recovering = HealthAgent(alert_dispatcher=Recorder(), wal=WriteAheadLog(str(tmp_path)))
+	assert recovering.recover() == 1
+	assert [a["data"]["meta"]["patient_id"] for a in recovering.alert_dispatcher.alerts] == ["p3"]
+	recovering.wal.close()
+
+	restarted = HealthAgent(alert_dispatcher=Recorder(), wal=WriteAheadLog(str(tmp_path)))
+	assert restarted.recover() == 0
+	restarted.wal.close()
+
+
+def test_readings_stay_unacknowledged_until_their_alerts_are_delivered(tmp_path):
+	# Nothing listens on port 9 and the backoff outlasts the test, so nothing is delivered
+	dispatcher = AsyncAlertDispatcher(webhook_url="http://127.0.0.1:9", max_retries=1, backoff_base=60)
+	wal = WriteAheadLog(str(tmp_path / "async"))
+	agent = HealthAgent(alert_dispatcher=dispatcher, wal=wal)
+	agent.analyze(reading(0, heart_rate=150))
+	agent.analyze_many([reading(1), reading(2, heart_rate=30)])
+	# Only the reading without an alert is acknowledged
+	assert wal.unacknowledged() == 2
+	# Killed before delivery
+	dispatcher.close(timeout=0)
+	crash(wal)
+
+	recovering = HealthAgent(alert_dispatcher=Recorder(), wal=WriteAheadLog(str(tmp_path / "async")))
+	assert recovering.recover() == 2
+	assert [a["data"]["meta"]["patient_id"] for a in recovering.alert_dispatcher.alerts] == ["p0", "p2"]
+	assert recovering.wal.unacknowledged() == 0
+	recovering.wal.close()
+
+	# Coalesced alerts are acknowledged when their batch goes out
+	coalescer = AlertCoalescer(Recorder(), window_seconds=60, autoflush=False)
+	agent = HealthAgent(alert_dispatcher=coalescer, wal=WriteAheadLog(str(tmp_path / "coalesced")))
+	agent.analyze_many([reading(0, heart_rate=150), reading(1, heart_rate=150)])
+	assert agent.wal.unacknowledged() == 2
+	coalescer.flush()
+	assert agent.wal.unacknowledged() == 0
+	agent.wal.close()
+
+
+def test_workers_share_a_root_and_adopt_dead_workers_logs(tmp_path):
+	root = str(tmp_path)
+	workers = [open_worker_log(root) for _ in range(3)]
+	assert len({wal.path for wal in workers}) == 3
+	for i, wal in enumerate(workers):
+		wal.append(reading(i))
+	crash(workers[0])
+	crash(workers[1])
+
+	# A restarted worker takes over one dead worker's log and adopts the other's
+	restarted = HealthAgent(alert_dispatcher=Recorder(), wal=open_worker_log(root))
+	assert restarted.wal.path == workers[0].path
+	assert sorted(e["meta"]["patient_id"] for _, e in restarted.wal.recovered()) == ["p0", "p1"]
+	assert not os.path.exists(workers[1].path)
+	assert restarted.recover() == 2
+	# The live worker's log is left alone
+	assert workers[2].unacknowledged() == 1
+	restarted.wal.close()
+	workers[2].close()
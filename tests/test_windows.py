@@ -0,0 +1,53 @@
+import random
+
+import numpy as np
+import pytest
+
+from agent_project.core.tools.windows import VitalSeries, WindowStore
+
+
+def _expected(samples, now, duration):
+	window = [(t, v) for t, v in samples if now - t <= duration]
+	times = np.array([t - window[0][0] for t, _ in window])
+	values = np.array([v for _, v in window])
+	slope = np.polyfit(times, values, 1)[0] * 60 if len(window) > 1 and np.ptp(times) > 0 else None
+	return len(window), values.mean(), values.var(), values.min(), values.max(), slope
+
+
+def test_series_matches_brute_force():
+	rng = random.Random(0)
+	series = VitalSeries((60.0, 300.0), capacity=50)
+	samples = []
+	now = 1.7e9
+	for _ in range(2000):
+		now += rng.choice([0.0, 1.0, 5.0, 30.0, 400.0])
+		value = rng.gauss(80, 15)
+		series.push(now, value)
+		samples = (samples + [(now, value)])[-50:]
+		for index, duration in enumerate((60.0, 300.0)):
+			stats = series.stats(index)
+			count, mean, var, low, high, slope = _expected(samples, now, duration)
+			assert stats["count"] == count
+			assert stats["mean"] == pytest.approx(mean)
+			assert stats["var"] == pytest.approx(var, rel=1e-6, abs=1e-6)
+			assert (stats["min"], stats["max"]) == (low, high)
+			if slope is None:
+				assert stats["slope"] is None
+			else:
+				assert stats["slope"] == pytest.approx(slope, rel=1e-6, abs=1e-6)
+
+
+def test_store_tracks_subjects_separately():
+	store = WindowStore(windows={"5m": 300.0}, max_subjects=2)
+	for minute in range(5):
+		store.observe({"heart_rate": 80 + 5 * minute, "meta": {"patient_id": "p1", "timestamp": 60.0 * minute}})
+	aggregates = store.observe({"heart_rate": 60, "spo2": 97, "meta": {"patient_id": "p2", "timestamp": 0}})
+
+	assert store.get("p1")["5m"]["heart_rate"]["slope"] == pytest.approx(5.0)
+	assert store.get("p1")["5m"]["heart_rate"]["mean"] == pytest.approx(90.0)
+	assert aggregates["5m"]["spo2"]["count"] == 1
+	assert "temperature_c" not in aggregates["5m"]
+	assert store.observe({"heart_rate": 60}) is None
+
+	store.observe({"heart_rate": 60, "meta": {"device_id": "d1"}})
+	assert len(store) == 2 and store.get("p1") is None
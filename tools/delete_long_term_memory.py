@@ -1,8 +1,14 @@
-from agent_project.infrastructure.vector_database.memory import SimpleLongTermMemory
+import argparse
+
+from agent_project.infrastructure.vector_database.persistent import PersistentLongTermMemory
 
 if __name__ == "__main__":
-	mem = SimpleLongTermMemory(max_items=3)
-	print("Before:", list(mem.all()))
-	# Reset by re-instantiation in this simple stub
-	mem = SimpleLongTermMemory(max_items=3)
-	print("After:", list(mem.all()))
+	parser = argparse.ArgumentParser(description="Delete every item from a persistent long-term memory store")
+	parser.add_argument("path", help="Store directory")
+	args = parser.parse_args()
+
+	mem = PersistentLongTermMemory(args.path)
+	print("Before:", len(mem), "items")
+	mem.clear()
+	print("After:", len(mem), "items")
+	mem.close()
@@ -1,9 +1,15 @@
+import argparse
 import json
+import sys
+
+from agent_project.application.evaluation_service.synthetic import generate_events
 
 if __name__ == "__main__":
-	dataset = [
-		{"heart_rate": 65, "spo2": 98, "temperature_c": 36.6, "fall_detected": False},
-		{"heart_rate": 125, "spo2": 90, "temperature_c": 38.5, "fall_detected": False},
-		{"heart_rate": 55, "spo2": 88, "temperature_c": 37.0, "fall_detected": True},
-	]
-	print(json.dumps(dataset, indent=2))
+	parser = argparse.ArgumentParser(description="Write synthetic vitals events as NDJSON (one event per line)")
+	parser.add_argument("--count", type=int, default=3)
+	parser.add_argument("--patients", type=int, default=100)
+	parser.add_argument("--seed", type=int, default=0)
+	args = parser.parse_args()
+
+	for event in generate_events(args.count, patients=args.patients, seed=args.seed):
+		sys.stdout.write(json.dumps(event) + "\n")
@@ -1,7 +1,36 @@
+import argparse
+import time
+
+import numpy as np
+
+from agent_project.infrastructure.vector_database.ivf import IVFIndex
 from agent_project.infrastructure.vector_database.memory import SimpleLongTermMemory
+from agent_project.infrastructure.vector_database.persistent import PersistentLongTermMemory
 
 if __name__ == "__main__":
-	mem = SimpleLongTermMemory(max_items=10)
-	for i in range(5):
-		mem.add({"event_id": i, "note": "Routine check"})
-	print(list(mem.all()))
+	parser = argparse.ArgumentParser(description="Bulk-load synthetic items into long-term memory")
+	parser.add_argument("--count", type=int, default=5)
+	parser.add_argument("--dim", type=int, default=64)
+	parser.add_argument("--max-items", type=int, default=10)
+	parser.add_argument("--ivf", action="store_true", help="Use an approximate IVF index for search")
+	parser.add_argument("--path", help="Persist to this store directory instead of memory")
+	args = parser.parse_args()
+
+	rng = np.random.default_rng(0)
+	items = [{"event_id": i, "note": "Routine check"} for i in range(args.count)]
+	embeddings = rng.normal(size=(args.count, args.dim)).astype(np.float32)
+
+	index = IVFIndex() if args.ivf else None
+	if args.path:
+		mem = PersistentLongTermMemory(args.path, max_items=args.max_items, dim=args.dim, index=index)
+	else:
+		mem = SimpleLongTermMemory(max_items=args.max_items, index=index)
+	start = time.perf_counter()
+	mem.add_many(items, embeddings)
+	print(f"Loaded {len(mem)} items in {time.perf_counter() - start:.3f}s")
+
+	start = time.perf_counter()
+	hits = mem.search(embeddings[-1], k=3)
+	print(f"Top-3 for the last item ({time.perf_counter() - start:.3f}s):")
+	for score, item in hits:
+		print(f"  {score:.3f} {item}")
@@ -0,0 +1,24 @@
+"""
+Publish a rule set to the snapshot file watched by API workers (RULES_SNAPSHOT_PATH).
+"""
+import argparse
+import json
+
+from agent_project.application.rule_engine import PublishedRuleStorage, Rule
+
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__)
+	parser.add_argument("rules", help="JSON file with a list of rules")
+	parser.add_argument("snapshot", help="Snapshot file the workers watch")
+	args = parser.parse_args()
+
+	with open(args.rules, "r", encoding="utf-8") as f:
+		rules = [Rule.model_validate(data) for data in json.load(f)]
+	storage = PublishedRuleStorage(args.snapshot)
+	storage.replace_all(rules)
+	print(f"Published {len(rules)} rules as version {storage.snapshot().version}")
+
+
+if __name__ == "__main__":
+	main()